@@ -0,0 +1,125 @@
+# backend/api/async_views.py
+"""
+讀取端點的 async 版本（ASGI 下不佔用 worker thread 等待）
+
+回應內容與同步版完全相同（共用 utils/read_payloads.py、diary_overview.py），
+ORM 存取透過 sync_to_async 進行；搭配 ReplicaRouter 時讀取同樣走 replica。
+只支援 GET 與 Token 驗證；增量同步（?since=）與分頁仍請用同步版端點。
+
+    GET /api/async/diaries/overview/?month=YYYY-MM
+    GET /api/async/diaries/by-date/YYYY-MM-DD/
+    GET /api/async/achievements/
+    GET /api/async/wallet/?cursor=&limit=
+    GET /api/async/todos/?date= | ?from=&to=
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, HttpResponseNotAllowed
+from django.utils.dateparse import parse_date
+from rest_framework import exceptions
+
+from .authentication import CachedTokenAuthentication
+from .renderers import FastJSONRenderer
+from .serializers import TodoSerializer
+from .utils.diary_overview import etag_matches, month_etag, month_rows
+from .utils.read_payloads import achievements_payload, by_date_payload, todo_queryset, wallet_payload
+
+_renderer = FastJSONRenderer()
+
+
+def _json(data, status=200, headers=None):
+    response = HttpResponse(_renderer.render(data), status=status, content_type='application/json')
+    for key, value in (headers or {}).items():
+        response[key] = value
+    return response
+
+
+def _authenticate(request):
+    """回傳 user；沒帶或錯誤的 Token 回 None"""
+    try:
+        result = CachedTokenAuthentication().authenticate(request)
+    except exceptions.AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+async def _guard(request):
+    """回傳 (user, None)；不是 GET 或驗證失敗時回傳 (None, 錯誤回應)"""
+    if request.method not in ('GET', 'HEAD'):
+        return None, HttpResponseNotAllowed(['GET', 'HEAD'])
+    user = await sync_to_async(_authenticate)(request)
+    if user is None:
+        return None, _json({'detail': '身分認證資訊未提供或無效。'}, status=401,
+                           headers={'WWW-Authenticate': 'Token'})
+    return user, None
+
+
+async def overview(request):
+    user, denied = await _guard(request)
+    if denied:
+        return denied
+    month = request.GET.get('month')
+    if not month or len(month) != 7 or month[4] != '-':
+        return _json({'detail': '請使用 month=YYYY-MM'}, status=400)
+    try:
+        year, mon = int(month[:4]), int(month[-2:])
+    except ValueError:
+        return _json({'detail': 'month 格式錯誤，需 YYYY-MM'}, status=400)
+
+    etag = await sync_to_async(month_etag)(user.id, year, mon)
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        response = HttpResponse(status=304)
+        for key, value in headers.items():
+            response[key] = value
+        return response
+    return _json(await sync_to_async(month_rows)(user.id, year, mon), headers=headers)
+
+
+async def by_date(request, date_str):
+    user, denied = await _guard(request)
+    if denied:
+        return denied
+    try:
+        dt = parse_date(date_str)
+    except ValueError:  # 格式對但日期不存在，例如 2024-02-31
+        dt = None
+    if not dt:
+        return _json({'detail': '日期格式錯誤，需 YYYY-MM-DD'}, status=400)
+    data = await sync_to_async(by_date_payload)(user, dt)
+    if data is None:
+        return _json({'detail': 'not found'}, status=404)
+    return _json(data)
+
+
+async def achievements(request):
+    user, denied = await _guard(request)
+    if denied:
+        return denied
+    return _json(await sync_to_async(achievements_payload)(user))
+
+
+async def wallet(request):
+    user, denied = await _guard(request)
+    if denied:
+        return denied
+    try:
+        data = await sync_to_async(wallet_payload)(
+            user, cursor=request.GET.get('cursor'), limit=request.GET.get('limit') or 30)
+    except ValueError:
+        return _json({"detail": "cursor 或 limit 格式錯誤"}, status=400)
+    return _json(data)
+
+
+def _todo_list(user, params):
+    return TodoSerializer(list(todo_queryset(user, params)), many=True).data
+
+
+async def todos(request):
+    user, denied = await _guard(request)
+    if denied:
+        return denied
+    try:
+        data = await sync_to_async(_todo_list)(user, request.GET)
+    except exceptions.ValidationError as exc:
+        return _json(exc.detail, status=400)
+    return _json(data)
@@ -0,0 +1,122 @@
+# backend/api/authentication.py
+"""
+有快取的 Token 驗證
+
+DRF TokenAuthentication 每個請求都要查一次 Token JOIN User；這裡把驗證過的
+token → (user, token) 放進有 TTL 的快取，重複請求不再查 DB。
+登出、token 刪除、使用者停用 / 刪除時立刻清掉對應的快取。
+
+預設放在 Django cache：所有 worker 共用，任何一個 worker 清掉後其他 worker 立刻失效
+（default cache 必須跨行程共用，見 utils/shared_cache.py）。'local' 只適合單一行程，
+多個 worker 時 gunicorn 會拒絕啟動，否則登出的 token 在別的 worker 還能用到 TTL 到期。
+
+settings.py：
+    REST_FRAMEWORK = {
+        'DEFAULT_AUTHENTICATION_CLASSES': ['api.authentication.CachedTokenAuthentication'],
+    }
+    TOKEN_AUTH_CACHE = {          # 皆可省略
+        'BACKEND': 'django',      # 'django'：Django cache（多個 worker 共用，清除即時生效）；'local'：行程內，只限單一行程
+        'TTL': 300,
+        'MAX_ENTRIES': 10000,     # local 專用
+        'ALIAS': 'default',       # django 專用
+    }
+"""
+import copy
+import threading
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .db_routers import note_user
+from .metrics import observe_stage
+from .utils.lru import TTLCache
+
+_KEY_PREFIX = 'authtoken:'
+
+_local = None
+_local_lock = threading.Lock()
+
+
+def _conf():
+    return dict(getattr(settings, 'TOKEN_AUTH_CACHE', {}) or {})
+
+
+def _local_cache():
+    global _local
+    if _local is None:
+        with _local_lock:
+            if _local is None:
+                conf = _conf()
+                _local = TTLCache(max_entries=conf.get('MAX_ENTRIES', 10000), ttl=conf.get('TTL', 300))
+    return _local
+
+
+def is_process_local() -> bool:
+    return _conf().get('BACKEND', 'django') == 'local'
+
+
+def _shared():
+    if is_process_local():
+        return None
+    return caches[_conf().get('ALIAS', 'default')]
+
+
+def cache_get(key):
+    shared = _shared()
+    if shared is not None:
+        return shared.get(_KEY_PREFIX + key)
+    cached = _local_cache().get(key)
+    # 同一個 User 實例不能同時交給多個請求（view 可能改它）；一起複製，token.user 仍指向同一個副本
+    return copy.deepcopy(cached) if cached is not None else None
+
+
+def cache_set(key, value):
+    shared = _shared()
+    if shared is not None:
+        shared.set(_KEY_PREFIX + key, value, timeout=_conf().get('TTL', 300))
+    else:
+        _local_cache().set(key, value)
+
+
+def evict_token(key):
+    if not key:
+        return
+    shared = _shared()
+    if shared is not None:
+        shared.delete(_KEY_PREFIX + key)
+    _local_cache().delete(key)
+
+
+def evict_user(user_id):
+    for key in Token.objects.filter(user_id=user_id).values_list('key', flat=True):
+        evict_token(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        cached = cache_get(key)
+        if cached is None:
+            with observe_stage('auth'):
+                cached = super().authenticate_credentials(key)  # 查 DB + 檢查 is_active
+            cache_set(key, cached)
+        note_user(cached[0])  # 有背景寫入的使用者改從 primary 讀
+        return cached
+
+
+# ---------- 失效 ----------
+
+@receiver(post_delete, sender=Token, dispatch_uid='cached_token_auth_token_deleted')
+def _on_token_deleted(sender, instance, **kwargs):
+    evict_token(instance.key)
+
+
+@receiver(post_save, sender=User, dispatch_uid='cached_token_auth_user_saved')
+def _on_user_saved(sender, instance, created, **kwargs):
+    # 停用或任何資料異動都清掉，避免快取裡留著舊的 User
+    if not created:
+        evict_user(instance.pk)
@@ -0,0 +1,187 @@
+# backend/api/db_routers.py
+"""
+讀寫分離：安全的讀取走 replica，寫入與剛寫過的 client 走 primary
+
+- 只有經過 ReplicaRoutingMiddleware、而且是 GET / HEAD / OPTIONS 的請求，讀取才會送到 replica；
+  背景 worker、management command、交易內的讀取一律走 primary（避免讀到還沒同步的資料）
+- 同一個請求一旦寫過（或是 POST / PUT / PATCH / DELETE），剩下的讀取都走 primary，
+  並在 cache 記一個 STICKY_SECONDS 秒的標記：同一個 client（同一組 Token / session）
+  接下來的讀取也走 primary，確保看得到自己剛寫的資料（read-your-writes）
+- 認證用的資料（Token、User、session）一律從 primary 讀：剛登入 / 註冊拿到的新 Token
+  第一次使用時還沒有舊的標記（標記是以認證資訊為 key），從落後的 replica 會查不到而回 401
+- 請求以外的寫入（背景 AI 分析、成就進度 outbox）呼叫 pin_user(user_id)：以使用者為 key 記同樣的標記，
+  認證完成後 note_user() 看到標記就改走 primary，任何一個 client 都看得到背景寫入的結果
+- 讀到的資料要和 cache / primary 上的版本號一致時（月曆摘要的 stamp、成就清單版本號、
+  寫回 rollup 的統計），用 `with use_primary():` 包住那段讀取；增量同步的 cursor / 日誌
+  則和資料列從同一個 alias 讀（DeltaSyncMixin）
+
+settings.py：
+    DATABASES = {
+        'default': {...},
+        'replica': {..., 'TEST': {'MIRROR': 'default'}},   # 測試時 replica 直接指向 default
+    }
+    DATABASE_ROUTERS = ['api.db_routers.ReplicaRouter']
+    MIDDLEWARE = [..., 'api.db_routers.ReplicaRoutingMiddleware']
+    DATABASE_REPLICA = {            # 皆可省略
+        'ALIAS': 'replica',         # DATABASES 裡沒有這個 alias 時全部走 default
+        'STICKY_SECONDS': 5,        # 應大於 replica 的同步延遲
+    }
+
+本機用兩個 SQLite 檔模擬：replica 指向另一個檔案，用 `python manage.py sync_sqlite_replica`
+把 primary 複製過去（--interval 可持續同步，模擬複寫延遲）。
+"""
+import asyncio
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+try:
+    from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+except ImportError:  # asgiref < 3.6
+    from asyncio import iscoroutinefunction
+
+    def markcoroutinefunction(func):
+        func._is_coroutine = asyncio.coroutines._is_coroutine
+        return func
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PRIMARY_ONLY = {'authtoken.token', 'authtoken.tokenproxy', 'auth.user', 'sessions.session'}
+_PIN_PREFIX = 'dbpin:'
+
+
+def _conf():
+    return dict(getattr(settings, 'DATABASE_REPLICA', {}) or {})
+
+
+def replica_alias():
+    alias = _conf().get('ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+class RoutingState:
+    """單一請求的路由狀態（放在 ContextVar，sync_to_async 的 thread 也看得到同一個物件）"""
+
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.wrote = False
+
+
+_state = ContextVar('api_db_routing', default=None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.use_replica or state.wrote:
+            return DEFAULT_DB_ALIAS
+        if model._meta.label_lower in PRIMARY_ONLY:
+            return DEFAULT_DB_ALIAS  # 認證不能因為複寫延遲而失敗
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS  # 交易內要讀到自己剛寫的
+        return replica_alias() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+@contextmanager
+def use_primary():
+    """區塊內的讀取一律走 primary（不在 ReplicaRoutingMiddleware 的請求內時本來就是）"""
+    state = _state.get()
+    if state is None or not state.use_replica:
+        yield
+        return
+    state.use_replica = False
+    try:
+        yield
+    finally:
+        state.use_replica = True
+
+
+# ---------- read-your-writes ----------
+
+def _sticky_seconds():
+    return _conf().get('STICKY_SECONDS', 5)
+
+
+def _user_key(user_id):
+    return f"{_PIN_PREFIX}user:{user_id}"
+
+
+def pin_user(user_id):
+    """請求以外的寫入 commit 後呼叫：這位使用者接下來 STICKY_SECONDS 秒的讀取走 primary"""
+    if user_id is not None and replica_alias() is not None:
+        cache.set(_user_key(user_id), 1, timeout=_sticky_seconds())
+
+
+def note_user(user):
+    """認證完成後呼叫：這位使用者有背景寫入的標記時，這個請求剩下的讀取改走 primary"""
+    state = _state.get()
+    if state is None or not state.use_replica or user is None or not user.is_authenticated:
+        return
+    if cache.get(_user_key(user.pk)):
+        state.use_replica = False
+
+def _client_key(request):
+    """以認證資訊識別 client（還沒跑 DRF 驗證，不知道 user，用 Token / session 代替）"""
+    credential = request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credential:
+        return None
+    return _PIN_PREFIX + hashlib.sha256(credential.encode()).hexdigest()[:32]
+
+
+def _begin(request):
+    key = _client_key(request)
+    use_replica = (request.method in SAFE_METHODS
+                   and replica_alias() is not None
+                   and not (key and cache.get(key)))
+    state = RoutingState(use_replica)
+    return state, _state.set(state), key
+
+
+def _finish(request, state, token, key):
+    _state.reset(token)
+    if key and (state.wrote or request.method not in SAFE_METHODS):
+        cache.set(key, 1, timeout=_sticky_seconds())
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token, key = _begin(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _finish(request, state, token, key)
+
+    async def __acall__(self, request):
+        state, token, key = _begin(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _finish(request, state, token, key)
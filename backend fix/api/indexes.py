@@ -0,0 +1,82 @@
+# backend/api/indexes.py
+"""
+列表 / 分頁查詢依賴的複合索引
+
+欄位順序與各 ViewSet 的排序一致（user 在前、排序欄、id 當 tiebreak），
+每一頁都能走 index range scan。部署時由 `python manage.py ensure_schema`（或 ensure_indexes）建立，
+已存在則略過；`ensure_indexes --explain` 會對 PLAN_CHECKS 的代表性查詢跑 EXPLAIN，確認有用到索引、沒有額外排序。
+"""
+import datetime
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import F, Index
+
+from .models import Diary, MoodLog, Photo, Todo
+
+# Todo 列表排序：未完成在前 -> 時間（NULL 放最後）-> 建立時間
+# 區間查詢（?from=&to=）在最前面多一個 date，仍是 todo_user_date_done_idx 的前綴順序
+TODO_ORDERING = ('is_done', F('time').asc(nulls_last=True), 'created_at')
+TODO_RANGE_ORDERING = ('date',) + TODO_ORDERING
+
+INDEXES = {
+    MoodLog: [
+        Index(fields=['user', 'id'], name='moodlog_user_id_idx'),
+    ],
+    Diary: [
+        Index(fields=['user', '-created_at', '-id'], name='diary_user_created_idx'),
+    ],
+    Photo: [
+        Index(fields=['owner', '-uploaded_at', '-id'], name='photo_owner_uploaded_idx'),
+    ],
+    Todo: [
+        # PostgreSQL 的 ASC 索引本來就是 NULLS LAST，與 TODO_ORDERING 完全一致；
+        # SQLite 的索引固定 NULL 在前，time 以後的部分仍需在同一天 / 同一完成狀態內小量排序
+        Index(fields=['user', 'date', 'is_done', 'time', 'created_at'], name='todo_user_date_done_idx'),
+    ],
+}
+
+
+def ensure_indexes(using=DEFAULT_DB_ALIAS, dry_run=False):
+    """
+    建立缺少的索引；回傳 [(表名, 索引名, 'exists' | 'created' | 'planned'), ...]
+    只產生 CREATE INDEX 敘述來執行、不進 schema_editor 的 context，交易內（例如測試）也能用
+    """
+    connection = connections[using]
+    editor = connection.schema_editor()
+    result = []
+    for model, indexes in INDEXES.items():
+        table = model._meta.db_table
+        with connection.cursor() as cursor:
+            existing = set(connection.introspection.get_constraints(cursor, table))
+        for index in indexes:
+            if index.name in existing:
+                result.append((table, index.name, 'exists'))
+                continue
+            if not dry_run:
+                with connection.cursor() as cursor:
+                    cursor.execute(str(index.create_sql(model, editor)))
+            result.append((table, index.name, 'planned' if dry_run else 'created'))
+    return result
+
+
+def _todo_day():
+    return Todo.objects.filter(user_id=0, date=datetime.date.today()).order_by(*TODO_ORDERING)
+
+
+def _todo_range():
+    today = datetime.date.today()
+    return (Todo.objects
+            .filter(user_id=0, date__gte=today, date__lte=today + datetime.timedelta(days=6))
+            .order_by(*TODO_RANGE_ORDERING))
+
+
+# 名稱: (產生代表性 queryset 的函式, 預期用到的索引)
+PLAN_CHECKS = {
+    'todo_list_day': (_todo_day, 'todo_user_date_done_idx'),
+    'todo_list_range': (_todo_range, 'todo_user_date_done_idx'),
+    'moodlog_list': (lambda: MoodLog.objects.filter(user_id=0).order_by('id'), 'moodlog_user_id_idx'),
+    'diary_list': (lambda: Diary.objects.filter(user_id=0).order_by('-created_at', '-id'),
+                   'diary_user_created_idx'),
+    'photo_list': (lambda: Photo.objects.filter(owner_id=0).order_by('-uploaded_at', '-id'),
+                   'photo_owner_uploaded_idx'),
+}
@@ -0,0 +1,25 @@
+# backend/api/management/commands/backfill_achievement_claims.py
+"""
+把 api_achievement_claim 上線前的成就領取補進領取紀錄（部署時在 ensure_schema 之後跑一次）
+
+    python manage.py backfill_achievement_claims
+    python manage.py backfill_achievement_claims --user 12 --user 34
+
+舊版 claim_achievement 的紀錄以 utils.achievement.get_status 逐筆判斷；重跑不會重複寫入。
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.utils.achievement_status import backfill_claims
+
+
+class Command(BaseCommand):
+    help = "補上成就領取紀錄（api_achievement_claim）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help="只處理這些使用者 id")
+
+    def handle(self, *args, **opts):
+        with transaction.atomic():
+            added = backfill_claims(opts['users'])
+        self.stdout.write(self.style.SUCCESS(f"完成，新增 {added} 筆領取紀錄"))
@@ -0,0 +1,83 @@
+# backend/api/management/commands/backfill_insights.py
+"""
+由既有日記 / 心情紀錄建立統計 rollup
+
+    python manage.py backfill_insights                   # 所有使用者、有資料的月份
+    python manage.py backfill_insights --user 42
+    python manage.py backfill_insights --verify          # 不重建，逐日比對已存的 rollup 與即時彙總
+"""
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import Diary, MoodLog
+from api.utils import insights as rollups
+from api.utils.model_fields import first_field
+
+
+def _months(first, last):
+    year, mon = first.year, first.month
+    while (year, mon) <= (last.year, last.month):
+        yield year, mon
+        year, mon = year + (mon == 12), mon % 12 + 1
+
+
+def _as_date(value):
+    return timezone.localtime(value).date() if isinstance(value, datetime.datetime) else value
+
+
+class Command(BaseCommand):
+    help = "建立 / 驗證 insights 的每日與每月 rollup"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append')
+        parser.add_argument('--verify', action='store_true', help="只比對已存的 rollup 與即時彙總，不重建")
+
+    def _span(self, user_id):
+        dates = list(Diary.objects.filter(user_id=user_id).values_list('date', flat=True).order_by('date')[:1])
+        dates += list(Diary.objects.filter(user_id=user_id).values_list('date', flat=True).order_by('-date')[:1])
+        log_date = first_field(MoodLog, ('date', 'created_at'))
+        if log_date:
+            qs = MoodLog.objects.filter(user_id=user_id).values_list(log_date, flat=True)
+            dates += [_as_date(v) for v in list(qs.order_by(log_date)[:1]) + list(qs.order_by('-' + log_date)[:1])]
+        dates = [d for d in dates if d]
+        return (min(dates), max(dates)) if dates else (None, None)
+
+    def handle(self, *args, **opts):
+        user_ids = set(Diary.objects.values_list('user_id', flat=True).distinct())
+        user_ids |= set(MoodLog.objects.values_list('user_id', flat=True).distinct())
+        # 比對時也要看資料已刪光、但還留著 rollup 的日期
+        stored = rollups.stored_spans() if opts['verify'] else {}
+        user_ids |= set(stored)
+        if opts['user']:
+            user_ids &= set(opts['user'])
+
+        months_done = mismatches = 0
+        for user_id in sorted(user_ids):
+            span = [d for d in self._span(user_id) + stored.get(user_id, ()) if d]
+            if not span:
+                continue
+            first, last = min(span), max(span)
+            for year, mon in _months(first, last):
+                start, end = rollups._month_bounds(year, mon)
+                fresh = rollups.compute_days(user_id, start, end)   # 每月一次範圍查詢
+                months_done += 1
+                if not opts['verify']:
+                    rollups.store_days(user_id, fresh)
+                    continue
+
+                kept = rollups.stored_days(user_id, start, end)
+                for day, expected in sorted(fresh.items()):
+                    if day not in kept:
+                        continue  # 還沒建，讀取時會由原始資料補上
+                    if kept[day] != expected:
+                        mismatches += 1
+                        self.stdout.write(self.style.ERROR(f"user {user_id} {day}：rollup 與即時彙總不一致"))
+
+        if not opts['verify']:
+            self.stdout.write(self.style.SUCCESS(f"完成：{len(user_ids)} 位使用者、{months_done} 個月"))
+        elif mismatches:
+            self.stdout.write(self.style.ERROR(f"{mismatches} 天不一致"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{months_done} 個月的 rollup 與即時彙總全部一致"))
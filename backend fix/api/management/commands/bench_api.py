@@ -0,0 +1,357 @@
+# backend/api/management/commands/bench_api.py
+"""
+API 端點基準測試（不需網路、不動正式資料庫）
+
+替 DATABASES 的每個 alias 建測試資料庫（SQLite 預設在記憶體；TEST.MIRROR 的 replica 指向 default 的），
+灌入指定規模的假資料，
+用 Django test client 依序打各端點，回報每個端點的 p50 / p95 / p99、吞吐量與 SQL 查詢數。
+輸出為 JSON，可存檔後跨 commit 比較：
+
+    python manage.py bench_api --users 20 --days 365 --requests 200 --output bench/$(git rev-parse --short HEAD).json
+    python manage.py bench_api --only overview,wallet --sync-analysis
+
+同樣的 --seed 與規模參數會產生同樣的資料與請求順序。
+"""
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import tempfile
+import time
+from contextlib import ExitStack
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections, models
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_databases, teardown_databases
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from api.indexes import ensure_indexes
+from api.models import Achievement, Diary, ExpLog, MoodLog, Photo, Todo
+from api.schema import ensure_schema
+from api.utils.photo_pipeline import photo_file_field
+
+SAMPLES = [
+    "今天天氣很好，和朋友去散步，心情很愉快。",
+    "考試沒考好，覺得有點沮喪。",
+    "工作好多做不完，壓力很大。",
+    "晚餐吃到喜歡的拉麵，好滿足！",
+    "跟家人吵架了，心裡很難過。",
+]
+MOODS = ['happy', 'calm', 'sad', 'angry', 'tired']
+SENTIMENTS = ['positive', 'neutral', 'negative']
+WORDS = ['散步', '考試', '工作', '拉麵', '家人', '朋友', '天氣', '壓力']
+
+ENDPOINTS = ('overview', 'by_date', 'diary_create', 'achievements', 'wallet', 'todos', 'photo_upload')
+
+
+# ---------- 假資料 ----------
+
+def _filler(field, rng, n):
+    """必填欄位的通用假值（已知欄位由呼叫端帶入，這裡只補其餘欄位）"""
+    unique = field.unique or field.primary_key
+    if isinstance(field, (models.CharField, models.TextField)):
+        value = f"{field.name}-{n}" if unique else rng.choice(WORDS)
+        return value[:field.max_length] if field.max_length else value
+    if isinstance(field, models.BooleanField):
+        return False
+    if isinstance(field, (models.IntegerField, models.FloatField, models.DecimalField)):
+        return n if unique else rng.randint(1, 10)
+    if isinstance(field, models.DateTimeField):
+        return timezone.now()
+    if isinstance(field, models.DateField):
+        return timezone.localdate()
+    if isinstance(field, models.TimeField):
+        return datetime.time(rng.randint(0, 23), rng.choice((0, 30)))
+    return None
+
+
+def build(model, rng, n, **known):
+    """只用模型上真的存在的欄位；沒給值又必填的欄位補假值"""
+    fields = {f.name: f for f in model._meta.concrete_fields}
+    kwargs = {}
+    for name, value in known.items():
+        field = fields.get(name) or fields.get(name + '_id')
+        if field is None and name.endswith('_id'):
+            field = fields.get(name[:-3])
+        if field is not None:
+            kwargs[name] = value
+    for name, field in fields.items():
+        if name in kwargs or field.attname in kwargs:
+            continue
+        if isinstance(field, models.AutoField) or field.null or field.blank:
+            continue
+        if field.has_default() or getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            continue
+        if field.is_relation:
+            continue
+        value = _filler(field, rng, n)
+        if value is not None:
+            kwargs[name] = value
+    return model(**kwargs)
+
+
+def _keywords(rng):
+    return ", ".join(rng.sample(WORDS, 3))
+
+
+def seed(opts, rng):
+    """回傳 [(user, token_key), ...]"""
+    User.objects.bulk_create([
+        User(username=f"bench{i}", email=f"bench{i}@example.com") for i in range(opts['users'])
+    ])
+    users = list(User.objects.filter(username__startswith='bench').order_by('id'))
+    tokens = Token.objects.bulk_create([Token(user=u, key=Token.generate_key()) for u in users])
+
+    today = timezone.localdate()
+    now = timezone.now()
+    n = 0
+    for user in users:
+        diaries, logs, todos, exps, photos = [], [], [], [], []
+        for d in range(opts['days']):
+            day = today - datetime.timedelta(days=d + 1)  # 今天留給 diary_create
+            n += 1
+            if rng.random() < opts['diary_ratio']:
+                diaries.append(build(
+                    Diary, rng, n, user=user, date=day, content=rng.choice(SAMPLES) * rng.randint(1, 6),
+                    title=f"{day.isoformat()} 日記", mood=rng.choice(MOODS), emotion=rng.choice(MOODS),
+                    mood_color='#ffcc00', weather_icon='sunny', sentiment=rng.choice(SENTIMENTS),
+                    ai_message=rng.choice(SAMPLES), keywords=_keywords(rng), topics=_keywords(rng)))
+            for _ in range(opts['moodlogs_per_day']):
+                n += 1
+                logs.append(build(MoodLog, rng, n, user=user, mood=rng.choice(MOODS), date=day))
+            for t in range(opts['todos_per_day']):
+                n += 1
+                todos.append(build(Todo, rng, n, user=user, title=f"todo {t}", date=day,
+                                   is_done=rng.random() < 0.5))
+        balance = 0
+        for e in range(opts['explogs']):
+            n += 1
+            amount = rng.randint(1, 20)
+            balance += amount
+            exps.append(build(ExpLog, rng, n, user=user, get_exp=amount, reason=f"achievement:bench-{e}",
+                              current_total=balance,
+                              get_exp_time=now - datetime.timedelta(minutes=opts['explogs'] - e)))
+        field = photo_file_field()
+        for p in range(opts['photos']):
+            n += 1
+            photos.append(build(Photo, rng, n, owner=user, **{field: f"photos/{user.id}/seed-{p}.jpg"}))
+
+        Diary.objects.bulk_create(diaries, batch_size=500)
+        MoodLog.objects.bulk_create(logs, batch_size=500)
+        Todo.objects.bulk_create(todos, batch_size=500)
+        ExpLog.objects.bulk_create(exps, batch_size=500)
+        Photo.objects.bulk_create(photos, batch_size=500)
+
+    if not Achievement.objects.exists():
+        Achievement.objects.bulk_create([
+            build(Achievement, rng, i, achTitle=f"成就 {i}", achContent="bench", exp=10, is_daily=i % 2 == 0)
+            for i in range(opts['achievements'])
+        ])
+    return list(zip(users, [t.key for t in tokens]))
+
+
+def _jpeg(rng, i):
+    """每次內容都不同，避免被去重成同一張"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return b'\xff\xd8\xff\xe0' + os.urandom(2048) + i.to_bytes(4, 'big') + b'\xff\xd9'
+    buf = io.BytesIO()
+    Image.new('RGB', (640, 480), (rng.randrange(256), rng.randrange(256), i % 256)).save(buf, 'JPEG')
+    return buf.getvalue()
+
+
+# ---------- 量測 ----------
+
+def _own_databases():
+    """有自己一份資料的 alias（TEST.MIRROR 的 alias 共用被鏡像的那份，不必再建表）"""
+    return [alias for alias in connections
+            if alias == DEFAULT_DB_ALIAS or not connections[alias].settings_dict.get('TEST', {}).get('MIRROR')]
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def _summary(name, samples, elapsed):
+    latencies = sorted(s[0] for s in samples)
+    queries = [s[1] for s in samples]
+    statuses = {}
+    for s in samples:
+        statuses[str(s[2])] = statuses.get(str(s[2]), 0) + 1
+    n = len(samples)
+    ms = lambda v: round(v * 1000, 3) if v is not None else None  # noqa: E731
+    return {
+        'endpoint': name,
+        'requests': n,
+        'errors': sum(1 for s in samples if s[2] >= 400),
+        'status': statuses,
+        'p50_ms': ms(_percentile(latencies, 50)),
+        'p95_ms': ms(_percentile(latencies, 95)),
+        'p99_ms': ms(_percentile(latencies, 99)),
+        'mean_ms': ms(sum(latencies) / n) if n else None,
+        'req_per_sec': round(n / elapsed, 2) if elapsed else None,
+        'queries_mean': round(sum(queries) / n, 2) if n else None,
+        'queries_max': max(queries) if queries else None,
+    }
+
+
+class Command(BaseCommand):
+    help = "API 端點基準測試：假資料 + test client，輸出延遲分位數 / 吞吐量 / 查詢數（JSON）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--days', type=int, default=180, help="每位使用者往前幾天的資料")
+        parser.add_argument('--diary-ratio', type=float, default=0.8, help="有寫日記的天數比例")
+        parser.add_argument('--moodlogs-per-day', type=int, default=2)
+        parser.add_argument('--todos-per-day', type=int, default=3)
+        parser.add_argument('--explogs', type=int, default=200, help="每位使用者的錢包流水筆數")
+        parser.add_argument('--photos', type=int, default=20, help="每位使用者既有照片數")
+        parser.add_argument('--achievements', type=int, default=12, help="成就表為空時建立的成就數")
+        parser.add_argument('--requests', type=int, default=100, help="每個端點量測的請求數")
+        parser.add_argument('--warmup', type=int, default=5, help="每個端點不計入的預熱請求數")
+        parser.add_argument('--only', default='', help="只跑部分端點（逗號分隔）：" + ",".join(ENDPOINTS))
+        parser.add_argument('--sync-analysis', action='store_true',
+                            help="日記建立時同步做 AI 分析（預設沿用 DIARY_ANALYSIS_ASYNC）")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help="JSON 寫入檔案（預設印到 stdout）")
+
+    def handle(self, *args, **opts):
+        only = [e.strip() for e in opts['only'].split(',') if e.strip()]
+        unknown = set(only) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f"未知端點：{', '.join(sorted(unknown))}")
+        endpoints = only or list(ENDPOINTS)
+
+        media_root = tempfile.mkdtemp(prefix='bench_api_media_')
+        overrides = {
+            'ALLOWED_HOSTS': ['*'],
+            'MEDIA_ROOT': media_root,
+            # 每個 cache alias 換成這次專用的 LocMem，不會讀到也不會清掉正式 cache
+            'CACHES': {alias: {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': f'bench-api-{alias}-{os.getpid()}',
+            } for alias in settings.CACHES},
+        }
+        if opts['sync_analysis']:
+            overrides['DIARY_ANALYSIS_ASYNC'] = False
+
+        # 每個 alias 都換成測試資料庫：有 replica router 時讀取不會落到正式的 replica
+        old_config = setup_databases(verbosity=0, interactive=False, serialized_aliases=set())
+        try:
+            for alias in _own_databases():
+                ensure_schema(using=alias)
+                ensure_indexes(using=alias)
+            with override_settings(**overrides):
+                report = self._bench(opts, endpoints)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            shutil.rmtree(media_root, ignore_errors=True)
+
+        text = json.dumps(report, indent=2, ensure_ascii=False)
+        if opts['output']:
+            with open(opts['output'], 'w', encoding='utf-8') as fh:
+                fh.write(text + '\n')
+            self.stdout.write(self.style.SUCCESS(f"已寫入 {opts['output']}"))
+        else:
+            self.stdout.write(text)
+
+    def _bench(self, opts, endpoints):
+        rng = random.Random(opts['seed'])
+        cache.clear()  # 只清 bench 專用的 LocMem：overview / 成就目錄等快取從空的開始
+
+        t0 = time.perf_counter()
+        accounts = seed(opts, rng)
+        seed_seconds = time.perf_counter() - t0
+
+        today = timezone.localdate()
+        photo_field = photo_file_field()
+        counter = {'upload': 0}
+
+        def month_of():
+            day = today - datetime.timedelta(days=rng.randrange(max(1, opts['days'])))
+            return {'month': day.strftime('%Y-%m')}
+
+        def day_path():
+            day = today - datetime.timedelta(days=rng.randrange(max(1, opts['days'])) + 1)
+            return f"/api/diaries/by-date/{day.isoformat()}/"
+
+        def upload(client):
+            counter['upload'] += 1
+            data = _jpeg(rng, counter['upload'])
+            return client.post('/api/photos/upload/', {
+                photo_field: SimpleUploadedFile(f"bench{counter['upload']}.jpg", data, content_type='image/jpeg'),
+            })
+
+        # 名稱 → (client, i) -> response
+        plans = {
+            'overview': lambda c, i: c.get('/api/diaries/overview/', month_of()),
+            'by_date': lambda c, i: c.get(day_path()),
+            'diary_create': lambda c, i: c.post('/api/diaries/', {
+                'content': rng.choice(SAMPLES) + f" #{i}", 'mood': rng.choice(MOODS),
+                'date': (today + datetime.timedelta(days=i)).isoformat()}, content_type='application/json'),
+            'achievements': lambda c, i: c.get('/api/achievements/'),
+            'wallet': lambda c, i: c.get('/api/wallet/'),
+            'todos': lambda c, i: c.get('/api/todos/', {
+                'date': (today - datetime.timedelta(days=rng.randrange(max(1, opts['days'])) + 1)).isoformat()}),
+            'photo_upload': lambda c, i: upload(c),
+        }
+
+        clients = [Client(HTTP_AUTHORIZATION=f"Token {key}") for _, key in accounts]
+
+        results = []
+        for name in endpoints:
+            call = plans[name]
+            for i in range(opts['warmup']):
+                call(clients[i % len(clients)], -1 - i)
+
+            samples = []
+            started = time.perf_counter()
+            for i in range(opts['requests']):
+                client = clients[i % len(clients)]
+                with ExitStack() as stack:
+                    captured = [stack.enter_context(CaptureQueriesContext(conn)) for conn in connections.all()]
+                    t = time.perf_counter()
+                    response = call(client, i)
+                    latency = time.perf_counter() - t
+                queries = sum(len(ctx.captured_queries) for ctx in captured)
+                samples.append((latency, queries, response.status_code))
+            results.append(_summary(name, samples, time.perf_counter() - started))
+
+        return {
+            'meta': {
+                'generated_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'aliases': list(connections),
+                'seed': opts['seed'],
+                'scale': {k: opts[k] for k in ('users', 'days', 'diary_ratio', 'moodlogs_per_day',
+                                                'todos_per_day', 'explogs', 'photos', 'achievements')},
+                'requests_per_endpoint': opts['requests'],
+                'warmup': opts['warmup'],
+                'sync_analysis': opts['sync_analysis'],
+                'seed_seconds': round(seed_seconds, 3),
+                'rows': {
+                    'diaries': Diary.objects.count(),
+                    'moodlogs': MoodLog.objects.count(),
+                    'todos': Todo.objects.count(),
+                    'explogs': ExpLog.objects.count(),
+                    'photos': Photo.objects.count(),
+                },
+            },
+            'endpoints': results,
+        }
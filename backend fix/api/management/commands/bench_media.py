@@ -0,0 +1,70 @@
+# backend/api/management/commands/bench_media.py
+"""
+照片傳輸吞吐量：Django 直接串流（完整 / Range）vs X-Accel-Redirect 交給 proxy
+
+    python manage.py bench_media --size-mb 8 --rounds 20
+"""
+import json
+import os
+import tempfile
+import time
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+
+from api.utils.media_response import serve_file
+
+
+def _drain(response):
+    total = 0
+    if getattr(response, 'streaming', False):
+        for chunk in response.streaming_content:
+            total += len(chunk)
+    else:
+        total = len(response.content)
+    response.close()
+    return total
+
+
+class Command(BaseCommand):
+    help = "照片傳輸吞吐量比較"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=float, default=8)
+        parser.add_argument('--rounds', type=int, default=20)
+
+    def _run(self, label, request_kwargs, rounds, storage, name, factory):
+        sent = 0
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            request = factory.get('/bench', **request_kwargs)
+            sent += _drain(serve_file(request, storage, name))
+        elapsed = time.perf_counter() - t0
+        return {
+            'case': label,
+            'rounds': rounds,
+            'ms_per_request': round(elapsed / rounds * 1000, 3),
+            'mb_per_sec_through_django': round(sent / elapsed / 1e6, 2) if elapsed else None,
+        }
+
+    def handle(self, *args, **opts):
+        size = int(opts['size_mb'] * 1024 * 1024)
+        rounds = opts['rounds']
+        factory = RequestFactory()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            storage = FileSystemStorage(location=tmp)
+            name = storage.save('bench.jpg', ContentFile(os.urandom(size)))
+
+            results = [
+                self._run('full', {}, rounds, storage, name, factory),
+                self._run('range_1mb', {'HTTP_RANGE': 'bytes=0-1048575'}, rounds, storage, name, factory),
+                self._run('if_none_match_304', {'HTTP_IF_NONE_MATCH': serve_file(
+                    factory.get('/bench'), storage, name)['ETag']}, rounds, storage, name, factory),
+            ]
+            with override_settings(MEDIA_ACCEL_MODE='nginx'):
+                results.append(self._run('x_accel_redirect', {}, rounds, storage, name, factory))
+
+        self.stdout.write(json.dumps({'size_bytes': size, 'results': results}, indent=2))
@@ -0,0 +1,88 @@
+# backend/api/management/commands/bench_sentiment_batch.py
+"""
+比較「逐筆 analyze_sentiment」與 micro-batching 引擎在併發下的吞吐量
+
+    python manage.py bench_sentiment_batch --threads 32 --requests 512
+"""
+import json
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.utils.warmup import emotion_models
+from api.utils.sentiment_batcher import MicroBatcher, vectorized_batch_fn
+
+SAMPLES = [
+    "今天天氣很好，和朋友去散步，心情很愉快。",
+    "考試沒考好，覺得有點沮喪。",
+    "工作好多做不完，壓力很大。",
+    "晚餐吃到喜歡的拉麵，好滿足！",
+    "跟家人吵架了，心裡很難過。",
+]
+
+
+def _drive(call, threads, total):
+    per_thread = max(1, total // threads)
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(offset):
+        local = []
+        for i in range(per_thread):
+            text = f"{SAMPLES[(offset + i) % len(SAMPLES)]} #{offset}-{i}"
+            t0 = time.perf_counter()
+            call(text)
+            local.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(local)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    t0 = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    n = len(latencies)
+    return {
+        'requests': n,
+        'seconds': round(elapsed, 4),
+        'req_per_sec': round(n / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(latencies[n // 2] * 1000, 3),
+        'p95_ms': round(latencies[min(n - 1, int(n * 0.95))] * 1000, 3),
+    }
+
+
+class Command(BaseCommand):
+    help = "情緒分析：逐筆 vs micro-batching 吞吐量比較"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=256)
+        parser.add_argument('--batch-size', type=int, default=16)
+        parser.add_argument('--wait-ms', type=float, default=10)
+
+    def handle(self, *args, **opts):
+        threads, total = opts['threads'], opts['requests']
+        if vectorized_batch_fn() is None:
+            raise CommandError("沒有向量化的批次推論（SENTIMENT_BATCH_FN / analyze_sentiment_batch），無從比較")
+
+        # 預熱：避免把模型載入時間算進任何一邊
+        emotion_models().analyze_sentiment(SAMPLES[0])
+
+        per_call = _drive(emotion_models().analyze_sentiment, threads, total)
+
+        batcher = MicroBatcher(max_batch_size=opts['batch_size'],
+                               max_wait=opts['wait_ms'] / 1000.0)
+        batched = _drive(batcher.infer, threads, total)
+        batched['engine'] = batcher.stats()
+
+        self.stdout.write(json.dumps({
+            'per_call': per_call,
+            'batched': batched,
+            'speedup': round(batched['req_per_sec'] / per_call['req_per_sec'], 2)
+            if per_call['req_per_sec'] else None,
+        }, ensure_ascii=False, indent=2))
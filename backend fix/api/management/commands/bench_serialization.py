@@ -0,0 +1,167 @@
+# backend/api/management/commands/bench_serialization.py
+"""
+回應組裝 + JSON 輸出的每列成本（不碰資料庫）
+
+    python manage.py bench_serialization --rows 1000 --rounds 50
+
+- before：舊寫法，對模型實例逐列 hasattr / getattr、每列 get_current_timezone()，DRF JSONRenderer
+- after ：values() 形狀的 dict 列、欄位集合只解析一次，FastJSONRenderer（有 orjson 時）
+資料庫讀取的差異（values() 只取需要的欄位）請用 bench_api 量測。
+"""
+import datetime
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Diary, ExpLog
+from api.renderers import FastJSONRenderer, orjson
+from api.utils.model_fields import present_fields
+from api.utils.read_payloads import BY_DATE_COLUMNS
+
+CONTENT = "今天天氣很好，和朋友去散步，心情很愉快。晚餐吃到喜歡的拉麵，好滿足！" * 4
+
+
+def _diary_values(i, today):
+    return {
+        'id': i, 'date': today - datetime.timedelta(days=i), 'created_at': timezone.now(),
+        'title': f"日記 {i}", 'content': CONTENT, 'mood': 'happy', 'emotion': 'happy',
+        'mood_color': '#ffcc00', 'weather_icon': 'sunny', 'ai_message': "聽起來是很棒的一天！",
+        'sentiment': 'positive', 'keywords': '散步, 拉麵', 'topics': '朋友, 美食',
+    }
+
+
+def _diary_before(obj):
+    """改版前 by_date 的寫法"""
+    return {
+        'id': obj.id,
+        'date': (obj.date.isoformat() if hasattr(obj, 'date') and obj.date
+                 else (obj.created_at or timezone.now()).date().isoformat()),
+        'title': getattr(obj, 'title', None),
+        'content': obj.content or '',
+        'mood': getattr(obj, 'mood', None) or getattr(obj, 'emotion', None),
+        'color': getattr(obj, 'mood_color', None),
+        'icon': getattr(obj, 'weather_icon', None),
+        'ai_analysis': getattr(obj, 'ai_message', None),
+        'ai_message': getattr(obj, 'ai_message', None),
+        'sentiment': getattr(obj, 'sentiment', None),
+        'keywords': getattr(obj, 'keywords', None),
+        'topics': getattr(obj, 'topics', None),
+        'analysis_status': 'done' if (getattr(obj, 'sentiment', None) or getattr(obj, 'ai_message', None))
+        else 'pending',
+    }
+
+
+def _diary_after(row):
+    """read_payloads.by_date_payload 現在的寫法"""
+    day = row.get('date') or (row.get('created_at') or timezone.now()).date()
+    ai_message = row.get('ai_message')
+    return {
+        'id': row['id'],
+        'date': day.isoformat(),
+        'title': row.get('title'),
+        'content': row['content'] or '',
+        'mood': row.get('mood') or row.get('emotion'),
+        'color': row.get('mood_color'),
+        'icon': row.get('weather_icon'),
+        'ai_analysis': ai_message,
+        'ai_message': ai_message,
+        'sentiment': row.get('sentiment'),
+        'keywords': row.get('keywords'),
+        'topics': row.get('topics'),
+        'analysis_status': 'done' if (row.get('sentiment') or ai_message) else 'pending',
+    }
+
+
+def _wallet_before(logs):
+    return [{
+        "time": (log.get_exp_time.astimezone(timezone.get_current_timezone())
+                 if log.get_exp_time else timezone.now()).isoformat(),
+        "delta": log.get_exp,
+        "reason": log.reason,
+        "balance": log.current_total,
+    } for log in logs]
+
+
+def _wallet_after(rows):
+    tz = timezone.get_current_timezone()
+    now = timezone.now().isoformat()
+    return [{
+        "time": row['get_exp_time'].astimezone(tz).isoformat() if row['get_exp_time'] else now,
+        "delta": row['get_exp'],
+        "reason": row['reason'],
+        "balance": row['current_total'],
+    } for row in rows]
+
+
+def _time(fn, rounds):
+    best = None
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+class Command(BaseCommand):
+    help = "overview / by_date / wallet 回應的每列組裝與 JSON 輸出成本（改版前後）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--rounds', type=int, default=30, help="每項取最快的一次")
+
+    def handle(self, *args, **opts):
+        n, rounds = max(1, opts['rows']), max(1, opts['rounds'])
+        today = timezone.localdate()
+        now = timezone.now()
+        drf, fast = JSONRenderer(), FastJSONRenderer()
+
+        diary_columns = present_fields(Diary, BY_DATE_COLUMNS)
+        diary_rows = [{k: v for k, v in _diary_values(i, today).items() if k in diary_columns} for i in range(n)]
+        diary_objs = [Diary(**row) for row in diary_rows]
+
+        ledger_columns = present_fields(ExpLog, ('id', 'get_exp_time', 'get_exp', 'reason', 'current_total'))
+        ledger_rows = [{k: v for k, v in {
+            'id': i, 'get_exp_time': now - datetime.timedelta(minutes=i), 'get_exp': 10,
+            'reason': 'achievement:first_diary', 'current_total': 10 * (n - i)}.items() if k in ledger_columns}
+            for i in range(n)]
+        ledger_objs = [ExpLog(**row) for row in ledger_rows]
+
+        overview_rows = [{
+            'id': i, 'date': (today - datetime.timedelta(days=i)).isoformat(), 'mood': 'happy', 'icon': 'sunny',
+            'color': '#ffcc00', 'has_diary': True, 'snippet': CONTENT[:60], 'has_ai': True,
+            'ai_preview': "聽起來是很棒的一天！", 'analysis_status': 'done'} for i in range(n)]
+
+        cases = {
+            'by_date': (
+                lambda: drf.render([_diary_before(o) for o in diary_objs]),
+                lambda: fast.render([_diary_after(r) for r in diary_rows]),
+            ),
+            'wallet': (
+                lambda: drf.render({'recent': _wallet_before(ledger_objs)}),
+                lambda: fast.render({'recent': _wallet_after(ledger_rows)}),
+            ),
+            'overview_render': (
+                lambda: drf.render(overview_rows),
+                lambda: fast.render(overview_rows),
+            ),
+        }
+
+        results = []
+        for name, (before, after) in cases.items():
+            t_before, t_after = _time(before, rounds), _time(after, rounds)
+            results.append({
+                'case': name,
+                'rows': n,
+                'before_us_per_row': round(t_before / n * 1e6, 3),
+                'after_us_per_row': round(t_after / n * 1e6, 3),
+                'speedup': round(t_before / t_after, 2) if t_after else None,
+            })
+
+        self.stdout.write(json.dumps({
+            'orjson': getattr(orjson, '__version__', None),
+            'results': results,
+        }, indent=2, ensure_ascii=False))
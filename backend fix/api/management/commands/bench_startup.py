@@ -0,0 +1,200 @@
+# backend/api/management/commands/bench_startup.py
+"""
+啟動成本：延遲載入 vs 啟動時就載入情緒模型
+
+    python manage.py bench_startup                      # 啟動時間 + 第一次分析延遲
+    python manage.py bench_startup --gunicorn --workers 3   # 再加上 gunicorn preload 開 / 關的 worker 記憶體
+
+- startup：新行程 django.setup() + 載入 URLconf 的時間；eager 另外載入模型（改版前每個行程都要付的成本）
+- first_analysis：新行程第一次 cached_analyze_sentiment 的延遲；warmed 先跑過 warmup(infer=True)
+- gunicorn：各 worker 的 RSS / PSS（PSS 把共用頁按比例分攤，preload 後應明顯下降）與第一個請求的延遲
+皆在子行程量測，結果以 JSON 輸出。
+"""
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+STARTUP_SCRIPT = """
+import json, sys, time
+t0 = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+startup = time.perf_counter() - t0
+if {eager}:
+    from api.utils.warmup import warmup
+    warmup()
+print(json.dumps({{'seconds': time.perf_counter() - t0, 'startup_only': startup,
+                  'model_loaded': 'api.utils.emotion_models' in sys.modules}}))
+"""
+
+FIRST_ANALYSIS_SCRIPT = """
+import json, time
+import django
+django.setup()
+from api.utils.sentiment_cache import cached_analyze_sentiment, reset_cache
+from api.utils.warmup import warmup
+if {warmed}:
+    warmup(infer=True)
+reset_cache()
+t0 = time.perf_counter()
+cached_analyze_sentiment("今天和朋友去散步，心情很好。")
+first = time.perf_counter() - t0
+t0 = time.perf_counter()
+cached_analyze_sentiment("考試沒考好，有點沮喪。")
+print(json.dumps({{'first': first, 'second': time.perf_counter() - t0}}))
+"""
+
+
+def _project_dir():
+    return str(getattr(settings, 'BASE_DIR', os.getcwd()))
+
+
+def _run_script(script, rounds):
+    env = dict(os.environ)
+    samples = []
+    for _ in range(rounds):
+        out = subprocess.run([sys.executable, '-c', script], env=env, cwd=_project_dir(),
+                             capture_output=True, text=True, check=False)
+        if out.returncode != 0:
+            raise CommandError(out.stderr.strip().splitlines()[-1] if out.stderr.strip() else "子行程失敗")
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def _ms(v):
+    return round(v * 1000, 1)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _children(pid):
+    kids = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as fh:
+                fields = fh.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            kids.append(int(entry))
+    return kids
+
+
+def _memory_kb(pid):
+    """{'rss': kB, 'pss': kB}；讀 smaps_rollup（Linux 4.14+）"""
+    result = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as fh:
+            for line in fh:
+                key, _, rest = line.partition(':')
+                if key in ('Rss', 'Pss'):
+                    result[key.lower()] = int(rest.split()[0])
+    except OSError:
+        pass
+    return result
+
+
+def _gunicorn_case(preload, workers, boot_timeout):
+    port = _free_port()
+    env = dict(os.environ, GUNICORN_PRELOAD='1' if preload else '0',
+               GUNICORN_BIND=f'127.0.0.1:{port}', GUNICORN_WORKERS=str(workers))
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+                            cwd=_project_dir(), env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        # master 綁好 port 前連不上；綁好後請求會排隊等 worker 接，量到的就是第一個請求的等待時間
+        deadline = time.monotonic() + boot_timeout
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+                break
+            except OSError:
+                if proc.poll() is not None or time.monotonic() > deadline:
+                    raise CommandError("gunicorn 未能啟動")
+                time.sleep(0.05)
+        listening = time.perf_counter() - t0
+
+        t1 = time.perf_counter()
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=boot_timeout) as resp:
+            resp.read()
+        first_request = time.perf_counter() - t1
+
+        # 等所有 worker 都起來、預熱完再量記憶體
+        while len(_children(proc.pid)) < workers and time.monotonic() < deadline:
+            time.sleep(0.1)
+        time.sleep(1.0)
+        per_worker = [_memory_kb(pid) for pid in _children(proc.pid)]
+        return {
+            'preload': preload,
+            'workers': len(per_worker),
+            'listening_ms': _ms(listening),
+            'first_request_ms': _ms(first_request),
+            'master_kb': _memory_kb(proc.pid),
+            'worker_kb': per_worker,
+            'worker_rss_kb_mean': round(statistics.mean(w.get('rss', 0) for w in per_worker)) if per_worker else None,
+            'worker_pss_kb_mean': round(statistics.mean(w.get('pss', 0) for w in per_worker)) if per_worker else None,
+        }
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+class Command(BaseCommand):
+    help = "啟動時間、第一次分析延遲與 gunicorn worker 記憶體（延遲載入 vs 預先載入）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=3, help="每種情境的子行程次數（取中位數）")
+        parser.add_argument('--gunicorn', action='store_true', help="量測 gunicorn preload 開 / 關")
+        parser.add_argument('--workers', type=int, default=3)
+        parser.add_argument('--boot-timeout', type=float, default=120)
+
+    def handle(self, *args, **opts):
+        rounds = max(1, opts['rounds'])
+        report = {'startup': {}, 'first_analysis': {}}
+
+        for label, eager in (('lazy', False), ('eager', True)):
+            samples = _run_script(STARTUP_SCRIPT.format(eager=eager), rounds)
+            report['startup'][label] = {
+                'median_ms': _ms(statistics.median(s['seconds'] for s in samples)),
+                'django_setup_median_ms': _ms(statistics.median(s['startup_only'] for s in samples)),
+                'model_loaded': samples[0]['model_loaded'],
+            }
+
+        for label, warmed in (('cold', False), ('warmed', True)):
+            samples = _run_script(FIRST_ANALYSIS_SCRIPT.format(warmed=warmed), rounds)
+            report['first_analysis'][label] = {
+                'first_ms': _ms(statistics.median(s['first'] for s in samples)),
+                'second_ms': _ms(statistics.median(s['second'] for s in samples)),
+            }
+
+        if opts['gunicorn']:
+            try:
+                import gunicorn  # noqa: F401
+            except ImportError:
+                raise CommandError("未安裝 gunicorn")
+            report['gunicorn'] = [
+                _gunicorn_case(preload, opts['workers'], opts['boot_timeout'])
+                for preload in (False, True)
+            ]
+
+        self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
@@ -0,0 +1,71 @@
+# backend/api/management/commands/ensure_indexes.py
+"""
+建立 api/indexes.py 宣告的複合索引（已存在的略過）
+
+    python manage.py ensure_indexes            # 建立缺少的索引
+    python manage.py ensure_indexes --dry-run  # 只列出會建立哪些
+    python manage.py ensure_indexes --explain  # 對代表性查詢跑 EXPLAIN，確認走索引、沒有額外排序
+"""
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.indexes import PLAN_CHECKS, ensure_indexes
+
+# 查詢計畫裡代表「另外排序」的字樣
+_SORT_RE = re.compile(r'TEMP B-TREE FOR (RIGHT PART OF )?ORDER BY|\bSort\b|filesort', re.IGNORECASE)
+_PARTIAL_SORT_RE = re.compile(r'RIGHT PART OF ORDER BY|Incremental Sort', re.IGNORECASE)
+
+
+class Command(BaseCommand):
+    help = "建立列表 / 分頁查詢用的複合索引"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument('--explain', action='store_true', help="只檢查查詢計畫，不建立索引")
+
+    def handle(self, *args, **opts):
+        if opts['explain']:
+            return self._explain()
+
+        created = 0
+        for table, name, state in ensure_indexes(dry_run=opts['dry_run']):
+            if state == 'exists':
+                self.stdout.write(f"{table}.{name}：已存在")
+            elif state == 'planned':
+                self.stdout.write(f"{table}.{name}：將建立")
+            else:
+                created += 1
+                self.stdout.write(self.style.SUCCESS(f"{table}.{name}：已建立"))
+
+        if not opts['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"完成，新建 {created} 個索引"))
+
+    def _explain(self):
+        failed = 0
+        for name, (build, index_name) in PLAN_CHECKS.items():
+            with transaction.atomic():
+                if connection.vendor == 'postgresql':
+                    # 資料量小時 planner 會直接 seq scan；關掉後看的是「索引能不能用」
+                    with connection.cursor() as cursor:
+                        cursor.execute("SET LOCAL enable_seqscan = off")
+                plan = build().explain()
+
+            uses_index = index_name in plan
+            sort = _SORT_RE.search(plan)
+            if not uses_index:
+                verdict, style = f"未使用 {index_name}", self.style.ERROR
+                failed += 1
+            elif sort and _PARTIAL_SORT_RE.search(plan):
+                verdict, style = f"使用 {index_name}（尾段仍需局部排序）", self.style.WARNING
+            elif sort:
+                verdict, style = f"使用 {index_name}，但需要完整排序", self.style.ERROR
+                failed += 1
+            else:
+                verdict, style = f"使用 {index_name}，不需排序", self.style.SUCCESS
+            self.stdout.write(style(f"{name}：{verdict}"))
+            self.stdout.write("  " + plan.replace("\n", "\n  "))
+
+        if failed:
+            raise CommandError(f"{failed} 個查詢沒有照預期使用索引（先執行 ensure_indexes 建立）")
@@ -0,0 +1,26 @@
+# backend/api/management/commands/ensure_schema.py
+"""
+部署時在 migrate 之後執行：建立 api/schema.py 的原生 SQL 資料表與 api/indexes.py 的複合索引（已存在的略過）
+
+    python manage.py migrate && python manage.py ensure_schema
+"""
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from api.indexes import ensure_indexes
+from api.schema import ensure_schema
+
+
+class Command(BaseCommand):
+    help = "建立 api/schema.py 的資料表與 api/indexes.py 的索引"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **opts):
+        tables = ensure_schema(using=opts['database'])
+        self.stdout.write(f"資料表：{', '.join(tables)}")
+        created = [f"{table}.{name}" for table, name, state in ensure_indexes(using=opts['database'])
+                   if state == 'created']
+        self.stdout.write(self.style.SUCCESS(f"完成，新建 {len(created)} 個索引"
+                                             + (f"：{', '.join(created)}" if created else "")))
@@ -0,0 +1,23 @@
+# backend/api/management/commands/prune_sync_journal.py
+"""
+清除舊的增量同步日誌（api_sync_journal）
+
+    python manage.py prune_sync_journal             # 保留最近 30 天
+    python manage.py prune_sync_journal --days 7
+
+cursor 落在被清掉範圍內的 client，下次 ?since= 會收到 reset=true 並重新完整下載。
+"""
+from django.core.management.base import BaseCommand
+
+from api.utils.sync_journal import prune
+
+
+class Command(BaseCommand):
+    help = "清除舊的增量同步日誌"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help="保留最近幾天（預設 30）")
+
+    def handle(self, *args, **opts):
+        count = prune(max(0, opts['days']) * 24 * 3600)
+        self.stdout.write(self.style.SUCCESS(f"完成，已刪除 {count} 筆日誌"))
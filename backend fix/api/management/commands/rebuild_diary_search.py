@@ -0,0 +1,25 @@
+# backend/api/management/commands/rebuild_diary_search.py
+"""
+重建日記全文索引（首次上線、改斷詞規則、索引與資料不一致時）
+
+    python manage.py rebuild_diary_search
+    python manage.py rebuild_diary_search --user 42
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api.utils.diary_search import rebuild
+
+
+class Command(BaseCommand):
+    help = "重建日記全文索引"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help="只重建指定 user id")
+
+    def handle(self, *args, **opts):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.stdout.write(self.style.WARNING(f"{connection.vendor} 不支援全文索引，搜尋會退回 icontains"))
+            return
+        count = rebuild(user_id=opts['user'])
+        self.stdout.write(self.style.SUCCESS(f"完成，已索引 {count} 篇日記"))
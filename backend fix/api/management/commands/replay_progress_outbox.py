@@ -0,0 +1,30 @@
+# backend/api/management/commands/replay_progress_outbox.py
+"""
+套用 api_progress_outbox 中還沒套用的成就進度事件（行程當掉、沒有 worker 在跑時使用）
+
+    python manage.py replay_progress_outbox              # 全部套用
+    python manage.py replay_progress_outbox --dry-run    # 只列出待套用的筆數
+    python manage.py replay_progress_outbox --retry-dead # 連同失敗過多次的 dead letter 一起重試
+
+每組「刪除事件 + 套用進度」在同一個交易內，和執行中的 worker 同時跑也不會重複套用。
+"""
+from django.core.management.base import BaseCommand
+
+from api.utils.progress_outbox import dead_count, drain_all, pending_count, retry_dead
+
+
+class Command(BaseCommand):
+    help = "套用成就進度 outbox 中待處理的事件"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument('--retry-dead', action='store_true', help="dead letter 的 attempts 歸零後一起套用")
+
+    def handle(self, *args, **opts):
+        self.stdout.write(f"待套用：{pending_count()} 筆，dead letter：{dead_count()} 筆")
+        if opts['dry_run']:
+            return
+        if opts['retry_dead']:
+            self.stdout.write(f"重試 dead letter：{retry_dead()} 筆")
+        replayed = drain_all()
+        self.stdout.write(self.style.SUCCESS(f"完成，共套用 {replayed} 筆"))
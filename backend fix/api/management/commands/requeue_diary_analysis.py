@@ -0,0 +1,30 @@
+# backend/api/management/commands/requeue_diary_analysis.py
+"""
+重新分析停在 pending（行程重啟時 worker pool 裡的工作遺失）或 failed 的日記
+
+    python manage.py requeue_diary_analysis                  # pending 超過 10 分鐘的
+    python manage.py requeue_diary_analysis --failed         # 連同 failed（含舊版 sentiment='failed' 的日記）
+    python manage.py requeue_diary_analysis --min-age 0 --dry-run
+
+在這個指令的行程內分析完才結束，結果與狀態照常寫回（內容已被改過的不會被舊結果覆蓋）。
+"""
+from django.core.management.base import BaseCommand
+
+from api.utils.diary_analysis import requeue
+
+
+class Command(BaseCommand):
+    help = "重新分析 pending / failed 的日記"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--failed', action='store_true', help="連同 failed 的日記一起重新分析")
+        parser.add_argument('--min-age', type=int, default=600,
+                            help="只處理排入超過幾秒的（預設 600，避免和執行中的 worker 重複）")
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **opts):
+        ids = requeue(include_failed=opts['failed'], min_age=max(0, opts['min_age']), dry_run=opts['dry_run'])
+        if opts['dry_run']:
+            self.stdout.write(f"待重新分析：{len(ids)} 篇")
+            return
+        self.stdout.write(self.style.SUCCESS(f"完成，已重新分析 {len(ids)} 篇"))
@@ -0,0 +1,59 @@
+# backend/api/management/commands/sync_sqlite_replica.py
+"""
+本機模擬讀寫分離：把 primary 的 SQLite 檔複製到 replica 的 SQLite 檔
+
+    python manage.py sync_sqlite_replica                 # 同步一次
+    python manage.py sync_sqlite_replica --interval 2    # 每 2 秒同步一次（模擬複寫延遲），Ctrl+C 結束
+
+settings.DATABASES 的 default 與 replica（DATABASE_REPLICA['ALIAS']）都必須是 SQLite 檔案。
+"""
+import sqlite3
+import time
+from contextlib import closing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from api.db_routers import replica_alias
+
+
+def _sqlite_path(alias):
+    conf = settings.DATABASES[alias]
+    if not conf['ENGINE'].endswith('sqlite3'):
+        raise CommandError(f"{alias} 不是 SQLite")
+    name = str(conf['NAME'])
+    if name == ':memory:' or 'mode=memory' in name:
+        raise CommandError(f"{alias} 是記憶體資料庫，無法複製")
+    return name
+
+
+class Command(BaseCommand):
+    help = "把 primary SQLite 複製到 replica SQLite（本機測試 ReplicaRouter 用）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help="持續同步的間隔秒數")
+
+    def _copy(self, src, dest):
+        t0 = time.perf_counter()
+        with closing(sqlite3.connect(src)) as source, closing(sqlite3.connect(dest)) as target:
+            source.backup(target)  # 一致性快照，primary 寫入中也安全
+        self.stdout.write(f"已同步 {src} → {dest}（{(time.perf_counter() - t0) * 1000:.1f}ms）")
+
+    def handle(self, *args, **opts):
+        alias = replica_alias()
+        if alias is None:
+            raise CommandError("DATABASES 裡沒有 replica（見 DATABASE_REPLICA['ALIAS']）")
+        src, dest = _sqlite_path(DEFAULT_DB_ALIAS), _sqlite_path(alias)
+        if src == dest:
+            raise CommandError("primary 與 replica 是同一個檔案")
+
+        self._copy(src, dest)
+        if not opts['interval']:
+            return
+        try:
+            while True:
+                time.sleep(opts['interval'])
+                self._copy(src, dest)
+        except KeyboardInterrupt:
+            pass
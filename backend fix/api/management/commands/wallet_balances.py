@@ -0,0 +1,55 @@
+# backend/api/management/commands/wallet_balances.py
+"""
+檢查 / 重建物化餘額（ExpLog.current_total）
+
+    python manage.py wallet_balances            # 只檢查，列出不一致的使用者
+    python manage.py wallet_balances --fix      # 依流水重算並寫回
+    python manage.py wallet_balances --user 42  # 只處理指定使用者
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from api.models import ExpLog
+from api.utils.wallet import OLDEST_FIRST, wallet_lock
+
+
+class Command(BaseCommand):
+    help = "檢查 / 重建情緒餘額（ExpLog.current_total）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="依流水重算並寫回")
+        parser.add_argument('--user', type=int, action='append', help="只處理指定 user id（可重複）")
+
+    def handle(self, *args, **opts):
+        user_ids = ExpLog.objects.values_list('user_id', flat=True).distinct().order_by('user_id')
+        if opts['user']:
+            user_ids = user_ids.filter(user_id__in=opts['user'])
+
+        bad_users = fixed_rows = 0
+        for user in User.objects.filter(id__in=list(user_ids)).order_by('id').iterator():
+            with wallet_lock(user):
+                running = 0
+                stale = []
+                for log in (ExpLog.objects.filter(user=user)
+                            .order_by(*OLDEST_FIRST)  # 與讀餘額（NEWEST_FIRST 的第一筆）同一個順序
+                            .only('id', 'get_exp', 'current_total')
+                            .iterator()):
+                    running += log.get_exp or 0
+                    if log.current_total != running:
+                        log.current_total = running
+                        stale.append(log)
+
+                if not stale:
+                    continue
+                bad_users += 1
+                self.stdout.write(f"user {user.id}: {len(stale)} 筆 current_total 不一致（應為 {running}）")
+                if opts['fix']:
+                    ExpLog.objects.bulk_update(stale, ['current_total'], batch_size=500)
+                    fixed_rows += len(stale)
+
+        if opts['fix']:
+            self.stdout.write(self.style.SUCCESS(f"完成：{bad_users} 位使用者，修正 {fixed_rows} 筆"))
+        elif bad_users:
+            self.stdout.write(self.style.WARNING(f"{bad_users} 位使用者餘額不一致，加上 --fix 重建"))
+        else:
+            self.stdout.write(self.style.SUCCESS("餘額全部一致"))
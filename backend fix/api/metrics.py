@@ -0,0 +1,356 @@
+# backend/api/metrics.py
+"""
+每個請求的效能量測 + Prometheus 格式的 /metrics
+
+依路由名稱（例如 diary-overview、achievements-claim）記錄：
+  - 整體耗時、回應大小
+  - SQL 查詢數與查詢總耗時（常駐在各連線的 execute wrapper，只記到 context 裡的請求）
+  - 各階段耗時：情緒分析（sentiment）、Token 驗證（auth）……由 observe_stage() 標記
+數值放在行程內的 histogram；多個 gunicorn worker 時每個 worker 各自一份，
+由 Prometheus 分別抓取後再加總。
+
+超過門檻的請求寫進 logger 'api.slow_requests'，附最慢的幾條 SQL 與重複查詢次數。
+
+settings.py：
+    MIDDLEWARE = [..., 'api.metrics.MetricsMiddleware']   # 越前面量到的越完整
+    METRICS = {                      # 皆可省略
+        'ENABLED': True,
+        'SLOW_REQUEST_MS': 500,      # 慢請求門檻；None 關閉慢請求紀錄
+        'SLOW_QUERY_LIMIT': 10,      # 慢請求紀錄裡列出幾條最慢的 SQL
+        'TOKEN': None,               # Prometheus 用 Authorization: Bearer <TOKEN> 抓取
+        'ALLOWED_IPS': None,         # 另外限制 /metrics 只接受這些 IP / 網段；None 代表不限制來源
+        'TRUSTED_PROXIES': (),       # 前面的反向代理（IP / 網段）；從這些位址來的請求改看 X-Forwarded-For
+    }
+
+/metrics 預設不公開：必須帶正確的 Bearer token，或是以 staff 身分登入（session 或 Token）。
+"""
+import asyncio
+import bisect
+import hmac
+import ipaddress
+import json
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from rest_framework import exceptions
+
+try:
+    from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+except ImportError:  # asgiref < 3.6
+    from asyncio import iscoroutinefunction
+
+    def markcoroutinefunction(func):
+        func._is_coroutine = asyncio.coroutines._is_coroutine
+        return func
+
+slow_logger = logging.getLogger('api.slow_requests')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+MAX_RECORDED_QUERIES = 500   # 單一請求最多保留幾條 SQL 給慢請求紀錄用
+
+_NUMBER_RE = re.compile(r"\b\d+\b|'(?:[^']|'')*'")
+
+
+def _conf():
+    return dict(getattr(settings, 'METRICS', {}) or {})
+
+
+def is_enabled() -> bool:
+    return bool(_conf().get('ENABLED', True))
+
+
+# ---------- histogram ----------
+
+class Histogram:
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}   # label 值 tuple -> [各 bucket 次數..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if idx < len(self.buckets):
+                series[idx] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def expose(self):
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values in sorted(snapshot):
+            series = snapshot[label_values]
+            base = [f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values)]
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(base, bound)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(base, '+Inf')} {series[-1]}")
+            suffix = _labels(base)
+            lines.append(f"{self.name}_sum{suffix} {series[-2]}")
+            lines.append(f"{self.name}_count{suffix} {series[-1]}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs, le=None):
+    if le is not None:
+        pairs = pairs + [f'le="{le}"']
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+REQUEST_SECONDS = Histogram('api_request_duration_seconds', "請求整體耗時",
+                            ('route', 'method', 'status'), DURATION_BUCKETS)
+SQL_QUERIES = Histogram('api_request_sql_queries', "每個請求的 SQL 查詢數", ('route',), COUNT_BUCKETS)
+SQL_SECONDS = Histogram('api_request_sql_duration_seconds', "每個請求的 SQL 總耗時", ('route',), DURATION_BUCKETS)
+STAGE_SECONDS = Histogram('api_request_stage_duration_seconds', "每個請求各階段（sentiment / auth）的耗時",
+                          ('route', 'stage'), DURATION_BUCKETS)
+RESPONSE_BYTES = Histogram('api_response_size_bytes', "回應大小", ('route',), SIZE_BUCKETS)
+BACKGROUND_SECONDS = Histogram('api_background_stage_duration_seconds', "請求以外（背景 worker）各階段耗時",
+                               ('stage',), DURATION_BUCKETS)
+
+HISTOGRAMS = (REQUEST_SECONDS, SQL_QUERIES, SQL_SECONDS, STAGE_SECONDS, RESPONSE_BYTES, BACKGROUND_SECONDS)
+
+
+def reset_metrics():
+    for histogram in HISTOGRAMS:
+        histogram.clear()
+
+
+def render_metrics() -> str:
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.expose())
+    return '\n'.join(lines) + '\n'
+
+
+# ---------- 單一請求的統計 ----------
+
+class RequestStats:
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.queries = []    # [(耗時, sql), ...]，最多 MAX_RECORDED_QUERIES 條
+        self.stages = {}     # stage -> 秒
+
+    def add_query(self, sql, seconds):
+        self.sql_count += 1
+        self.sql_seconds += seconds
+        if len(self.queries) < MAX_RECORDED_QUERIES:
+            self.queries.append((seconds, sql))
+
+
+_current = ContextVar('api_request_stats', default=None)
+
+
+@contextmanager
+def observe_stage(stage):
+    """標記一段工作的耗時；在請求內記到該請求，在背景 worker 記到 background histogram"""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        stats = _current.get()
+        if stats is not None:
+            stats.stages[stage] = stats.stages.get(stage, 0.0) + elapsed
+        elif is_enabled():
+            BACKGROUND_SECONDS.observe(elapsed, stage)
+
+
+def _sql_wrapper(execute, sql, params, many, context):
+    t0 = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats = _current.get()
+        if stats is not None:
+            stats.add_query(sql, time.perf_counter() - t0)
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.url_name or 'unnamed'
+
+
+def _response_size(response):
+    if getattr(response, 'streaming', False):
+        return int(response.get('Content-Length') or 0)
+    return len(response.content)
+
+
+def _query_breakdown(stats, limit):
+    """最慢的幾條 SQL + 同一形狀（數字 / 字串換成 ?）出現的次數，方便看出 N+1"""
+    slowest = sorted(stats.queries, key=lambda q: q[0], reverse=True)[:limit]
+    shapes = {}
+    for _, sql in stats.queries:
+        shape = _NUMBER_RE.sub('?', sql)
+        shapes[shape] = shapes.get(shape, 0) + 1
+    repeated = sorted(((n, s) for s, n in shapes.items() if n > 1), reverse=True)[:limit]
+    return (
+        [{'ms': round(sec * 1000, 3), 'sql': sql[:500]} for sec, sql in slowest],
+        [{'count': n, 'sql': shape[:500]} for n, shape in repeated],
+    )
+
+
+class MetricsMiddleware:
+    """同時支援 WSGI 與 ASGI：上游是 async 時整條走 __acall__，不必每個請求切執行緒"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not is_enabled():
+            return self.get_response(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        t0 = time.perf_counter()
+        try:
+            _attach_sql_wrapper()
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        _record(request, response, stats, time.perf_counter() - t0)
+        return response
+
+    async def __acall__(self, request):
+        if not is_enabled():
+            return await self.get_response(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        t0 = time.perf_counter()
+        try:
+            # 連線是每個執行緒各一份：要掛在之後跑 ORM 的那條 sync 執行緒上（thread_sensitive 同一條）
+            await sync_to_async(_attach_sql_wrapper)()
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        _record(request, response, stats, time.perf_counter() - t0)
+        return response
+
+
+def _attach_sql_wrapper():
+    """
+    在目前執行緒的每條連線上常駐掛 _sql_wrapper（只掛一次）。
+    它只記到 context 裡的那個請求，不在請求內只多一次計時；
+    常駐而不是每個請求掛上再拿掉，ASGI 下並行的請求共用同一條 sync 執行緒時才不會重複計算。
+    """
+    for conn in connections.all():
+        if _sql_wrapper not in conn.execute_wrappers:
+            conn.execute_wrappers.append(_sql_wrapper)
+
+
+def _record(request, response, stats, elapsed):
+    route = _route(request)
+    REQUEST_SECONDS.observe(elapsed, route, request.method, str(response.status_code))
+    SQL_QUERIES.observe(stats.sql_count, route)
+    SQL_SECONDS.observe(stats.sql_seconds, route)
+    for stage, seconds in stats.stages.items():
+        STAGE_SECONDS.observe(seconds, route, stage)
+    size = _response_size(response)
+    RESPONSE_BYTES.observe(size, route)
+
+    threshold = _conf().get('SLOW_REQUEST_MS', 500)
+    if threshold is not None and elapsed * 1000 >= threshold:
+        slowest, repeated = _query_breakdown(stats, _conf().get('SLOW_QUERY_LIMIT', 10))
+        detail = {
+            'route': route,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'ms': round(elapsed * 1000, 3),
+            'sql_count': stats.sql_count,
+            'sql_ms': round(stats.sql_seconds * 1000, 3),
+            'stages_ms': {k: round(v * 1000, 3) for k, v in stats.stages.items()},
+            'response_bytes': size,
+            'slowest_queries': slowest,
+            'repeated_queries': repeated,
+        }
+        slow_logger.warning("慢請求 %s", json.dumps(detail, ensure_ascii=False), extra={'slow_request': detail})
+
+
+def _networks(values):
+    return [ipaddress.ip_network(str(v), strict=False) for v in values or ()]
+
+
+def _in(address, networks):
+    try:
+        ip = ipaddress.ip_address(address.strip())
+    except ValueError:
+        return False
+    return any(ip in net for net in networks)
+
+
+def client_ip(request):
+    """REMOTE_ADDR 是信任的 proxy 時，從 X-Forwarded-For 由右往左取第一個不是 proxy 的位址"""
+    proxies = _networks(_conf().get('TRUSTED_PROXIES'))
+    addr = request.META.get('REMOTE_ADDR', '')
+    if not _in(addr, proxies):
+        return addr
+    for hop in reversed(request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')):
+        hop = hop.strip()
+        if hop and not _in(hop, proxies):
+            return hop
+    return addr
+
+
+def _authorized(request):
+    token = _conf().get('TOKEN')
+    scheme, _, credential = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    if token and scheme.lower() == 'bearer' and hmac.compare_digest(credential.strip().encode(), str(token).encode()):
+        return True
+
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        from .authentication import CachedTokenAuthentication   # authentication 也 import 這個模組
+        try:
+            result = CachedTokenAuthentication().authenticate(request)
+        except exceptions.AuthenticationFailed:
+            result = None
+        user = result[0] if result else None
+    return bool(user and user.is_active and user.is_staff)
+
+
+def metrics_view(request):
+    """GET /metrics：Prometheus text exposition format"""
+    allowed = _conf().get('ALLOWED_IPS')
+    if allowed is not None and not _in(client_ip(request), _networks(allowed)):
+        return HttpResponseForbidden()
+    if not _authorized(request):
+        response = HttpResponse("Unauthorized", status=401, content_type='text/plain; charset=utf-8')
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,160 @@
+# backend/api/pagination.py
+"""
+Keyset（cursor）分頁
+
+每個 ViewSet 以 keyset_ordering 宣告排序（最後一欄固定是 id 當 tiebreak），
+下一頁用「上一頁最後一筆的排序值」做範圍條件，搭配 (user, 排序欄, id) 複合索引
+每一頁都是 index range scan，不會因為 OFFSET 越翻越慢。
+
+    GET /api/diaries/?page_size=20
+    GET /api/diaries/?page_size=20&cursor=<next_cursor>
+    → {"results": [...], "next_cursor": "..." | null}
+
+舊版 App 不帶 cursor / page_size：settings.API_LEGACY_UNPAGINATED 為 True（預設）時
+照舊回傳完整陣列；等舊版淘汰後改成 False 即全部分頁。
+
+可為 NULL 的排序欄把 NULL 當成最小值（升冪排最前、降冪排最後，與 SQLite 索引的順序相同），
+排序與 cursor 條件都明寫，不依賴各資料庫不同的預設；NOT NULL 的欄位維持原本的排序寫法。
+"""
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def _dump(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def _ordering(self, view):
+        ordering = tuple(getattr(view, 'keyset_ordering', None) or ('id',))
+        if ordering[-1].lstrip('-') != 'id':
+            ordering += ('-id' if ordering[0].startswith('-') else 'id',)
+        return ordering
+
+    @staticmethod
+    def _nullable(model, name):
+        return model._meta.get_field(name).null
+
+    def _order_by(self, ordering, model):
+        """可為 NULL 的欄位明寫 NULL 位置（當成最小值）"""
+        exprs = []
+        for field in ordering:
+            name = field.lstrip('-')
+            if not self._nullable(model, name):
+                exprs.append(field)
+            elif field.startswith('-'):
+                exprs.append(F(name).desc(nulls_last=True))
+            else:
+                exprs.append(F(name).asc(nulls_first=True))
+        return exprs
+
+    def _wants_page(self, request):
+        params = request.query_params
+        if self.cursor_query_param in params or self.page_size_query_param in params:
+            return True
+        return not getattr(settings, 'API_LEGACY_UNPAGINATED', True)
+
+    def _page_size(self, request):
+        raw = request.query_params.get(self.page_size_query_param)
+        default = getattr(settings, 'API_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+        if raw in (None, ''):
+            return default
+        try:
+            return max(1, min(int(raw), MAX_PAGE_SIZE))
+        except ValueError:
+            raise ValidationError({self.page_size_query_param: "需為正整數"})
+
+    # ---------- cursor 編解碼 ----------
+    def _encode(self, obj, fields):
+        values = [_dump(getattr(obj, f)) for f in fields]
+        raw = json.dumps(values, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def _decode(self, cursor, fields, model):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            if not isinstance(values, list) or len(values) != len(fields):
+                raise ValueError
+            decoded = []
+            for name, value in zip(fields, values):
+                if value is None:
+                    if not self._nullable(model, name):
+                        raise ValueError
+                elif model._meta.get_field(name).get_internal_type() == 'DateTimeField':
+                    value = parse_datetime(value)
+                    if value is None:
+                        raise ValueError
+                decoded.append(value)
+            return decoded
+        except (ValueError, TypeError, UnicodeDecodeError):
+            raise ValidationError({self.cursor_query_param: "cursor 格式錯誤"})
+
+    @staticmethod
+    def _equal(name, value):
+        return Q(**{f'{name}__isnull': True}) if value is None else Q(**{name: value})
+
+    @staticmethod
+    def _beyond(field, value):
+        """可為 NULL 的單一欄位嚴格排在 value 之後的條件"""
+        name = field.lstrip('-')
+        descending = field.startswith('-')
+        if value is None:
+            # NULL 是最小值：降冪時已是最後一組，升冪時後面是所有非 NULL
+            return Q(pk__in=[]) if descending else Q(**{f'{name}__isnull': False})
+        term = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+        if descending:
+            term |= Q(**{f'{name}__isnull': True})  # 可為 NULL 的欄位：NULL 排在所有值之後
+        return term
+
+    def _after(self, ordering, values, model):
+        """(f1, f2, ...) 嚴格排在 values 之後的條件：f1 > v1 OR (f1 = v1 AND f2 > v2) ..."""
+        condition = Q()
+        for i, field in enumerate(ordering):
+            name = field.lstrip('-')
+            if self._nullable(model, name):
+                term = self._beyond(field, values[i])
+            else:
+                term = Q(**{f"{name}__{'lt' if field.startswith('-') else 'gt'}": values[i]})
+            for prev_field, prev_value in zip(ordering[:i], values[:i]):
+                term &= self._equal(prev_field.lstrip('-'), prev_value)
+            condition |= term
+        return condition
+
+    # ---------- DRF 介面 ----------
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self._wants_page(request):
+            return None  # 舊版行為：完整陣列
+
+        ordering = self._ordering(view)
+        fields = [f.lstrip('-') for f in ordering]
+        size = self._page_size(request)
+
+        model = queryset.model
+        queryset = queryset.order_by(*self._order_by(ordering, model))
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self._after(ordering, self._decode(cursor, fields, model), model))
+
+        rows = list(queryset[:size + 1])
+        self.next_cursor = None
+        if len(rows) > size:
+            rows = rows[:size]
+            self.next_cursor = self._encode(rows[-1], fields)
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({'results': data, 'next_cursor': self.next_cursor})
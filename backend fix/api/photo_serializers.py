@@ -0,0 +1,47 @@
+# backend/api/photo_serializers.py
+from django.urls import reverse
+from rest_framework import serializers
+
+from .serializers import PhotoSerializer
+from .utils.photo_pipeline import VARIANTS, photo_file_field, ready_variants
+
+
+_BASE_FIELDS = getattr(PhotoSerializer.Meta, 'fields', None)
+
+
+class PhotoVariantListSerializer(serializers.ListSerializer):
+    """列表先一次查出整頁照片已產生的尺寸，放進 context 給每一筆用"""
+
+    def to_representation(self, data):
+        items = list(data.all() if hasattr(data, 'all') else data)
+        self.context['ready_variants'] = ready_variants(items)
+        return super().to_representation(items)
+
+
+class PhotoVariantSerializer(PhotoSerializer):
+    """PhotoSerializer + 各尺寸網址：{"thumb": url|null, "display": url|null}"""
+    variants = serializers.SerializerMethodField()
+
+    class Meta(PhotoSerializer.Meta):
+        list_serializer_class = PhotoVariantListSerializer
+        # '__all__' / exclude 會自動帶入宣告欄位，只有明列 fields 時要補上
+        if isinstance(_BASE_FIELDS, (list, tuple)):
+            fields = list(_BASE_FIELDS) + ['variants']
+
+    def get_variants(self, obj):
+        """指向需驗證的 /api/photos/{id}/file/?variant=... ，不直接暴露 MEDIA_URL"""
+        if not getattr(obj, photo_file_field(), None):
+            return {}
+        prefetched = self.context.get('ready_variants')
+        if prefetched is None or obj.pk not in prefetched:
+            prefetched = ready_variants([obj])
+        ready = prefetched.get(obj.pk, set())
+        base = reverse('photo-file', kwargs={'pk': obj.pk})
+        request = self.context.get('request')
+        urls = {}
+        for variant in VARIANTS:
+            url = f"{base}?variant={variant}" if variant in ready else None
+            if url and request is not None:
+                url = request.build_absolute_uri(url)
+            urls[variant] = url
+        return urls
@@ -0,0 +1,48 @@
+# backend/api/renderers.py
+"""
+orjson 版 JSON renderer（選用）
+
+輸出與 DRF JSONRenderer 相同（UTF-8、不跳脫中文、緊湊分隔、datetime / Decimal 等交給 DRF 的 encoder），
+只是快很多。沒裝 orjson 或資料含 orjson 不支援的型別時自動退回 DRF 的 JSONRenderer。
+
+逐個 view 開啟：
+    renderer_classes = FAST_RENDERERS
+    @action(..., renderer_classes=FAST_RENDERERS)
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # 選用套件
+    orjson = None
+
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    # OPT_PASSTHROUGH_SUBCLASS：ReturnDict / ReturnList / ErrorDetail 之類的子類別轉回基本型別
+    for base in (str, dict, list, int, float):
+        if isinstance(obj, base):
+            return base(obj)
+    # OPT_PASSTHROUGH_DATETIME：與 DRF 相同的 datetime 格式（毫秒、UTC 寫成 Z）
+    return _encoder.default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            return orjson.dumps(
+                data, default=_default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_SUBCLASS | orjson.OPT_NON_STR_KEYS,
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+# 第一個換成 FastJSONRenderer，其餘（例如 BrowsableAPIRenderer）照 settings
+FAST_RENDERERS = [FastJSONRenderer] + [r for r in api_settings.DEFAULT_RENDERER_CLASSES
+                                      if not issubclass(r, JSONRenderer)]
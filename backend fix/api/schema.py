@@ -0,0 +1,91 @@
+# backend/api/schema.py
+"""
+不屬於任何 Django 模型、以原生 SQL 存取的資料表
+
+部署時在 migrate 之後執行 `python manage.py ensure_schema` 建立（已存在的略過），
+同一個指令也會建立 indexes.py 宣告的複合索引。請求路徑不再建表：表不存在時查詢直接報錯，
+不會在呼叫端的交易裡偷偷執行 DDL。
+
+    api_sync_seq / api_sync_journal   增量同步的序號與變更日誌（utils/sync_journal.py）
+    api_progress_outbox               成就進度 write-behind 事件（utils/progress_outbox.py）
+    api_insights_day                  心情 / 情緒統計的每日 rollup（utils/insights.py）
+    api_diary_fts / api_diary_search  日記全文索引，SQLite FTS5 / PostgreSQL tsvector（utils/diary_search.py）
+    api_diary_analysis                日記背景 AI 分析的 pending / failed 狀態（utils/analysis_state.py）
+    api_photo_blob                    照片 (使用者, 內容雜湊) 唯一與已產生的縮圖尺寸（utils/photo_pipeline.py）
+    api_achievement_claim             成就領取紀錄，每日成就一天一筆（utils/achievement_status.py）
+"""
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+# 表名: {vendor 或 '*': [DDL, ...]}；只有對應 vendor 才建的表不寫 '*'
+TABLES = {
+    'api_sync_seq': {'*': [
+        "CREATE TABLE IF NOT EXISTS api_sync_seq ("
+        "user_id integer PRIMARY KEY, seq bigint NOT NULL, pruned_through bigint NOT NULL DEFAULT 0)",
+    ]},
+    'api_sync_journal': {'*': [
+        "CREATE TABLE IF NOT EXISTS api_sync_journal ("
+        "user_id integer NOT NULL, seq bigint NOT NULL, resource varchar(16) NOT NULL, "
+        "object_id bigint NOT NULL, op varchar(8) NOT NULL, created_ts bigint NOT NULL, "
+        "PRIMARY KEY (user_id, seq))",
+    ]},
+    'api_progress_outbox': {'*': [
+        "CREATE TABLE IF NOT EXISTS api_progress_outbox ("
+        "event_id varchar(32) PRIMARY KEY, user_id integer NOT NULL, achievement_id varchar(64) NOT NULL, "
+        "amount double precision NOT NULL, created_ms bigint NOT NULL, attempts integer NOT NULL DEFAULT 0)",
+        "CREATE INDEX IF NOT EXISTS api_progress_outbox_created ON api_progress_outbox (created_ms)",
+    ]},
+    'api_insights_day': {'*': [
+        "CREATE TABLE IF NOT EXISTS api_insights_day ("
+        "user_id integer NOT NULL, day varchar(10) NOT NULL, data text NOT NULL, "
+        "PRIMARY KEY (user_id, day))",
+    ]},
+    'api_diary_fts': {'sqlite': [
+        # rowid 就是 diary id：依 rowid 更新 / 刪除是 B-tree 查找，不必掃整張表
+        "CREATE VIRTUAL TABLE IF NOT EXISTS api_diary_fts USING fts5(doc, owner, tokenize='unicode61')",
+    ]},
+    'api_diary_analysis': {'*': [
+        "CREATE TABLE IF NOT EXISTS api_diary_analysis ("
+        "diary_id integer PRIMARY KEY, status varchar(8) NOT NULL, attempts integer NOT NULL DEFAULT 0, "
+        "content_hash varchar(64) NOT NULL, updated_ms bigint NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS api_diary_analysis_status ON api_diary_analysis (status, updated_ms)",
+    ]},
+    'api_photo_blob': {'*': [
+        "CREATE TABLE IF NOT EXISTS api_photo_blob ("
+        "owner_id integer NOT NULL, sha256 varchar(64) NOT NULL, photo_id integer NOT NULL, "
+        "variants varchar(64) NOT NULL DEFAULT '', PRIMARY KEY (owner_id, sha256))",
+        "CREATE UNIQUE INDEX IF NOT EXISTS api_photo_blob_photo ON api_photo_blob (photo_id)",
+    ]},
+    'api_achievement_claim': {'*': [
+        # period：每日成就是領取日（YYYY-MM-DD），其餘為 'once'；同一期只會有一筆
+        "CREATE TABLE IF NOT EXISTS api_achievement_claim ("
+        "user_id integer NOT NULL, achievement_id varchar(64) NOT NULL, period varchar(10) NOT NULL, "
+        "claimed_on varchar(10) NULL, PRIMARY KEY (user_id, achievement_id, period))",
+    ]},
+    'api_diary_search': {'postgresql': [
+        "CREATE TABLE IF NOT EXISTS api_diary_search ("
+        "diary_id integer PRIMARY KEY, user_id integer NOT NULL, document tsvector NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS api_diary_search_doc_gin ON api_diary_search USING GIN (document)",
+        "CREATE INDEX IF NOT EXISTS api_diary_search_user ON api_diary_search (user_id)",
+    ]},
+}
+
+
+def statements(vendor):
+    """回傳 [(表名, [DDL, ...]), ...]，只含這個資料庫要建的表"""
+    result = []
+    for table, by_vendor in TABLES.items():
+        sql = by_vendor.get(vendor, by_vendor.get('*'))
+        if sql:
+            result.append((table, sql))
+    return result
+
+
+def ensure_schema(using=DEFAULT_DB_ALIAS):
+    """建立缺少的表（CREATE ... IF NOT EXISTS）；回傳這個資料庫涵蓋的表名"""
+    connection = connections[using]
+    plan = statements(connection.vendor)
+    with transaction.atomic(using=using), connection.cursor() as cur:
+        for _, sql in plan:
+            for statement in sql:
+                cur.execute(statement)
+    return [table for table, _ in plan]
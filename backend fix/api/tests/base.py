@@ -0,0 +1,59 @@
+# backend/api/tests/base.py
+"""各測試共用的資料與基底類別"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+from rest_framework.test import APIClient
+
+from api.indexes import ensure_indexes
+from api.models import Achievement
+from api.schema import ensure_schema
+
+# 與 views 記錄進度用的 id 一致：first_diary / third_diary（寫日記）、'2'（每日上傳照片）
+ACHIEVEMENTS = (
+    dict(id='first_diary', achTitle="第一篇日記", achContent="寫下第一篇日記", exp=10),
+    dict(id='third_diary', achTitle="三篇日記", achContent="累積三篇日記", exp=30),
+    dict(id='2', achTitle="每日心情", achContent="今天記錄心情", exp=5, is_daily=True),
+)
+
+
+def create_achievements():
+    for values in ACHIEVEMENTS:
+        Achievement.objects.create(**values)
+
+
+class UserFixture:
+    """
+    建立 api/schema.py 的原生 SQL 資料表與 api/indexes.py 的索引（部署時由 ensure_schema 建立，測試資料庫只跑 migrate）；
+    每個測試：清空 cache、建立 self.user（alice），self.client 以她的身分登入
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        ensure_schema()
+        ensure_indexes()
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class ApiTestCase(UserFixture, TestCase):
+    pass
+
+
+class AchievementTestCase(ApiTestCase):
+    """另外在 setUpTestData 建好成就清單"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        create_achievements()
+
+
+class ApiTransactionTestCase(UserFixture, TransactionTestCase):
+    pass
@@ -0,0 +1,94 @@
+# backend/api/tests/test_achievements.py
+from django.contrib.auth.models import User
+
+from api.models import Achievement
+from api.utils.achievement import claim_achievement, get_status, update_achievement_progress
+from api.utils.achievement_status import achievement_catalog, backfill_claims, get_statuses
+
+from .base import AchievementTestCase
+
+
+class GetStatusesMatchesGetStatusTests(AchievementTestCase):
+    """批次的 get_statuses 必須和單筆 get_status 對每個成就給出相同結果"""
+
+    def assertMatchesGetStatus(self):
+        catalog = achievement_catalog()
+        self.assertTrue(catalog)
+        bulk = get_statuses(self.user, catalog)
+        for ach in catalog:
+            with self.subTest(achievement=ach.pk):
+                self.assertEqual(bulk[ach.pk], get_status(self.user, ach))
+
+    def test_no_progress(self):
+        self.assertMatchesGetStatus()
+
+    def test_partial_progress(self):
+        # 只寫了一篇：first_diary 可領，third_diary 還不行
+        update_achievement_progress(self.user, 'first_diary', increment=1.0)
+        update_achievement_progress(self.user, 'third_diary', increment=1.0)
+        self.assertMatchesGetStatus()
+
+    def test_threshold_reached(self):
+        for _ in range(3):
+            update_achievement_progress(self.user, 'third_diary', increment=1.0)
+        update_achievement_progress(self.user, '2', increment=1.0)
+        self.assertMatchesGetStatus()
+
+    def test_claims(self):
+        update_achievement_progress(self.user, 'first_diary', increment=1.0)
+        update_achievement_progress(self.user, '2', increment=1.0)
+        for aid in ('first_diary', '2'):
+            self.assertEqual(self.client.post('/api/achievements/claim/', {'id': aid}, format='json').status_code, 200)
+        self.assertMatchesGetStatus()
+
+    def test_legacy_claims_after_backfill(self):
+        # 直接呼叫舊版 claim_achievement（api_achievement_claim 上線前的資料）
+        update_achievement_progress(self.user, 'first_diary', increment=1.0)
+        update_achievement_progress(self.user, '2', increment=1.0)
+        for aid in ('first_diary', '2'):
+            ok, payload = claim_achievement(self.user, aid)
+            self.assertTrue(ok, payload)
+        self.assertEqual(backfill_claims(), 2)
+        self.assertEqual(backfill_claims(), 0)  # 重跑不重複寫入
+        self.assertMatchesGetStatus()
+
+    def test_other_users_claims_do_not_leak(self):
+        other = User.objects.create_user('bob', password='pw')
+        update_achievement_progress(other, 'first_diary', increment=1.0)
+        claim_achievement(other, 'first_diary')
+        backfill_claims()
+        update_achievement_progress(self.user, 'first_diary', increment=1.0)
+        self.assertMatchesGetStatus()
+
+
+class GetStatusesQueryCountTests(AchievementTestCase):
+    def test_queries_do_not_grow_with_the_catalog(self):
+        update_achievement_progress(self.user, 'first_diary', increment=1.0)
+        catalog = achievement_catalog()
+        with self.assertNumQueries(2):
+            get_statuses(self.user, catalog)
+        Achievement.objects.bulk_create([
+            Achievement(id=f'extra-{i}', achTitle=f"成就 {i}", achContent="", exp=1, is_daily=i % 2 == 0)
+            for i in range(30)
+        ])
+        for i in range(0, 30, 3):
+            update_achievement_progress(self.user, f'extra-{i}', increment=1.0)
+        catalog = list(Achievement.objects.all())
+        with self.assertNumQueries(2):
+            statuses = get_statuses(self.user, catalog)
+        self.assertEqual(len(statuses), 33)
+        self.assertTrue(statuses['extra-3']['claimable'])
+
+
+class CatalogTests(AchievementTestCase):
+    def test_catalog_is_cached_until_changed(self):
+        achievement_catalog()
+        with self.assertNumQueries(0):
+            achievement_catalog()
+
+        Achievement.objects.filter(pk='first_diary').update(exp=99)  # update() 不發 signal，仍是舊清單
+        self.assertEqual({a.pk: a.exp for a in achievement_catalog()}['first_diary'], 10)
+
+        ach = Achievement.objects.get(pk='first_diary')
+        ach.save()
+        self.assertEqual({a.pk: a.exp for a in achievement_catalog()}['first_diary'], 99)
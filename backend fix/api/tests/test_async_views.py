@@ -0,0 +1,18 @@
+# backend/api/tests/test_async_views.py
+from rest_framework.authtoken.models import Token
+
+from .base import ApiTestCase
+
+
+class AsyncByDateTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=self.user).key}'}
+
+    def test_impossible_date_is_rejected(self):
+        response = self.client.get('/api/async/diaries/by-date/2024-02-31/', **self.auth)
+        self.assertEqual(response.status_code, 400)
+
+    def test_malformed_date_is_rejected(self):
+        response = self.client.get('/api/async/diaries/by-date/yesterday/', **self.auth)
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,68 @@
+# backend/api/tests/test_authentication.py
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import authentication
+from api.authentication import CachedTokenAuthentication
+
+from .base import ApiTestCase
+
+
+class CachedTokenAuthenticationTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+
+    def test_cache_hit_runs_no_queries(self):
+        self.auth.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            user, token = self.auth.authenticate_credentials(self.token.key)
+        self.assertEqual((user.pk, token.key), (self.user.pk, self.token.key))
+
+    def test_request_with_cached_token_skips_auth_queries(self):
+        client = APIClient(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        with CaptureQueriesContext(connection) as first:
+            self.assertEqual(client.get('/api/wallet/').status_code, 200)
+        with CaptureQueriesContext(connection) as second:
+            self.assertEqual(client.get('/api/wallet/').status_code, 200)
+
+        def token_queries(ctx):
+            return [q['sql'] for q in ctx.captured_queries if Token._meta.db_table in q['sql']]
+
+        self.assertTrue(token_queries(first))
+        self.assertEqual(token_queries(second), [])
+        self.assertEqual(len(second), len(first) - len(token_queries(first)))
+
+    def test_logout_evicts_token(self):
+        self.auth.authenticate_credentials(self.token.key)
+        client = APIClient(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(client.post('/api/auth/logout/').status_code, 200)
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_deactivated_user_is_rejected(self):
+        self.auth.authenticate_credentials(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_default_backend_is_shared(self):
+        self.assertFalse(authentication.is_process_local())
+
+    @override_settings(TOKEN_AUTH_CACHE={'BACKEND': 'local'})
+    def test_local_backend_hands_out_copies(self):
+        authentication._local_cache().clear()
+        self.addCleanup(authentication._local_cache().clear)
+        first, _ = self.auth.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            second, token = self.auth.authenticate_credentials(self.token.key)
+        self.assertIsNot(first, second)
+        self.assertIs(token.user, second)
+        second.first_name = "改過"
+        self.assertEqual(self.auth.authenticate_credentials(self.token.key)[0].first_name, '')
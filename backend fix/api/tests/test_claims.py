@@ -0,0 +1,141 @@
+# backend/api/tests/test_claims.py
+import threading
+import unittest
+from unittest import mock
+
+from django.db import connection
+
+from api.models import ExpLog
+from api.utils.achievement import claim_achievement, update_achievement_progress
+from api.utils.achievement_status import achievement_catalog, backfill_claims
+from api.utils.claims import claim
+from api.utils.wallet import materialized_balance
+
+from .base import AchievementTestCase, ApiTransactionTestCase, create_achievements
+
+URL = '/api/achievements/claim/'
+
+
+class ClaimTests(AchievementTestCase):
+    def test_threshold_comes_from_achievement_rules(self):
+        # 只寫了一篇日記：third_diary 不能領
+        update_achievement_progress(self.user, 'first_diary', increment=1.0)
+        update_achievement_progress(self.user, 'third_diary', increment=1.0)
+        self.assertEqual(claim(self.user, 'third_diary')[0], 400)
+        self.assertEqual(claim(self.user, 'first_diary')[0], 200)
+        self.assertEqual(materialized_balance(self.user), 10)
+
+    def test_legacy_claim_is_not_credited_again(self):
+        update_achievement_progress(self.user, 'first_diary', increment=1.0)
+        ok, payload = claim_achievement(self.user, 'first_diary')
+        self.assertTrue(ok, payload)
+        count = ExpLog.objects.filter(user=self.user).count()
+
+        # 還沒 backfill：舊版規則仍會擋下，不會重複入帳
+        self.assertEqual(claim(self.user, 'first_diary')[0], 400)
+        backfill_claims()
+        self.assertEqual(claim(self.user, 'first_diary')[0], 409)
+        self.assertEqual(ExpLog.objects.filter(user=self.user).count(), count)
+
+    def test_claim_goes_through_claim_achievement(self):
+        update_achievement_progress(self.user, 'first_diary', increment=1.0)
+        with mock.patch('api.utils.claims.claim_achievement', wraps=claim_achievement) as legacy:
+            status, payload = claim(self.user, 'first_diary')
+        self.assertEqual(status, 200)
+        legacy.assert_called_once_with(self.user, 'first_diary')
+        self.assertEqual(payload['balance'], 10)
+        recent = self.client.get('/api/wallet/').data['recent']
+        self.assertEqual(len(recent), 1)
+        self.assertFalse(recent[0]['reason'].startswith('achievement:'))
+        self.assertIn("第一篇日記", recent[0]['reason'])
+
+    def test_rejected_claim_is_one_locked_read(self):
+        update_achievement_progress(self.user, 'first_diary', increment=1.0)
+        self.assertEqual(claim(self.user, 'first_diary')[0], 200)
+        achievement_catalog()
+        # savepoint + 鎖使用者列 + 進度與領取紀錄一次查詢 + release
+        with self.assertNumQueries(4), mock.patch('api.utils.claims.claim_achievement') as legacy:
+            self.assertEqual(claim(self.user, 'first_diary')[0], 409)
+        legacy.assert_not_called()
+
+    def test_second_claim_conflicts(self):
+        update_achievement_progress(self.user, '2', increment=1.0)
+        self.assertEqual(self.client.post(URL, {'id': '2'}, format='json').status_code, 200)
+        self.assertEqual(self.client.post(URL, {'id': '2'}, format='json').status_code, 409)
+        self.assertEqual(ExpLog.objects.filter(user=self.user).count(), 1)
+
+    def test_idempotency_key_replays_same_request(self):
+        update_achievement_progress(self.user, 'first_diary', increment=1.0)
+        headers = {'HTTP_IDEMPOTENCY_KEY': 'k-1'}
+        first = self.client.post(URL, {'id': 'first_diary'}, format='json', **headers)
+        again = self.client.post(URL, {'id': 'first_diary'}, format='json', **headers)
+        self.assertEqual((first.status_code, again.status_code), (200, 200))
+        self.assertEqual(first.json(), again.json())
+        self.assertEqual(ExpLog.objects.filter(user=self.user).count(), 1)
+
+    def test_idempotency_key_reused_for_another_achievement(self):
+        update_achievement_progress(self.user, 'first_diary', increment=1.0)
+        update_achievement_progress(self.user, '2', increment=1.0)
+        headers = {'HTTP_IDEMPOTENCY_KEY': 'k-1'}
+        self.assertEqual(self.client.post(URL, {'id': 'first_diary'}, format='json', **headers).status_code, 200)
+        response = self.client.post(URL, {'id': '2'}, format='json', **headers)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(ExpLog.objects.filter(user=self.user).count(), 1)
+
+
+def _serializes_writers():
+    """SELECT ... FOR UPDATE，或 SQLite 檔案資料庫 + OPTIONS['transaction_mode']='IMMEDIATE'"""
+    if connection.features.has_select_for_update:
+        return True
+    mode = (connection.settings_dict.get('OPTIONS') or {}).get('transaction_mode')
+    return connection.vendor == 'sqlite' and mode in ('IMMEDIATE', 'EXCLUSIVE') and not connection.is_in_memory_db()
+
+
+class ConcurrentClaimTests(ApiTransactionTestCase):
+    """同時送出多個領取：wallet_lock 序列化後只會入帳一次"""
+    PARALLEL = 8
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        if not _serializes_writers():
+            raise unittest.SkipTest("資料庫無法在多個連線間鎖住使用者列")
+
+    def setUp(self):
+        super().setUp()
+        create_achievements()
+
+    def _fire(self, aid, keys):
+        barrier = threading.Barrier(len(keys))
+        codes = []
+
+        def worker(key):
+            try:
+                barrier.wait()
+                codes.append(claim(self.user, aid, key)[0])
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(key,)) for key in keys]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return sorted(codes)
+
+    def test_parallel_claims_credit_once(self):
+        update_achievement_progress(self.user, 'first_diary', increment=1.0)
+        codes = self._fire('first_diary', [None] * self.PARALLEL)
+
+        self.assertEqual(codes.count(200), 1)
+        self.assertEqual(set(codes) - {200}, {409})
+        self.assertEqual(ExpLog.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(materialized_balance(self.user), 10)
+
+    def test_parallel_retries_with_same_idempotency_key(self):
+        update_achievement_progress(self.user, 'first_diary', increment=1.0)
+        codes = self._fire('first_diary', ['same-key'] * self.PARALLEL)
+
+        self.assertIn(200, codes)
+        self.assertLessEqual(set(codes), {200, 409})
+        self.assertEqual(ExpLog.objects.filter(user=self.user).count(), 1)
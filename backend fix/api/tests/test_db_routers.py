@@ -0,0 +1,154 @@
+# backend/api/tests/test_db_routers.py
+import time
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connections
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import db_routers
+from api.db_routers import ReplicaRouter, RoutingState, note_user, pin_user, use_primary
+from api.models import Diary, Todo
+
+from .base import ApiTransactionTestCase
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    def _read(self, model):
+        token = db_routers._state.set(RoutingState(use_replica=True))
+        try:
+            with mock.patch.object(db_routers, 'replica_alias', return_value='replica'):
+                return ReplicaRouter().db_for_read(model)
+        finally:
+            db_routers._state.reset(token)
+
+    def test_safe_reads_go_to_replica(self):
+        self.assertEqual(self._read(Diary), 'replica')
+
+    def test_auth_lookups_stay_on_primary(self):
+        # 剛登入拿到的 Token 可能還沒複寫到 replica
+        self.assertEqual(self._read(Token), 'default')
+        self.assertEqual(self._read(User), 'default')
+
+
+def _request(method='GET', credential='Token abc'):
+    return getattr(RequestFactory(), method.lower())('/api/todos/', HTTP_AUTHORIZATION=credential)
+
+
+@mock.patch.object(db_routers, 'replica_alias', return_value='replica')
+class StickinessTests(SimpleTestCase):
+    """_begin / _finish：寫過的 client 在 STICKY_SECONDS 內讀 primary"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def _route(self, request, write=False):
+        """跑一個請求，回傳它的讀取走哪個 alias"""
+        state, token, key = db_routers._begin(request)
+        try:
+            if write:
+                ReplicaRouter().db_for_write(Diary)
+            return ReplicaRouter().db_for_read(Diary)
+        finally:
+            db_routers._finish(request, state, token, key)
+
+    def test_write_pins_the_same_client(self, _):
+        self.assertEqual(self._route(_request()), 'replica')
+        self.assertEqual(self._route(_request('POST')), 'default')
+        self.assertEqual(self._route(_request()), 'default')
+        self.assertEqual(self._route(_request(credential='Token other')), 'replica')
+
+    def test_write_inside_a_get_pins_too(self, _):
+        self.assertEqual(self._route(_request(), write=True), 'default')
+        self.assertEqual(self._route(_request()), 'default')
+
+    def test_pin_expires(self, _):
+        with override_settings(DATABASE_REPLICA={'STICKY_SECONDS': 0.05}):
+            self._route(_request('POST'))
+            time.sleep(0.1)
+            self.assertEqual(self._route(_request()), 'replica')
+
+    def test_anonymous_requests_are_never_pinned(self, _):
+        self._route(_request('POST', credential=''))
+        self.assertEqual(self._route(_request(credential='')), 'replica')
+
+    def test_background_write_pins_the_user(self, _):
+        user = User(pk=7)
+        pin_user(user.pk)
+        request = _request(credential='Token another-device')
+        state, token, key = db_routers._begin(request)
+        try:
+            self.assertEqual(ReplicaRouter().db_for_read(Diary), 'replica')
+            note_user(user)  # 認證完成
+            self.assertEqual(ReplicaRouter().db_for_read(Diary), 'default')
+        finally:
+            db_routers._finish(request, state, token, key)
+        state, token, key = db_routers._begin(_request(credential='Token another-device'))
+        try:
+            note_user(User(pk=8))
+            self.assertEqual(ReplicaRouter().db_for_read(Diary), 'replica')
+        finally:
+            db_routers._state.reset(token)
+
+    def test_use_primary(self, _):
+        state, token, key = db_routers._begin(_request())
+        try:
+            with use_primary():
+                self.assertEqual(ReplicaRouter().db_for_read(Diary), 'default')
+            self.assertEqual(ReplicaRouter().db_for_read(Diary), 'replica')
+        finally:
+            db_routers._state.reset(token)
+
+
+ROUTED = {
+    'DATABASE_ROUTERS': ['api.db_routers.ReplicaRouter'],
+    'MIDDLEWARE': ['api.db_routers.ReplicaRoutingMiddleware'],
+}
+
+
+@skipUnless('replica' in settings.DATABASES, "需要 DATABASES['replica']（TEST.MIRROR 指向 default）")
+@override_settings(**ROUTED)
+class TwoDatabaseTests(ApiTransactionTestCase):
+    """
+    replica 以 TEST.MIRROR 指向 default：資料相同，只比對查詢送到哪條連線。
+    用 TransactionTestCase：replica 是另一條連線，看不到 TestCase 包住、還沒 commit 的資料
+    """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        super().setUp()
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def _get(self, url, **params):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, ' '.join(q['sql'] for q in primary), ' '.join(q['sql'] for q in replica)
+
+    def test_cursor_comes_from_the_same_alias_as_the_rows(self):
+        Todo.objects.create(user=self.user, title="a", date='2024-05-01')
+        _, primary, replica = self._get('/api/todos/')
+        self.assertIn('api_sync_seq', replica)
+        self.assertIn(f"\"{Todo._meta.db_table}\"", replica)
+        self.assertNotIn('api_sync_seq', primary)
+
+    def test_overview_rows_are_read_from_primary(self):
+        Diary.objects.create(user=self.user, date='2024-05-01', content="第一天")
+        _, primary, replica = self._get('/api/diaries/overview/', month='2024-05')
+        self.assertIn(f"\"{Diary._meta.db_table}\"", primary)
+        self.assertNotIn(f"\"{Diary._meta.db_table}\"", replica)
+
+    def test_client_reads_its_own_writes_from_primary(self):
+        response = self.client.post('/api/todos/', {'title': "b", 'date': '2024-05-01'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        _, primary, replica = self._get('/api/todos/')
+        self.assertIn(f"\"{Todo._meta.db_table}\"", primary)
+        self.assertNotIn(f"\"{Todo._meta.db_table}\"", replica)
@@ -0,0 +1,121 @@
+# backend/api/tests/test_diary_analysis.py
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import override_settings
+
+from api.models import Diary
+from api.utils import diary_analysis
+from api.utils.analysis_state import ANALYSIS_DONE, ANALYSIS_FAILED, ANALYSIS_PENDING, mark_pending
+from api.utils.diary_analysis import analysis_status, pending_values
+from api.utils.insights import compute_days
+
+from .base import ApiTestCase, ApiTransactionTestCase
+
+CONTENT = "今天和朋友去散步，心情很好。"
+
+
+@override_settings(DIARY_ANALYSIS_RETRIES=1)
+class BackgroundAnalysisTests(ApiTransactionTestCase):
+    """_run_analysis 在背景 thread 跑，這裡直接呼叫（它會關閉連線，所以不能包在 TestCase 的交易裡）"""
+
+    def setUp(self):
+        super().setUp()
+        self.diary = Diary.objects.create(user=self.user, date='2024-05-01', content=CONTENT, **pending_values())
+        mark_pending(self.diary.pk, CONTENT)
+
+    def _run(self, **patch):
+        with mock.patch.object(diary_analysis, 'cached_analyze_sentiment', **patch) as analyze, \
+                mock.patch.object(diary_analysis.time, 'sleep'):
+            diary_analysis._run_analysis(self.diary.pk, CONTENT)
+        self.diary.refresh_from_db()
+        return analyze
+
+    def test_failure_after_retries_marks_failed(self):
+        analyze = self._run(side_effect=RuntimeError("model crashed"))
+
+        self.assertEqual(analyze.call_count, 2)  # 1 次 + 重試 1 次
+        self.assertEqual(analysis_status(self.diary), ANALYSIS_FAILED)
+        self.assertEqual(self.diary.sentiment, '')  # 狀態不再借用 sentiment 欄位
+        # 失敗的日記不算「已分析」，同樣內容再送出會重新排入分析
+        self.assertFalse(diary_analysis.unchanged_analysis(self.diary, CONTENT))
+
+    def test_retry_recovers(self):
+        result = ('positive', "聽起來很棒", ['散步'], ['朋友'])
+        self._run(side_effect=[RuntimeError("timeout"), result])
+
+        self.assertEqual(analysis_status(self.diary), ANALYSIS_DONE)
+        self.assertEqual(self.diary.sentiment, 'positive')
+
+    def test_written_result_pins_the_user_to_primary(self):
+        # 背景寫入沒有請求的 sticky 標記，要另外標記使用者
+        with mock.patch.object(diary_analysis, 'pin_user') as pin:
+            self._run(return_value=('positive', "聽起來很棒", [], []))
+        pin.assert_called_once_with(self.user.pk)
+
+    def test_failed_diary_can_be_analyzed_again(self):
+        self._run(side_effect=RuntimeError("model crashed"))
+        mark_pending(self.diary.pk, CONTENT)
+        self._run(return_value=('negative', "抱抱", [], []))
+
+        self.assertEqual(analysis_status(self.diary), ANALYSIS_DONE)
+        self.assertEqual(self.diary.sentiment, 'negative')
+
+    def test_stale_result_is_not_written(self):
+        Diary.objects.filter(pk=self.diary.pk).update(content="改過的內容")
+        self._run(side_effect=RuntimeError("model crashed"))
+
+        self.assertEqual(analysis_status(self.diary), ANALYSIS_PENDING)
+
+    def _requeue(self, *args):
+        out = StringIO()
+        with mock.patch.object(diary_analysis, 'cached_analyze_sentiment',
+                               return_value=('positive', "聽起來很棒", [], [])) as analyze:
+            call_command('requeue_diary_analysis', '--min-age', '0', *args, stdout=out)
+        self.diary.refresh_from_db()
+        return analyze
+
+    def test_requeue_picks_up_pending_lost_on_restart(self):
+        analyze = self._requeue()
+
+        analyze.assert_called_once_with(CONTENT)
+        self.assertEqual(analysis_status(self.diary), ANALYSIS_DONE)
+        self.assertEqual(self.diary.sentiment, 'positive')
+
+    def test_requeue_failed_only_when_asked(self):
+        self._run(side_effect=RuntimeError("model crashed"))
+        self._requeue().assert_not_called()
+        self.assertEqual(analysis_status(self.diary), ANALYSIS_FAILED)
+
+        self._requeue('--failed')
+        self.assertEqual(analysis_status(self.diary), ANALYSIS_DONE)
+
+    def test_legacy_failed_marker_is_not_counted_as_a_sentiment(self):
+        Diary.objects.filter(pk=self.diary.pk).update(sentiment=ANALYSIS_FAILED)
+        day = datetime.date(2024, 5, 1)
+        self.assertEqual(compute_days(self.user.id, day, day)[day]['sentiments'], {})
+
+        self._requeue('--failed')
+        self.assertEqual(self.diary.sentiment, 'positive')
+
+
+
+@override_settings(DIARY_ANALYSIS_ASYNC=True, PROGRESS_OUTBOX_ASYNC=False)
+class AnalysisStatusTests(ApiTestCase):
+    def test_status_is_explicit_until_the_result_is_written(self):
+        with mock.patch.object(diary_analysis, '_get_executor') as executor, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/diaries/', {'content': CONTENT, 'date': '2024-05-01'}, format='json')
+        self.assertEqual(response.data['analysis_status'], ANALYSIS_PENDING)
+        executor.return_value.submit.assert_called_once()
+
+        by_date = self.client.get('/api/diaries/by-date/2024-05-01/')
+        self.assertEqual(by_date.data['analysis_status'], ANALYSIS_PENDING)
+
+        diary_analysis._write_back(response.data['id'], CONTENT,
+                                   diary_analysis.analysis_values('positive', "聽起來很棒", [], []))
+        by_date = self.client.get('/api/diaries/by-date/2024-05-01/')
+        self.assertEqual(by_date.data['analysis_status'], ANALYSIS_DONE)
+        self.assertEqual(by_date.data['sentiment'], 'positive')
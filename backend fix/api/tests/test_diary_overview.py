@@ -0,0 +1,60 @@
+# backend/api/tests/test_diary_overview.py
+from django.test import SimpleTestCase
+
+from api.models import Diary
+from api.utils.diary_overview import etag_matches
+
+from .base import ApiTestCase
+
+URL = '/api/diaries/overview/?month=2024-05'
+
+
+class EtagMatchesTests(SimpleTestCase):
+    etag = 'W/"ov-1:2024-05-123"'
+
+    def test_exact_and_weak_match(self):
+        self.assertTrue(etag_matches(self.etag, self.etag))
+        self.assertTrue(etag_matches('"ov-1:2024-05-123"', self.etag))
+        self.assertTrue(etag_matches('"other", W/"ov-1:2024-05-123"', self.etag))
+
+    def test_wildcard(self):
+        self.assertTrue(etag_matches('*', self.etag))
+
+    def test_substring_is_not_a_match(self):
+        self.assertFalse(etag_matches('W/"ov-1:2024-05-1234"', self.etag))
+        self.assertFalse(etag_matches('W/"ov-1:2024-05-12"', self.etag))
+        self.assertFalse(etag_matches('xx W/"ov-1:2024-05-123" yy', self.etag[:-1]))
+
+    def test_missing_or_garbage_header(self):
+        self.assertFalse(etag_matches(None, self.etag))
+        self.assertFalse(etag_matches('', self.etag))
+        self.assertFalse(etag_matches('not-an-etag', self.etag))
+
+
+class OverviewConditionalGetTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        Diary.objects.create(user=self.user, date='2024-05-01', content="第一天")
+
+    def test_not_modified_until_a_write(self):
+        first = self.client.get(URL)
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+
+        self.assertEqual(self.client.get(URL, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        response = self.client.post('/api/diaries/', {'date': '2024-05-02', 'content': "第二天"}, format='json')
+        self.assertIn(response.status_code, (200, 201))
+
+        again = self.client.get(URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual([row['date'] for row in again.json()], ['2024-05-01', '2024-05-02'])
+
+
+class ByDateTests(ApiTestCase):
+    def test_impossible_date_is_rejected(self):
+        self.assertEqual(self.client.get('/api/diaries/by-date/2024-02-31/').status_code, 400)
+
+    def test_impossible_date_on_create(self):
+        response = self.client.post('/api/diaries/', {'date': '2024-02-31', 'content': "不存在的日子"}, format='json')
+        self.assertEqual(response.status_code, 400)
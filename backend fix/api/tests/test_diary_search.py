@@ -0,0 +1,57 @@
+# backend/api/tests/test_diary_search.py
+import datetime
+import unittest
+
+from django.contrib.auth.models import User
+from django.db import connection
+
+from api.models import Diary
+from api.utils.diary_search import index_diary, rebuild, search, unindex_diary
+
+from .base import ApiTestCase
+
+
+def _ids(user, query):
+    results, _ = search(user, query)
+    return [row['id'] for row in results]
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "FTS5 索引只在 SQLite 上")
+class DiarySearchIndexTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.bob = User.objects.create_user('bob', password='pw')
+
+    def _diary(self, user, content, day=1):
+        with self.captureOnCommitCallbacks(execute=True):
+            diary = Diary.objects.create(user=user, date=datetime.date(2024, 5, day), content=content)
+            index_diary(diary)
+        return diary
+
+    def test_update_replaces_the_row_keyed_by_diary_id(self):
+        diary = self._diary(self.user, "今天去海邊散步")
+        diary.content = "今天在家看書"
+        with self.captureOnCommitCallbacks(execute=True):
+            diary.save()
+            index_diary(diary)
+        self.assertEqual(_ids(self.user, "海邊"), [])
+        self.assertEqual(_ids(self.user, "看書"), [diary.pk])
+        with connection.cursor() as cur:
+            cur.execute("SELECT rowid FROM api_diary_fts")
+            self.assertEqual([row[0] for row in cur.fetchall()], [diary.pk])
+
+    def test_delete_removes_the_row(self):
+        diary = self._diary(self.user, "今天去海邊散步")
+        with self.captureOnCommitCallbacks(execute=True):
+            unindex_diary(diary.pk)
+            diary.delete()
+        with connection.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM api_diary_fts")
+            self.assertEqual(cur.fetchone()[0], 0)
+
+    def test_rebuild_for_one_user_keeps_the_others(self):
+        mine = self._diary(self.user, "海邊散步")
+        theirs = self._diary(self.bob, "海邊跑步")
+        self.assertEqual(rebuild(user_id=self.user.id), 1)
+        self.assertEqual(_ids(self.user, "海邊"), [mine.pk])
+        self.assertEqual(_ids(self.bob, "海邊"), [theirs.pk])
@@ -0,0 +1,132 @@
+# backend/api/tests/test_insights.py
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+
+from api.models import Diary, MoodLog
+from api.utils import diary_analysis
+from api.utils.insights import _current_streak, compute_days, day_rollups, has_data, store_days, stored_days
+
+from .base import ApiTestCase
+
+DAY = datetime.date(2024, 5, 1)
+NEXT = datetime.date(2024, 5, 2)
+RESULT = ('positive', "聽起來很棒", ['散步'], ['朋友'])
+
+
+@override_settings(DIARY_ANALYSIS_ASYNC=False, PROGRESS_OUTBOX_ASYNC=False)
+class InsightsRollupTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        day_rollups(self.user.id, DAY, NEXT)  # 先建好 rollup，之後的寫入要把它更新掉
+
+    def assertRollupsFresh(self):
+        expected = {d: r for d, r in compute_days(self.user.id, DAY, NEXT).items() if has_data(r)}
+        self.assertEqual(stored_days(self.user.id, DAY, NEXT), expected)
+
+    def _verify(self):
+        out = StringIO()
+        call_command('backfill_insights', verify=True, stdout=out)
+        return out.getvalue()
+
+    def _create_diary(self):
+        with mock.patch.object(diary_analysis, 'cached_analyze_sentiment', return_value=RESULT), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/diaries/', {'content': "和朋友去散步", 'date': DAY.isoformat()},
+                                        format='json')
+        self.assertLess(response.status_code, 300)
+        return Diary.objects.get(user=self.user, date=DAY)
+
+    def test_diary_create_update_delete(self):
+        diary = self._create_diary()
+        self.assertEqual(stored_days(self.user.id, DAY, DAY)[DAY]['diaries'], 1)
+        self.assertRollupsFresh()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/diaries/{diary.pk}/', {'date': NEXT.isoformat()}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(DAY, stored_days(self.user.id, DAY, DAY))  # 變空的日子不留列
+        self.assertRollupsFresh()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/diaries/{diary.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertRollupsFresh()
+        self.assertIn("全部一致", self._verify())
+
+    def test_moodlog_create_update_delete(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            log = MoodLog.objects.create(user=self.user, mood='happy', date=DAY)
+        self.assertEqual(stored_days(self.user.id, DAY, DAY)[DAY]['moodlogs'], 1)
+        self.assertRollupsFresh()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            log.date = NEXT
+            log.save()
+        self.assertNotIn(DAY, stored_days(self.user.id, DAY, DAY))
+        self.assertRollupsFresh()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            log.delete()
+        self.assertRollupsFresh()
+        self.assertIn("全部一致", self._verify())
+
+    def test_rollups_do_not_live_in_the_cache(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            MoodLog.objects.create(user=self.user, mood='happy', date=DAY)
+        cache.clear()  # 例如換了一個 worker、或 cache 被清空
+        with mock.patch('api.utils.insights.compute_days') as compute:
+            self.assertEqual(day_rollups(self.user.id, DAY, DAY)[DAY]['moodlogs'], 1)
+        compute.assert_not_called()
+
+    def test_verify_reports_stale_rollups(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            MoodLog.objects.create(user=self.user, mood='happy', date=DAY)
+        stale = compute_days(self.user.id, DAY, DAY)[DAY]
+        stale['moods'] = {'sad': 1}
+        store_days(self.user.id, {DAY: stale})  # 寫進過期的值
+        self.assertIn("1 天不一致", self._verify())
+
+    def test_reads_only_store_past_days_with_data(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            MoodLog.objects.create(user=self.user, mood='happy', date=DAY)
+        store_days(self.user.id, {DAY: compute_days(self.user.id, DAY, DAY)[DAY]})
+        today = datetime.date.today()
+        future = today + datetime.timedelta(days=30)
+        with mock.patch('django.utils.timezone.localdate', return_value=today):
+            day_rollups(self.user.id, DAY - datetime.timedelta(days=30), DAY)
+            day_rollups(self.user.id, today, future)
+        self.assertEqual(list(stored_days(self.user.id, DAY - datetime.timedelta(days=30), future)), [DAY])
+
+    def test_impossible_date_is_rejected(self):
+        response = self.client.get('/api/insights/', {'range': 'week', 'date': '2024-02-31'})
+        self.assertEqual(response.status_code, 400)
+
+
+class CurrentStreakTests(ApiTestCase):
+    TODAY = datetime.date(2024, 3, 2)
+
+    def _write_on(self, *days):
+        for day in days:
+            Diary.objects.create(user=self.user, date=day, content="日記")
+
+    def _streak(self):
+        with self.assertNumQueries(1):
+            return _current_streak(self.user.id, self.TODAY)
+
+    def test_counts_back_across_months_in_one_query(self):
+        self._write_on(*(self.TODAY - datetime.timedelta(days=n) for n in range(40)))
+        self.assertEqual(self._streak(), 40)
+
+    def test_starts_from_yesterday_when_today_is_empty(self):
+        self._write_on(self.TODAY - datetime.timedelta(days=1), self.TODAY - datetime.timedelta(days=2),
+                       self.TODAY - datetime.timedelta(days=4))
+        self.assertEqual(self._streak(), 2)
+
+    def test_gap_before_yesterday_means_no_streak(self):
+        self._write_on(self.TODAY - datetime.timedelta(days=2))
+        self.assertEqual(self._streak(), 0)
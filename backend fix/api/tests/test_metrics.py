@@ -0,0 +1,116 @@
+# backend/api/tests/test_metrics.py
+import re
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from api.metrics import MetricsMiddleware, client_ip, render_metrics, reset_metrics
+
+from .base import ApiTestCase
+
+URL = '/metrics'
+
+
+def sample(name, **labels):
+    """從 /metrics 輸出找出一個 sample 的值；labels 只需列出要比對的部分"""
+    for line in render_metrics().splitlines():
+        match = re.match(r'(\w+)(?:\{(.*)\})? (\S+)$', line)
+        if not match or match.group(1) != name:
+            continue
+        found = dict(re.findall(r'(\w+)="([^"]*)"', match.group(2) or ''))
+        if all(found.get(k) == str(v) for k, v in labels.items()):
+            return float(match.group(3))
+    return None
+
+
+class MetricsAccessTests(TestCase):
+    def test_closed_by_default(self):
+        response = self.client.get(URL)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer')
+
+    @override_settings(METRICS={'TOKEN': 's3cret'})
+    def test_bearer_token(self):
+        self.assertEqual(self.client.get(URL, HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+        self.assertEqual(self.client.get(URL, HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+
+    def test_staff_token(self):
+        staff = User.objects.create_user('ops', password='pw', is_staff=True)
+        member = User.objects.create_user('alice', password='pw')
+        staff_key = Token.objects.create(user=staff).key
+        member_key = Token.objects.create(user=member).key
+        self.assertEqual(self.client.get(URL, HTTP_AUTHORIZATION=f'Token {staff_key}').status_code, 200)
+        self.assertEqual(self.client.get(URL, HTTP_AUTHORIZATION=f'Token {member_key}').status_code, 401)
+
+    @override_settings(METRICS={'TOKEN': 's3cret', 'ALLOWED_IPS': ['10.0.0.0/8'], 'TRUSTED_PROXIES': ['127.0.0.1']})
+    def test_allow_list_uses_forwarded_client_behind_proxy(self):
+        auth = {'HTTP_AUTHORIZATION': 'Bearer s3cret', 'REMOTE_ADDR': '127.0.0.1'}
+        self.assertEqual(self.client.get(URL, HTTP_X_FORWARDED_FOR='10.1.2.3', **auth).status_code, 200)
+        self.assertEqual(self.client.get(URL, HTTP_X_FORWARDED_FOR='203.0.113.9', **auth).status_code, 403)
+        # client 自己塞的 X-Forwarded-For 在最左邊，不會被採用
+        self.assertEqual(self.client.get(URL, HTTP_X_FORWARDED_FOR='10.1.2.3, 203.0.113.9', **auth).status_code, 403)
+
+    @override_settings(METRICS={'ALLOWED_IPS': ['10.0.0.0/8']})
+    def test_forwarded_header_ignored_without_trusted_proxy(self):
+        request = RequestFactory().get(URL, REMOTE_ADDR='203.0.113.9', HTTP_X_FORWARDED_FOR='10.1.2.3')
+        self.assertEqual(client_ip(request), '203.0.113.9')
+
+
+@override_settings(METRICS={'SLOW_REQUEST_MS': None})
+class MetricsMiddlewareTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        reset_metrics()
+        self.addCleanup(reset_metrics)
+
+    def test_records_route_sql_and_size(self):
+        response = self.client.get('/api/diaries/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sample('api_request_duration_seconds_count', route='diary-list', method='GET', status=200), 1)
+        self.assertEqual(sample('api_request_sql_queries_count', route='diary-list'), 1)
+        self.assertGreater(sample('api_request_sql_queries_sum', route='diary-list'), 0)
+        self.assertEqual(sample('api_response_size_bytes_sum', route='diary-list'), len(response.content))
+
+    def test_unmatched_path(self):
+        self.client.get('/no/such/path/')
+        self.assertEqual(sample('api_request_duration_seconds_count', route='unmatched', status=404), 1)
+
+    def test_sentiment_stage(self):
+        response = self.client.post('/api/diaries/', {'date': '2024-05-01', 'content': "今天很開心"}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sample('api_request_stage_duration_seconds_count', route='diary-list', stage='sentiment'), 1)
+
+    def test_slow_request_log(self):
+        with override_settings(METRICS={'SLOW_REQUEST_MS': 0, 'SLOW_QUERY_LIMIT': 2}), \
+                self.assertLogs('api.slow_requests', 'WARNING') as logs:
+            self.client.get('/api/diaries/')
+        detail = logs.records[0].slow_request
+        self.assertEqual(detail['route'], 'diary-list')
+        self.assertEqual(detail['status'], 200)
+        self.assertGreater(detail['sql_count'], 0)
+        self.assertLessEqual(len(detail['slowest_queries']), 2)
+
+    def test_fast_request_is_not_logged(self):
+        with override_settings(METRICS={'SLOW_REQUEST_MS': 60_000}), \
+                self.assertNoLogs('api.slow_requests', 'WARNING'):
+            self.client.get('/api/diaries/')
+
+    def test_disabled(self):
+        with override_settings(METRICS={'ENABLED': False}):
+            self.client.get('/api/diaries/')
+        self.assertIsNone(sample('api_request_duration_seconds_count', route='diary-list'))
+
+    def test_async_get_response(self):
+        async def view(request):
+            await sync_to_async(User.objects.count)()
+            return HttpResponse(b"ok")
+
+        middleware = MetricsMiddleware(view)
+        self.assertTrue(middleware.async_mode)
+        response = async_to_sync(middleware)(RequestFactory().get('/async/'))
+        self.assertEqual(response.content, b"ok")
+        self.assertEqual(sample('api_request_sql_queries_sum', route='unmatched'), 1)
+        self.assertEqual(sample('api_response_size_bytes_sum', route='unmatched'), 2)
@@ -0,0 +1,96 @@
+# backend/api/tests/test_pagination.py
+import datetime
+
+from django.test import override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.models import Diary, MoodLog
+from api.pagination import MAX_PAGE_SIZE, KeysetPagination
+
+from .base import ApiTestCase
+
+T0 = datetime.datetime(2024, 5, 1, 12, 0, tzinfo=datetime.timezone.utc)
+
+
+class DiaryPaginationTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        # 後三篇的 created_at 相同：要靠 id 分出先後
+        self.ids = []
+        for i, hours in enumerate((0, 1, 2, 2, 2)):
+            diary = Diary.objects.create(user=self.user, date=datetime.date(2024, 5, i + 1), content=f"第 {i} 篇")
+            Diary.objects.filter(pk=diary.pk).update(created_at=T0 + datetime.timedelta(hours=hours))
+            self.ids.append(diary.pk)
+        self.newest_first = [self.ids[4], self.ids[3], self.ids[2], self.ids[1], self.ids[0]]
+
+    def _walk(self, page_size):
+        ids, cursor = [], None
+        while True:
+            params = {'page_size': page_size, **({'cursor': cursor} if cursor else {})}
+            response = self.client.get('/api/diaries/', params)
+            self.assertEqual(response.status_code, 200)
+            ids += [row['id'] for row in response.data['results']]
+            cursor = response.data['next_cursor']
+            if cursor is None:
+                return ids
+
+    def test_cursor_round_trip_breaks_ties_by_id(self):
+        for size in (1, 2, 3, 5):
+            self.assertEqual(self._walk(size), self.newest_first, f"page_size={size}")
+
+    def test_page_size_is_capped(self):
+        response = self.client.get('/api/diaries/', {'page_size': MAX_PAGE_SIZE * 10})
+        self.assertEqual(len(response.data['results']), 5)
+        request = Request(APIRequestFactory().get('/', {'page_size': MAX_PAGE_SIZE * 10}))
+        self.assertEqual(KeysetPagination()._page_size(request), MAX_PAGE_SIZE)
+
+    def test_bad_cursor_and_page_size_are_rejected(self):
+        self.assertEqual(self.client.get('/api/diaries/', {'cursor': 'not-a-cursor'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/diaries/', {'page_size': 'ten'}).status_code, 400)
+
+    def test_legacy_clients_get_the_full_array(self):
+        with override_settings(API_LEGACY_UNPAGINATED=True):
+            data = self.client.get('/api/diaries/').data
+        self.assertEqual([row['id'] for row in data], self.newest_first)
+        with override_settings(API_LEGACY_UNPAGINATED=False, API_PAGE_SIZE=2):
+            data = self.client.get('/api/diaries/').data
+        self.assertEqual([row['id'] for row in data['results']], self.newest_first[:2])
+        self.assertIsNotNone(data['next_cursor'])
+
+
+class NullableKeyTests(ApiTestCase):
+    """可為 NULL 的排序欄（MoodLog.date）：NULL 當成最小值，翻頁不會漏也不會重複"""
+
+    def setUp(self):
+        super().setUp()
+        self.logs = {}
+        for name, day in (('null_a', None), ('may1', datetime.date(2024, 5, 1)), ('null_b', None),
+                          ('may2_a', datetime.date(2024, 5, 2)), ('may2_b', datetime.date(2024, 5, 2))):
+            self.logs[name] = MoodLog.objects.create(user=self.user, mood='calm', date=day).pk
+
+    def _walk(self, ordering, page_size):
+        view = type('View', (), {'keyset_ordering': ordering})()
+        ids, cursor = [], None
+        while True:
+            params = {'page_size': page_size, **({'cursor': cursor} if cursor else {})}
+            paginator = KeysetPagination()
+            rows = paginator.paginate_queryset(MoodLog.objects.filter(user=self.user),
+                                               Request(APIRequestFactory().get('/', params)), view)
+            ids += [row.pk for row in rows]
+            cursor = paginator.next_cursor
+            if cursor is None:
+                return ids
+
+    def _expected(self, *names):
+        return [self.logs[n] for n in names]
+
+    def test_descending_puts_nulls_last(self):
+        expected = self._expected('may2_b', 'may2_a', 'may1', 'null_b', 'null_a')
+        for size in (1, 2, 4):
+            self.assertEqual(self._walk(('-date', '-id'), size), expected, f"page_size={size}")
+
+    def test_ascending_puts_nulls_first(self):
+        expected = self._expected('null_a', 'null_b', 'may1', 'may2_a', 'may2_b')
+        for size in (1, 2, 4):
+            self.assertEqual(self._walk(('date', 'id'), size), expected, f"page_size={size}")
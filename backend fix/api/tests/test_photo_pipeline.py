@@ -0,0 +1,124 @@
+# backend/api/tests/test_photo_pipeline.py
+import errno
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+
+from api.models import Photo
+from api.utils import photo_pipeline
+from api.utils.photo_pipeline import mark_variants_ready, store_original
+
+from .base import ApiTestCase
+
+CONTENT = b'\xff\xd8\xff\xe0' + b'fake jpeg bytes' * 1000
+
+
+class FakeUser:
+    id = 7
+
+
+class TempMediaMixin:
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+class StoreOriginalTests(TempMediaMixin, SimpleTestCase):
+    def _upload(self):
+        return SimpleUploadedFile('IMG_0001.JPG', CONTENT, content_type='image/jpeg')
+
+    def _stored_files(self):
+        return sorted(os.listdir(os.path.join(self.media_root, 'photos', str(FakeUser.id))))
+
+    def test_same_content_is_stored_once(self):
+        first = store_original(FakeUser, self._upload())
+        second = store_original(FakeUser, self._upload())
+        self.assertEqual(first, second)
+        self.assertEqual(self._stored_files(), [os.path.basename(first)])
+        with default_storage.open(first) as fh:
+            self.assertEqual(fh.read(), CONTENT)
+
+    def test_concurrent_uploads_do_not_duplicate(self):
+        # 兩個請求都在對方寫完之前檢查：exists() 一律回 False 也不能產生改名的副本
+        barrier = threading.Barrier(4)
+        names = []
+
+        def upload():
+            barrier.wait()
+            names.append(store_original(FakeUser, self._upload()))
+
+        with mock.patch.object(FileSystemStorage, 'exists', return_value=False):
+            threads = [threading.Thread(target=upload) for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        self.assertEqual(len(set(names)), 1)
+        self.assertEqual(self._stored_files(), [os.path.basename(names[0])])
+
+    def test_filesystem_without_hard_links_falls_back_to_rename(self):
+        with mock.patch.object(os, 'link', side_effect=OSError(errno.EPERM, "Operation not permitted")):
+            name = store_original(FakeUser, self._upload())
+            self.assertEqual(store_original(FakeUser, self._upload()), name)
+        self.assertEqual(self._stored_files(), [os.path.basename(name)])
+        with default_storage.open(name) as fh:
+            self.assertEqual(fh.read(), CONTENT)
+
+
+class PhotoUploadTests(TempMediaMixin, ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        executor = mock.patch.object(photo_pipeline, '_get_executor')  # 不真的開 process pool 產生縮圖
+        executor.start()
+        self.addCleanup(executor.stop)
+
+    def _post(self, path='/api/photos/', content=CONTENT, **extra):
+        upload = SimpleUploadedFile('IMG_0001.JPG', content, content_type='image/jpeg')
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(path, {'image': upload, **extra}, format='multipart')
+
+    def test_duplicate_returns_200_from_both_routes_and_keeps_new_fields(self):
+        first = self._post(caption="海邊")
+        self.assertEqual(first.status_code, 201)
+        again = self._post(caption="海邊，第二次")
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.data['id'], first.data['id'])
+        self.assertEqual(self._post('/api/photos/upload/', caption="改過的說明").status_code, 200)
+        self.assertEqual(list(Photo.objects.values_list('caption', flat=True)), ["改過的說明"])
+
+    def test_concurrent_duplicate_keeps_one_photo(self):
+        first = self._post()
+        # 另一個請求在對方登記之前查過：看不到既有照片，登記時撞上 (使用者, 雜湊) 主鍵
+        real_existing = photo_pipeline.existing_photo
+        calls = []
+
+        def not_yet_visible(user, name):
+            calls.append(name)
+            return None if len(calls) == 1 else real_existing(user, name)
+
+        with mock.patch('api.views.existing_photo', side_effect=not_yet_visible):
+            response = self._post()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], first.data['id'])
+        self.assertEqual(Photo.objects.count(), 1)
+
+    def test_list_reads_variant_flags_without_touching_storage(self):
+        ids = [self._post(content=CONTENT + bytes([i])).data['id'] for i in range(3)]
+        mark_variants_ready(ids[0])
+        with mock.patch.object(FileSystemStorage, 'exists') as exists:
+            data = self.client.get('/api/photos/').data
+        exists.assert_not_called()
+        rows = {row['id']: row['variants'] for row in (data['results'] if isinstance(data, dict) else data)}
+        self.assertTrue(rows[ids[0]]['thumb'].endswith('?variant=thumb'))
+        self.assertEqual(rows[ids[1]], {'thumb': None, 'display': None})
@@ -0,0 +1,122 @@
+# backend/api/tests/test_progress_outbox.py
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import override_settings
+
+from api.models import UserAchievementProgress
+from api.utils import progress_outbox
+from api.utils.progress_outbox import (MAX_ATTEMPTS, dead_count, drain, drain_all, pending_count,
+                                       record_progress, retry_dead)
+
+from .base import AchievementTestCase
+
+
+@override_settings(PROGRESS_OUTBOX_ASYNC=False)
+class ProgressOutboxTests(AchievementTestCase):
+    def setUp(self):
+        super().setUp()
+        drain_all()
+
+    def _progress(self, user=None):
+        row = UserAchievementProgress.objects.filter(user=user or self.user, achievement_id='first_diary').first()
+        return row.progress if row else 0
+
+    def _record(self, user, increment=1.0):
+        with mock.patch.object(progress_outbox, '_after_commit'):
+            with self.captureOnCommitCallbacks(execute=True):
+                record_progress(user, 'first_diary', increment=increment)
+
+    def test_event_is_applied_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                record_progress(self.user, 'first_diary', increment=1.0)
+                record_progress(self.user, 'first_diary', increment=2.0)
+        self.assertEqual(self._progress(), 3)
+        self.assertEqual(pending_count(), 0)
+
+    def test_rolled_back_write_drops_its_event(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    record_progress(self.user, 'first_diary', increment=1.0)
+                    raise RuntimeError("日記寫入失敗")
+            except RuntimeError:
+                pass
+        self.assertEqual(pending_count(), 0)
+        self.assertEqual(self._progress(), 0)
+
+    def test_events_are_applied_once(self):
+        self._record(self.user)
+        self.assertEqual(drain(), (1, 1))
+        self.assertEqual(drain(), (0, 0))
+        self.assertEqual(self._progress(), 1)
+
+    def test_failed_apply_keeps_events_for_retry(self):
+        self._record(self.user)
+        with mock.patch.object(progress_outbox, 'apply_events', side_effect=RuntimeError), \
+                self.assertLogs(progress_outbox.logger, 'ERROR'):
+            self.assertEqual(drain(), (0, 0))
+        self.assertEqual(pending_count(), 1)
+        self.assertEqual(drain_all(), 1)
+        self.assertEqual(self._progress(), 1)
+
+    def test_failing_group_does_not_block_the_batch(self):
+        bob = User.objects.create_user('bob', password='pw')
+        self._record(bob)
+        self._record(self.user, increment=2.0)
+        real_apply = progress_outbox.apply_events
+
+        def poison_bob(events):
+            if any(user_id == bob.id for user_id, _, _ in events):
+                raise RuntimeError("壞掉的事件")
+            return real_apply(events)
+
+        with mock.patch.object(progress_outbox, 'apply_events', side_effect=poison_bob), \
+                self.assertLogs(progress_outbox.logger, 'ERROR'):
+            self.assertEqual(drain(), (1, 1))
+        self.assertEqual(self._progress(), 2)
+        self.assertEqual(self._progress(bob), 0)
+        self.assertEqual(pending_count(), 1)
+
+    def test_repeatedly_failing_event_becomes_dead_letter(self):
+        self._record(self.user)
+        with mock.patch.object(progress_outbox, 'apply_events', side_effect=RuntimeError), \
+                self.assertLogs(progress_outbox.logger, 'ERROR'):
+            for _ in range(MAX_ATTEMPTS):
+                drain()
+        self.assertEqual((pending_count(), dead_count()), (0, 1))
+        self.assertEqual(drain_all(), 0)
+
+        self.assertEqual(retry_dead(), 1)
+        self.assertEqual(drain_all(), 1)
+        self.assertEqual(self._progress(), 1)
+
+    def test_sync_apply_failure_does_not_fail_the_request(self):
+        with mock.patch.object(progress_outbox, 'drain_all', side_effect=RuntimeError), \
+                self.assertLogs(progress_outbox.logger, 'ERROR'), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/diaries/', {'content': "今天很開心", 'date': '2024-05-01'}, format='json')
+        self.assertLess(response.status_code, 300)
+        self.assertGreater(pending_count(), 0)  # 事件留在表裡，之後補做
+
+    def test_group_already_taken_is_not_applied(self):
+        self._record(self.user)
+
+        real_select = progress_outbox._select_batch
+
+        def with_taken_event(cur, limit):
+            # 另一個行程已經刪除並套用過的事件：DELETE 刪不到它，這組回滾
+            return real_select(cur, limit) + [('taken', self.user.id, 'first_diary', 1.0)]
+
+        with mock.patch.object(progress_outbox, '_select_batch', side_effect=with_taken_event):
+            self.assertEqual(drain(), (0, 0))
+        self.assertEqual(self._progress(), 0)
+        self.assertEqual(pending_count(), 1)
+
+    def test_diary_create_records_progress(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/diaries/', {'content': "今天很開心", 'date': '2024-05-01'}, format='json')
+        self.assertLess(response.status_code, 300)
+        self.assertEqual(self._progress(), 1)
@@ -0,0 +1,76 @@
+# backend/api/tests/test_sentiment_batcher.py
+import threading
+from concurrent.futures import TimeoutError
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from api.utils import sentiment_cache
+from api.utils.sentiment_batcher import MicroBatcher, is_batching_enabled
+
+
+def _result(text):
+    return ('neutral', f"AI:{text}", [], [])
+
+
+class MicroBatcherTests(SimpleTestCase):
+    def test_batches_concurrent_calls(self):
+        sizes = []
+
+        def batch_fn(texts):
+            sizes.append(len(texts))
+            return [_result(t) for t in texts]
+
+        batcher = MicroBatcher(batch_fn, max_batch_size=4, max_wait=0.05)
+        futures = [batcher.submit(f"t{i}") for i in range(4)]
+        self.assertEqual([f.result(timeout=5) for f in futures], [_result(f"t{i}") for i in range(4)])
+        self.assertEqual(sum(sizes), 4)
+        self.assertLess(len(sizes), 4)
+
+    def test_infer_times_out_and_the_cancelled_call_is_skipped(self):
+        release = threading.Event()
+        seen = []
+
+        def batch_fn(texts):
+            seen.extend(texts)
+            release.wait(5)
+            return [_result(t) for t in texts]
+
+        batcher = MicroBatcher(batch_fn, max_batch_size=1, max_wait=0, timeout=0.05)
+        first = batcher.submit('slow')         # 佔住 worker
+        with self.assertRaises(TimeoutError):
+            batcher.infer('queued')            # 排在後面，用預設的 timeout 逾時
+        release.set()
+        self.assertEqual(first.result(timeout=5), _result('slow'))
+        self.assertEqual(batcher.infer('next', timeout=5), _result('next'))
+        self.assertEqual(seen, ['slow', 'next'])
+
+
+class BatchingSwitchTests(SimpleTestCase):
+    def setUp(self):
+        sentiment_cache.reset_cache()
+        self.addCleanup(sentiment_cache.reset_cache)
+
+    @override_settings(SENTIMENT_BATCHING=True, SENTIMENT_BATCH_FN=None)
+    def test_needs_a_vectorized_batch_fn(self):
+        with mock.patch('api.utils.sentiment_batcher.vectorized_batch_fn', return_value=None):
+            self.assertFalse(is_batching_enabled())
+
+    @override_settings(SENTIMENT_BATCHING=False)
+    def test_analyze_many_skips_the_batcher_when_disabled(self):
+        with mock.patch.object(sentiment_cache, 'get_batcher') as get_batcher, \
+                mock.patch.object(sentiment_cache, 'emotion_models') as models:
+            models.return_value.analyze_sentiment.side_effect = _result
+            results = sentiment_cache.cached_analyze_many(['a', 'b', 'a'])
+        get_batcher.assert_not_called()
+        self.assertEqual(models.return_value.analyze_sentiment.call_count, 2)  # 同內容只推論一次
+        self.assertEqual([r[1] for r in results], ['AI:a', 'AI:b', 'AI:a'])
+
+    @override_settings(SENTIMENT_BATCHING=True)
+    def test_analyze_many_uses_the_batcher_when_enabled(self):
+        batcher = MicroBatcher(lambda texts: [_result(t) for t in texts])
+        with mock.patch.object(sentiment_cache, 'is_batching_enabled', return_value=True), \
+                mock.patch.object(sentiment_cache, 'get_batcher', return_value=batcher):
+            results = sentiment_cache.cached_analyze_many(['a', 'b'])
+        self.assertEqual(batcher.stats()['batches'], 1)
+        self.assertEqual([r[1] for r in results], ['AI:a', 'AI:b'])
@@ -0,0 +1,25 @@
+# backend/api/tests/test_shared_cache.py
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from api.utils.shared_cache import check_shared_cache, is_process_local
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+DBCACHE = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'cache'}}
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    @override_settings(CACHES=LOCMEM)
+    def test_local_cache_rejected_with_several_workers(self):
+        self.assertTrue(is_process_local())
+        with self.assertRaises(ImproperlyConfigured):
+            check_shared_cache(3)
+
+    @override_settings(CACHES=LOCMEM)
+    def test_local_cache_allowed_with_one_worker(self):
+        check_shared_cache(1)
+
+    @override_settings(CACHES=DBCACHE)
+    def test_shared_cache_accepted(self):
+        self.assertFalse(is_process_local())
+        check_shared_cache(3)
@@ -0,0 +1,71 @@
+# backend/api/tests/test_sync_journal.py
+from unittest import mock
+
+from django.core.cache import cache
+
+from api.models import Todo
+from api.utils import sync_journal
+from api.utils.sync_journal import current_cursor, prune, read_changes
+
+from .base import ApiTestCase
+
+
+class SyncJournalTests(ApiTestCase):
+    def _todo(self, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Todo.objects.create(user=self.user, title=title, date='2024-05-01')
+
+    def test_changes_since_cursor(self):
+        kept = self._todo("買牛奶")
+        cursor = current_cursor(self.user.id)
+        removed = self._todo("繳電費")
+        with self.captureOnCommitCallbacks(execute=True):
+            kept.title = "買豆漿"
+            kept.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            removed_pk = removed.pk
+            removed.delete()
+
+        upserted, deleted, new_cursor, reset = read_changes(self.user.id, 'todo', cursor)
+        self.assertEqual((upserted, deleted, reset), ([kept.pk], [removed_pk], False))
+        self.assertEqual(new_cursor, current_cursor(self.user.id))
+        self.assertEqual(read_changes(self.user.id, 'todo', new_cursor), ([], [], new_cursor, False))
+
+    def test_journal_does_not_live_in_the_cache(self):
+        cursor = current_cursor(self.user.id)
+        todo = self._todo("買牛奶")
+        cache.clear()  # 例如換了一個 worker、或 cache 被清空
+        self.assertEqual(read_changes(self.user.id, 'todo', cursor)[0], [todo.pk])
+
+    def test_unknown_cursor_requires_resync(self):
+        self._todo("買牛奶")
+        latest = current_cursor(self.user.id)
+        upserted, deleted, cursor, reset = read_changes(self.user.id, 'todo', latest + 50)
+        self.assertTrue(reset)
+        self.assertEqual((upserted, deleted, cursor), ([], [], latest))
+
+    def test_pruned_cursor_requires_resync(self):
+        self._todo("買牛奶")
+        self._todo("繳電費")
+        prune(-1)  # 全部清掉
+        latest = current_cursor(self.user.id)
+        self.assertTrue(read_changes(self.user.id, 'todo', 0)[3])
+        self.assertEqual(read_changes(self.user.id, 'todo', latest), ([], [], latest, False))
+
+    @mock.patch.object(sync_journal, 'MAX_DELTA', 1)
+    def test_too_far_behind_requires_resync(self):
+        self._todo("買牛奶")
+        self._todo("繳電費")
+        self.assertTrue(read_changes(self.user.id, 'todo', 0)[3])
+
+    def test_list_endpoint(self):
+        response = self.client.get('/api/todos/')
+        cursor = int(response['X-Sync-Cursor'])
+        todo = self._todo("買牛奶")
+
+        data = self.client.get(f'/api/todos/?since={cursor}').json()
+        self.assertFalse(data['reset'])
+        self.assertEqual([item['id'] for item in data['changes']], [todo.pk])
+
+        data = self.client.get(f'/api/todos/?since={data["cursor"] + 100}').json()
+        self.assertTrue(data['reset'])
@@ -0,0 +1,93 @@
+# backend/api/tests/test_todos.py
+import datetime
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import skipUnlessDBFeature
+
+from api.models import Todo
+from api.utils.read_payloads import TODO_RANGE_MAX_DAYS, todo_queryset
+
+from .base import ApiTestCase
+
+DAY = datetime.date(2024, 5, 1)
+
+
+class TodoBulkTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.todos = [Todo.objects.create(user=self.user, title=f"todo {i}", date=DAY) for i in range(3)]
+        self.ids = [t.pk for t in self.todos]
+
+    def _bulk(self, body):
+        return self.client.post('/api/todos/bulk/', body, format='json')
+
+    def _state(self):
+        return list(Todo.objects.filter(user=self.user).order_by('id').values_list('id', 'is_done', 'date'))
+
+    def test_applies_every_action_in_one_request(self):
+        response = self._bulk({'complete': [self.ids[0]], 'delete': [self.ids[1]],
+                               'reorder': [{'id': self.ids[2], 'date': '2024-05-03', 'time': '09:30'}]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._state(), [(self.ids[0], True, DAY), (self.ids[2], False, datetime.date(2024, 5, 3))])
+        self.assertEqual(Todo.objects.get(pk=self.ids[2]).time, datetime.time(9, 30))
+
+    def test_one_bad_item_rolls_back_everything(self):
+        other = Todo.objects.create(user=User.objects.create_user('bob', password='pw'), title="別人的", date=DAY)
+        before = self._state()
+        response = self._bulk({'complete': [self.ids[0]], 'delete': [self.ids[1], other.pk]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['missing'], [other.pk])
+        self.assertEqual(self._state(), before)
+        self.assertTrue(Todo.objects.filter(pk=other.pk).exists())
+
+    def test_invalid_payloads_are_rejected_before_writing(self):
+        before = self._state()
+        for body in ({'complete': 'x'},
+                     {'complete': ['abc']},
+                     {'complete': [self.ids[0]], 'incomplete': [self.ids[0]]},
+                     {'delete': [self.ids[0]], 'complete': [self.ids[0]]},
+                     {'reorder': [{'id': self.ids[0], 'date': '2024-02-31'}]},
+                     {'reorder': [{'id': self.ids[0], 'time': '25:00'}]},
+                     {},
+                     {'complete': list(range(1, 300))}):
+            self.assertEqual(self._bulk(body).status_code, 400, body)
+        self.assertEqual(self._state(), before)
+
+
+class TodoRangeTests(ApiTestCase):
+    def _get(self, **params):
+        return self.client.get('/api/todos/', params)
+
+    def test_range_is_inclusive_and_ordered_by_day(self):
+        for day, title in ((DAY, "a"), (DAY + datetime.timedelta(days=6), "b"), (DAY + datetime.timedelta(days=7), "c")):
+            Todo.objects.create(user=self.user, title=title, date=day)
+        response = self._get(**{'from': '2024-05-01', 'to': '2024-05-07'})
+        self.assertEqual(response.status_code, 200)
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual([row['title'] for row in rows], ["a", "b"])
+
+    def test_range_bounds_and_validation(self):
+        last = DAY + datetime.timedelta(days=TODO_RANGE_MAX_DAYS - 1)
+        self.assertEqual(self._get(**{'from': DAY.isoformat(), 'to': last.isoformat()}).status_code, 200)
+        for params in ({'from': DAY.isoformat(), 'to': (last + datetime.timedelta(days=1)).isoformat()},
+                       {'from': '2024-05-02', 'to': '2024-05-01'},
+                       {'from': '2024-05-01'},
+                       {'from': '2024-02-31', 'to': '2024-03-01'},
+                       {'date': 'tomorrow'}):
+            self.assertEqual(self._get(**params).status_code, 400, params)
+
+
+class TodoQueryPlanTests(ApiTestCase):
+    """todo_user_date_done_idx 不在 migration 裡，由 ensure_schema 建立（測試基底同樣會建）"""
+
+    def _plan(self, params):
+        return todo_queryset(self.user, params).explain()
+
+    @skipUnlessDBFeature('supports_explaining_query_execution')
+    def test_day_and_range_queries_use_the_index(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")  # 資料量小時 planner 會直接 seq scan
+        self.assertIn('todo_user_date_done_idx', self._plan({'date': '2024-05-01'}))
+        self.assertIn('todo_user_date_done_idx', self._plan({'from': '2024-05-01', 'to': '2024-05-07'}))
@@ -0,0 +1,68 @@
+# backend/api/tests/test_wallet.py
+import datetime
+from io import StringIO
+
+from django.core.management import call_command
+
+from api.models import ExpLog
+from api.utils.wallet import decode_cursor, ledger_page, materialized_balance
+
+from .base import ApiTestCase
+
+T0 = datetime.datetime(2024, 5, 1, 12, 0, tzinfo=datetime.timezone.utc)
+
+
+class LedgerOrderingTests(ApiTestCase):
+    """get_exp_time 為 NULL 的舊資料一律排在最舊的一端"""
+
+    def setUp(self):
+        super().setUp()
+        self.logs = {}
+        for name, when, exp in (('null_a', None, 1), ('null_b', None, 2), ('old', T0, 4),
+                                ('tie_a', T0 + datetime.timedelta(hours=1), 8),
+                                ('tie_b', T0 + datetime.timedelta(hours=1), 16)):
+            log = ExpLog.objects.create(user=self.user, get_exp=exp, reason=name, current_total=0)
+            ExpLog.objects.filter(pk=log.pk).update(get_exp_time=when)  # auto_now_add 會蓋掉建立時給的值
+            self.logs[name] = log.pk
+
+    def _walk(self, limit):
+        ids, cursor, pages = [], None, 0
+        while True:
+            rows, cursor = ledger_page(self.user, cursor=cursor, limit=limit)
+            ids += [row['id'] for row in rows]
+            pages += 1
+            if cursor is None:
+                return ids, pages
+
+    def test_pages_cover_null_times_in_order(self):
+        expected = [self.logs[n] for n in ('tie_b', 'tie_a', 'old', 'null_b', 'null_a')]
+        for limit in (1, 2, 3):
+            ids, _ = self._walk(limit)
+            self.assertEqual(ids, expected, f"limit={limit}")
+
+    def test_cursor_on_a_null_time_row(self):
+        rows, cursor = ledger_page(self.user, limit=4)
+        self.assertEqual(rows[-1]['id'], self.logs['null_b'])
+        self.assertEqual(decode_cursor(cursor), (None, self.logs['null_b']))
+        rows, cursor = ledger_page(self.user, cursor=cursor, limit=4)
+        self.assertEqual([row['id'] for row in rows], [self.logs['null_a']])
+        self.assertIsNone(cursor)
+
+    def test_rebuild_matches_the_balance_read_order(self):
+        out = StringIO()
+        call_command('wallet_balances', fix=True, stdout=out)
+        self.assertEqual(materialized_balance(self.user), 31)
+        # 最新一筆（有時間的最大 id）拿到整本帳的總額，NULL 時間的排在最前面先累加
+        self.assertEqual(ExpLog.objects.get(pk=self.logs['null_a']).current_total, 1)
+        self.assertEqual(ExpLog.objects.get(pk=self.logs['tie_b']).current_total, 31)
+
+    def test_wallet_endpoint_follows_next_cursor(self):
+        seen, cursor = [], None
+        while True:
+            params = {'limit': 2, **({'cursor': cursor} if cursor else {})}
+            data = self.client.get('/api/wallet/', params).data
+            seen += [item['reason'] for item in data['recent']]
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, ['tie_b', 'tie_a', 'old', 'null_b', 'null_a'])
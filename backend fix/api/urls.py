@@ -4,6 +4,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework.authtoken.views import obtain_auth_token
 
+from . import async_views
 from .views import (
     RegisterAPIView,
     LogoutView,
@@ -15,6 +16,7 @@ from .views import (
     AchievementListView,
     AchievementClaimView,
     WalletView,
+    InsightsView,
     # 若要用客製化登入，改用下面這個
     # CustomObtainAuthToken,
 )
@@ -42,4 +44,14 @@ urlpatterns = [
     path('achievements/claim/', AchievementClaimView.as_view(), name='achievements-claim'),
     # 錢包（查餘額與最近流水）
     path('wallet/', WalletView.as_view(), name='wallet'),
+
+    # 4. 心情 / 情緒統計（週 / 月 / 年）
+    path('insights/', InsightsView.as_view(), name='insights'),
+
+    # 5. 讀取端點的 async 版本（ASGI；回應與上面同步版相同）
+    path('async/diaries/overview/', async_views.overview, name='async-diary-overview'),
+    path('async/diaries/by-date/<str:date_str>/', async_views.by_date, name='async-diary-by-date'),
+    path('async/achievements/', async_views.achievements, name='async-achievements'),
+    path('async/wallet/', async_views.wallet, name='async-wallet'),
+    path('async/todos/', async_views.todos, name='async-todos'),
 ]
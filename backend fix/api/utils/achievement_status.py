@@ -0,0 +1,197 @@
+# backend/api/utils/achievement_status.py
+"""
+成就列表的狀態計算
+
+- achievement_catalog()：成就清單放行程內快取；後台新增 / 修改 / 刪除成就時
+  透過 signal 更新 Django cache 裡的版本號，各 worker 下一次讀取就會重載。
+  版本號要跨 worker 生效，default cache 必須是共用的（見 shared_cache.py）
+- get_statuses(user, achievements)：1 次 UserAchievementProgress 查詢 + 1 次領取紀錄查詢，
+  門檻在記憶體裡比對，查詢數不隨成就數量增加
+- 領取紀錄記在 api_achievement_claim（見 api/schema.py），由 claims.py 在 claim_achievement
+  入帳成功後於同一個交易寫入；每日成就一天一筆，其餘一人一筆：
+      api_achievement_claim (user_id, achievement_id, period, claimed_on)
+  上線前舊版 claim_achievement 直接入帳的紀錄用 `python manage.py backfill_achievement_claims` 補上
+
+門檻：成就有 target / goal / threshold 欄位就用欄位值，否則看 settings.ACHIEVEMENT_TARGETS
+（預設 DEFAULT_TARGETS），都沒有就是 1。必須與 utils.achievement.get_status 一致，
+tests/test_achievements.py 對整份清單逐筆比對兩者。
+"""
+import threading
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from ..db_routers import use_primary
+from ..models import Achievement, ExpLog, UserAchievementProgress
+from .achievement import get_status
+
+DEFAULT_TARGETS = {'first_diary': 1, 'third_diary': 3}
+TARGET_FIELDS = ('target', 'goal', 'threshold')
+ONCE = 'once'                        # 非每日成就的 period
+LEGACY_REASON_PREFIX = 'achievement:'  # 早期 claims.py 自己入帳時寫的 reason（backfill 用）
+_CATALOG_VERSION_KEY = 'achievement:catalog:version'
+
+_catalog = None          # (version, [Achievement, ...])
+_catalog_lock = threading.Lock()
+
+
+# ---------- 成就清單快取 ----------
+
+def _catalog_version():
+    return cache.get_or_set(_CATALOG_VERSION_KEY, 1, timeout=None)
+
+
+def achievement_catalog():
+    """依 (is_daily, id) 排序的成就清單；版本號沒變就不查 DB"""
+    global _catalog
+    version = _catalog_version()
+    current = _catalog
+    if current is not None and current[0] == version:
+        return current[1]
+    with _catalog_lock:
+        if _catalog is None or _catalog[0] != version:
+            with use_primary():  # 版本號是後台改完才換的：從 replica 讀可能拿到舊清單、卻記在新版本號下
+                _catalog = (version, list(Achievement.objects.all().order_by('is_daily', 'id')))
+        return _catalog[1]
+
+
+def invalidate_catalog():
+    global _catalog
+    try:
+        cache.incr(_CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(_CATALOG_VERSION_KEY, 2, timeout=None)
+    _catalog = None
+
+
+@receiver(post_save, sender=Achievement, dispatch_uid='achievement_catalog_save')
+@receiver(post_delete, sender=Achievement, dispatch_uid='achievement_catalog_delete')
+def _on_achievement_changed(sender, **kwargs):
+    invalidate_catalog()
+
+
+# ---------- 領取紀錄 ----------
+
+def _record(user_id, aid, period, claimed_on):
+    """同一期已有紀錄就不寫；回傳是否新增"""
+    with connection.cursor() as cur:
+        cur.execute("INSERT INTO api_achievement_claim (user_id, achievement_id, period, claimed_on) "
+                    "SELECT %s, %s, %s, %s WHERE NOT EXISTS (SELECT 1 FROM api_achievement_claim "
+                    "WHERE user_id = %s AND achievement_id = %s AND period = %s)",
+                    [user_id, aid, period, claimed_on, user_id, aid, period])
+        return cur.rowcount > 0
+
+
+def record_claim(user, ach, day=None):
+    """claim_achievement 入帳成功後呼叫（同一個交易）"""
+    day = (day or timezone.localdate()).isoformat()
+    return _record(user.pk, str(ach.pk), day if ach.is_daily else ONCE, day)
+
+
+def claimed_sets(user_id):
+    """(領過的 id 集合, 今天領過的 id 集合)；1 次查詢"""
+    today = timezone.localdate().isoformat()
+    with connection.cursor() as cur:
+        cur.execute("SELECT achievement_id, claimed_on FROM api_achievement_claim WHERE user_id = %s", [user_id])
+        rows = cur.fetchall()
+    return {aid for aid, _ in rows}, {aid for aid, day in rows if day == today}
+
+
+def locked_claim_state(user, ach):
+    """
+    領取前的單次查詢：鎖住這個成就的進度列，一併帶出是否已領 → (進度, 領過, 今天領過)。
+    還沒有進度列時回傳 (0, False, False)。呼叫端須在交易內
+    """
+    aid = str(ach.pk)
+    exists = "EXISTS (SELECT 1 FROM api_achievement_claim c WHERE c.user_id = %s AND c.achievement_id = %s{})"
+    row = (UserAchievementProgress.objects
+           .select_for_update()
+           .filter(user=user, achievement_id=aid)
+           .annotate(claimed_ever=RawSQL(exists.format(''), [user.pk, aid], output_field=BooleanField()),
+                     claimed_today=RawSQL(exists.format(' AND c.claimed_on = %s'),
+                                          [user.pk, aid, timezone.localdate().isoformat()],
+                                          output_field=BooleanField()))
+           .values_list('progress', 'claimed_ever', 'claimed_today')
+           .first())
+    if row is None:
+        return 0, False, False
+    progress, ever, today = row
+    return progress or 0, bool(ever), bool(today)
+
+
+def backfill_claims(user_ids=None):
+    """
+    補上 api_achievement_claim 之前的領取：舊版 claim_achievement 的紀錄以 get_status 判斷（逐筆，只在部署時跑一次），
+    早期 claims.py 以 'achievement:<id>' 入帳的 ExpLog 直接換算。回傳新增筆數
+    """
+    catalog = achievement_catalog()
+    by_id = {str(ach.pk): ach for ach in catalog}
+    users = User.objects.order_by('id')
+    if user_ids is not None:
+        users = users.filter(id__in=list(user_ids))
+    else:
+        users = users.filter(id__in=UserAchievementProgress.objects.values('user_id'))  # 沒有進度就不可能領過
+    today = timezone.localdate()
+    added = 0
+    for user in users.iterator():
+        user_id = user.pk
+        for ach in catalog:
+            status_dict = get_status(user, ach)
+            if status_dict["claimed_today"]:
+                added += record_claim(user, ach, today)
+            elif status_dict["unlocked"]:
+                # 每日成就以前哪天領的不重要，只影響 unlocked；period 用 'legacy' 不會擋到今天的領取
+                added += _record(user_id, str(ach.pk), 'legacy' if ach.is_daily else ONCE, None)
+        logs = (ExpLog.objects.filter(user_id=user_id, reason__startswith=LEGACY_REASON_PREFIX)
+                .values_list('reason', 'get_exp_time'))
+        for reason, claimed_at in logs:
+            ach = by_id.get(reason[len(LEGACY_REASON_PREFIX):])
+            if ach is not None:
+                day = timezone.localtime(claimed_at).date() if claimed_at else None
+                if day is not None:
+                    added += record_claim(user, ach, day)
+                else:
+                    added += _record(user_id, str(ach.pk), 'legacy' if ach.is_daily else ONCE, None)
+    return added
+
+
+# ---------- 狀態 ----------
+
+def achievement_target(ach) -> float:
+    for name in TARGET_FIELDS:
+        value = getattr(ach, name, None)
+        if value is not None:
+            return float(value)
+    targets = {**DEFAULT_TARGETS, **(getattr(settings, 'ACHIEVEMENT_TARGETS', None) or {})}
+    return float(targets.get(str(ach.pk), 1))
+
+
+def evaluate(ach, progress, claimed_ever, claimed_today):
+    """與 get_status 相同格式：{"claimable", "claimed_today", "unlocked"}"""
+    reached = (progress or 0) >= achievement_target(ach)
+    return {
+        "claimable": reached and not (claimed_today if ach.is_daily else claimed_ever),
+        "claimed_today": claimed_today,
+        "unlocked": claimed_ever,
+    }
+
+
+def get_statuses(user, achievements):
+    """回傳 {achievement_id: {"claimable", "claimed_today", "unlocked"}}；固定 2 次查詢"""
+    achievements = list(achievements)
+    if not achievements:
+        return {}
+    progress = {str(aid): value for aid, value
+                in UserAchievementProgress.objects.filter(user=user).values_list('achievement_id', 'progress')}
+    claimed_ever, claimed_today = claimed_sets(user.pk)
+    return {
+        ach.pk: evaluate(ach, progress.get(str(ach.pk), 0), str(ach.pk) in claimed_ever, str(ach.pk) in claimed_today)
+        for ach in achievements
+    }
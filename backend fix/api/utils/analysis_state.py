@@ -0,0 +1,95 @@
+# backend/api/utils/analysis_state.py
+"""
+日記 AI 分析狀態（pending / done / failed）
+
+狀態明確記在 api_diary_analysis（見 api/schema.py），不再由分析欄位是否為空推斷：
+    api_diary_analysis (diary_id, status, attempts, content_hash, updated_ms)
+- 排入背景分析時寫 pending（content_hash 是當時送去分析的內容）
+- 分析完成就刪掉該列：沒有列 = done（同步模式在請求內就分析完，從不寫列）
+- 重試用完改為 failed、attempts + 1；分析欄位維持清空，不再把 'failed' 寫進 sentiment
+- 結果回來時內容已被改過（content_hash 不符）就不動狀態，由新內容的那次排程負責
+
+行程重啟時還在 worker pool 裡的工作會遺失，留下的 pending / failed 列用
+`python manage.py requeue_diary_analysis` 重新分析。
+獨立成模組是因為 diary_overview / read_payloads 也要用，而 diary_analysis 會 import 它們。
+"""
+import time
+
+from django.db import connection, transaction
+
+from .sentiment_cache import content_hash
+
+ANALYSIS_PENDING = 'pending'
+ANALYSIS_DONE = 'done'
+ANALYSIS_FAILED = 'failed'
+
+
+def public_sentiment(sentiment):
+    """舊資料的 sentiment 可能還是失敗標記 'failed'：不當成情緒標籤輸出或統計"""
+    return None if sentiment == ANALYSIS_FAILED else sentiment
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def _in(ids):
+    return ', '.join(['%s'] * len(ids))
+
+
+# ---------- 寫入 ----------
+
+def mark_pending(diary_id, content):
+    """排入背景分析；和日記的寫入放在同一個交易"""
+    with transaction.atomic(), connection.cursor() as cur:
+        cur.execute("DELETE FROM api_diary_analysis WHERE diary_id = %s", [diary_id])
+        cur.execute("INSERT INTO api_diary_analysis (diary_id, status, attempts, content_hash, updated_ms) "
+                    "VALUES (%s, %s, 0, %s, %s)",
+                    [diary_id, ANALYSIS_PENDING, content_hash(content or ''), _now_ms()])
+
+
+def mark_finished(diary_id, content, failed=False) -> bool:
+    """背景分析結束：成功刪列、失敗改 failed；內容已被改過時不動，回傳 False"""
+    with connection.cursor() as cur:
+        if failed:
+            cur.execute("UPDATE api_diary_analysis SET status = %s, attempts = attempts + 1, updated_ms = %s "
+                        "WHERE diary_id = %s AND content_hash = %s",
+                        [ANALYSIS_FAILED, _now_ms(), diary_id, content_hash(content or '')])
+        else:
+            cur.execute("DELETE FROM api_diary_analysis WHERE diary_id = %s AND content_hash = %s",
+                        [diary_id, content_hash(content or '')])
+        return cur.rowcount > 0
+
+
+def clear(diary_ids):
+    """日記刪除或已在請求內同步分析完：不再有待處理的分析"""
+    ids = [pk for pk in diary_ids if pk is not None]
+    if ids:
+        with connection.cursor() as cur:
+            cur.execute("DELETE FROM api_diary_analysis WHERE diary_id IN (%s)" % _in(ids), ids)
+
+
+# ---------- 讀取 ----------
+
+def status_map(diary_ids) -> dict:
+    """{diary_id: 狀態}；一次查詢，沒有列的日記是 done"""
+    ids = [pk for pk in diary_ids if pk is not None]
+    result = dict.fromkeys(ids, ANALYSIS_DONE)
+    if ids:
+        with connection.cursor() as cur:
+            cur.execute("SELECT diary_id, status FROM api_diary_analysis WHERE diary_id IN (%s)" % _in(ids), ids)
+            result.update(cur.fetchall())
+    return result
+
+
+def status_for(diary_id) -> str:
+    return status_map([diary_id]).get(diary_id, ANALYSIS_DONE)
+
+
+def outstanding(statuses=(ANALYSIS_PENDING,), older_than_ms=0):
+    """[(diary_id, status, attempts), ...]：狀態符合且至少 older_than_ms 沒動過的列（requeue 用）"""
+    with connection.cursor() as cur:
+        cur.execute("SELECT diary_id, status, attempts FROM api_diary_analysis "
+                    "WHERE status IN (%s) AND updated_ms <= %%s ORDER BY updated_ms" % _in(statuses),
+                    list(statuses) + [_now_ms() - older_than_ms])
+        return cur.fetchall()
@@ -0,0 +1,82 @@
+# backend/api/utils/claims.py
+"""
+成就領取：單一交易 + 冪等
+
+- 在 wallet_lock(user) 內完成「判斷可否領取 → 入帳」，兩次快速點擊會被序列化，
+  第二次看得到第一次的領取紀錄，不會重複入帳
+- 判斷只有一次查詢：select_for_update 鎖住進度列並一併帶出領取紀錄（achievement_status.locked_claim_state）
+- 入帳交給舊版 utils.achievement.claim_achievement：reason 是給使用者看的文字，原有的副作用照舊；
+  成功後在同一個交易寫入 api_achievement_claim
+- Idempotency-Key：同一使用者同一把 key 的結果存 24 小時，重送同一個成就直接回存好的結果；
+  同一把 key 換了成就 id 回 422，不會回放另一個請求的結果
+"""
+from django.core.cache import cache
+
+from .achievement import claim_achievement
+from .achievement_status import achievement_catalog, evaluate, locked_claim_state, record_claim
+from .wallet import materialized_balance, wallet_lock
+
+IDEMPOTENCY_TTL = 24 * 3600
+_IN_PROGRESS = 'in-progress'
+
+
+def _idem_key(user_id, key):
+    return f"claim:idem:{user_id}:{key}"
+
+
+def _find_achievement(aid):
+    for ach in achievement_catalog():
+        if str(ach.pk) == str(aid):
+            return ach
+    return None
+
+
+def _claim(user, aid):
+    ach = _find_achievement(aid)
+    if not ach:
+        return 404, {"detail": "成就不存在"}
+
+    with wallet_lock(user):
+        progress, claimed_ever, claimed_today = locked_claim_state(user, ach)
+        if ach.is_daily and claimed_today:
+            return 409, {"detail": "今天已領取"}
+        if not ach.is_daily and claimed_ever:
+            return 409, {"detail": "已領取過"}
+        if not evaluate(ach, progress, claimed_ever, claimed_today)["claimable"]:
+            return 400, {"detail": "尚未達成領取條件"}
+
+        ok, payload = claim_achievement(user, ach.pk)
+        if not ok:
+            return 400, payload  # {"detail": "..."}
+        record_claim(user, ach)
+
+    payload = dict(payload)  # {"id", "amount", "balance", "status": {...}}
+    if payload.get("balance") is None:
+        payload["balance"] = materialized_balance(user)
+    return 200, {"ok": True, **payload}
+
+
+def claim(user, aid, idempotency_key=None):
+    """回傳 (http_status, payload)"""
+    if not idempotency_key:
+        return _claim(user, aid)
+
+    key = _idem_key(user.id, idempotency_key)
+    fingerprint = str(aid)  # key 綁定請求內容（成就 id）
+    if not cache.add(key, (fingerprint, _IN_PROGRESS), timeout=IDEMPOTENCY_TTL):
+        stored = cache.get(key)
+        if stored is not None:
+            stored_fingerprint, result = stored
+            if stored_fingerprint != fingerprint:
+                return 422, {"detail": "Idempotency-Key 已用於另一個請求"}
+            if result == _IN_PROGRESS:
+                return 409, {"detail": "同一個請求正在處理中"}
+            return result
+
+    try:
+        result = _claim(user, aid)
+    except Exception:
+        cache.delete(key)  # 失敗不記結果，讓 client 可以重試
+        raise
+    cache.set(key, (fingerprint, result), timeout=IDEMPOTENCY_TTL)
+    return result
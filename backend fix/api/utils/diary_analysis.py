@@ -0,0 +1,168 @@
+# backend/api/utils/diary_analysis.py
+"""
+日記 AI 分析排程
+
+- 同步模式：在請求內直接呼叫 analyze_sentiment（測試 / 回退用）
+- 非同步模式：日記先存檔、狀態記為 pending（api_diary_analysis，見 analysis_state.py）並回
+  analysis_status=pending，由本機 worker pool（thread）在背景補上 sentiment / ai_message / keywords / topics
+- 背景分析失敗會重試；重試用完狀態改為 failed，不會一直停在 pending。
+  之後再送出同樣內容會重新排入分析；行程重啟遺失的工作用 `manage.py requeue_diary_analysis` 補做
+
+預設為同步模式（與原本的 API 行為相同，建立日記的回應直接帶分析結果），
+要改成先回 202 再背景分析須明確開啟。
+
+settings.py（皆可省略）：
+    DIARY_ANALYSIS_ASYNC = False    # True → 非同步分析
+    DIARY_ANALYSIS_WORKERS = 2      # 背景分析執行緒數
+    DIARY_ANALYSIS_RETRIES = 2      # 背景分析失敗時的重試次數
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from ..db_routers import pin_user
+from ..models import Diary
+from .analysis_state import (
+    ANALYSIS_DONE, ANALYSIS_FAILED, ANALYSIS_PENDING, clear, mark_finished, mark_pending, outstanding, status_for,
+)
+from .diary_hooks import diary_saved
+from .model_fields import field_names
+from .sentiment_cache import cached_analyze_sentiment, content_hash
+
+logger = logging.getLogger(__name__)
+
+# 分析結果會寫回的欄位（不存在的欄位自動略過）
+ANALYSIS_FIELDS = ('sentiment', 'ai_message', 'keywords', 'topics')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def is_async_enabled() -> bool:
+    return bool(getattr(settings, 'DIARY_ANALYSIS_ASYNC', False))
+
+
+def analysis_values(label, ai_message, keywords, topics):
+    """analyze_sentiment 的結果 → 要寫回日記的 {欄位: 值}"""
+    return {
+        'sentiment': label,
+        'ai_message': ai_message,
+        'keywords': ", ".join(keywords),
+        'topics': ", ".join(topics),
+    }
+
+
+def analyze_content(content: str):
+    """同步分析，回傳 (label, ai_message, {欄位: 值})"""
+    label, ai_message, keywords, topics = cached_analyze_sentiment(content or "")
+    return label, ai_message, analysis_values(label, ai_message, keywords, topics)
+
+
+def pending_values():
+    """內容變更、等待背景分析時要清空的欄位"""
+    return {name: '' for name in ANALYSIS_FIELDS}
+
+
+def analysis_status(obj) -> str:
+    """pending / done / failed（狀態表一次查詢；還沒存檔的日記視為 done）"""
+    return status_for(obj.pk) if obj.pk is not None else ANALYSIS_DONE
+
+
+def unchanged_analysis(diary, content: str, status=None) -> bool:
+    """
+    upsert 用：內容雜湊相同且已分析過 → 可沿用既有結果，不必重跑模型。
+    批次呼叫時傳入事先用 status_map 查好的 status，避免每筆一次查詢
+    """
+    if content_hash(getattr(diary, 'content', '') or '') != content_hash(content):
+        return False
+    return (status or analysis_status(diary)) == ANALYSIS_DONE
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(getattr(settings, 'DIARY_ANALYSIS_WORKERS', 2)),
+                    thread_name_prefix='diary-analysis',
+                )
+    return _executor
+
+
+def _write_back(diary_id, content, values=None):
+    """寫回結果並結束狀態；values=None 表示重試用完、標記 failed"""
+    # 只在內容沒被再次修改時寫回，避免舊結果覆蓋新內容
+    current = Diary.objects.filter(pk=diary_id, content=content)
+    with transaction.atomic():
+        if values is None:
+            written = current.exists()
+        else:
+            fields = field_names(Diary)
+            values = {k: v for k, v in values.items() if k in fields}
+            written = bool(values) and bool(current.update(**values))
+        if not written:
+            return
+        mark_finished(diary_id, content, failed=values is None)
+        diary = Diary.objects.filter(pk=diary_id).first()
+        if diary:
+            diary_saved(diary)
+            # 背景寫入沒有請求的 sticky 標記：讓這位使用者接下來的讀取走 primary，看得到分析結果
+            transaction.on_commit(lambda: pin_user(diary.user_id))
+
+
+def _run_analysis(diary_id, content):
+    close_old_connections()
+    retries = max(0, int(getattr(settings, 'DIARY_ANALYSIS_RETRIES', 2)))
+    try:
+        for attempt in range(retries + 1):
+            try:
+                _, _, values = analyze_content(content)
+            except Exception:
+                if attempt < retries:
+                    logger.warning("diary %s 背景分析失敗，重試第 %d 次", diary_id, attempt + 1, exc_info=True)
+                    time.sleep(0.5 * (attempt + 1))
+                    continue
+                logger.exception("diary %s 背景分析失敗，標記為 failed", diary_id)
+                _write_back(diary_id, content)
+                return
+            _write_back(diary_id, content, values)
+            return
+    except Exception:
+        logger.exception("diary %s 背景分析結果寫回失敗", diary_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_analysis(diary):
+    """狀態記為 pending（和日記同一個交易）；commit 後才丟進 worker pool，確保 worker 看得到剛寫入的日記"""
+    diary_id, content = diary.id, diary.content or ""
+    mark_pending(diary_id, content)
+    transaction.on_commit(lambda: _get_executor().submit(_run_analysis, diary_id, content))
+
+
+def requeue(include_failed=False, min_age=600, dry_run=False):
+    """
+    重新分析行程重啟時遺失的 pending 工作（include_failed 時連 failed 一起）；回傳日記 id 清單。
+    min_age 秒內才排入的略過，可能還在某個 worker 裡跑。在呼叫端行程內跑完才返回
+    """
+    statuses = (ANALYSIS_PENDING, ANALYSIS_FAILED) if include_failed else (ANALYSIS_PENDING,)
+    ids = [diary_id for diary_id, _, _ in outstanding(statuses, older_than_ms=int(min_age * 1000))]
+    if include_failed and 'sentiment' in field_names(Diary):
+        # 舊版把失敗標記寫在 sentiment，沒有狀態列
+        ids += list(Diary.objects.filter(sentiment=ANALYSIS_FAILED).exclude(pk__in=ids).values_list('pk', flat=True))
+    contents = dict(Diary.objects.filter(pk__in=ids).values_list('pk', 'content'))
+    clear([pk for pk in ids if pk not in contents])  # 日記已刪除
+    jobs = [(pk, contents[pk] or "") for pk in ids if pk in contents]
+    if dry_run or not jobs:
+        return [pk for pk, _ in jobs]
+    for pk, content in jobs:
+        mark_pending(pk, content)  # 以目前內容重新計 content_hash
+    workers = int(getattr(settings, 'DIARY_ANALYSIS_WORKERS', 2))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='diary-requeue') as pool:
+        list(pool.map(lambda job: _run_analysis(*job), jobs))
+    return [pk for pk, _ in jobs]
@@ -0,0 +1,25 @@
+# backend/api/utils/diary_hooks.py
+"""日記寫入後要同步更新的衍生資料，集中在這裡（views 與背景 worker 共用）"""
+from .analysis_state import clear as clear_analysis
+from .diary_overview import touch_month
+from .diary_search import index_diary, unindex_diary
+from .insights import refresh_day
+from .sync_journal import OP_DELETE, OP_UPSERT, record_change
+
+
+def diary_saved(diary, old_date=None):
+    touch_month(diary.user_id, getattr(diary, 'date', None))
+    refresh_day(diary.user_id, getattr(diary, 'date', None))
+    if old_date and old_date != getattr(diary, 'date', None):
+        touch_month(diary.user_id, old_date)
+        refresh_day(diary.user_id, old_date)
+    record_change(diary.user_id, 'diary', diary.pk, OP_UPSERT)
+    index_diary(diary)
+
+
+def diary_deleted(diary, pk=None):
+    touch_month(diary.user_id, getattr(diary, 'date', None))
+    refresh_day(diary.user_id, getattr(diary, 'date', None))
+    record_change(diary.user_id, 'diary', pk or diary.pk, OP_DELETE)
+    unindex_diary(pk or diary.pk)
+    clear_analysis([pk or diary.pk])
@@ -0,0 +1,105 @@
+# backend/api/utils/diary_overview.py
+"""
+月曆概覽（/api/diaries/overview/）的每日摘要
+
+- 每位使用者每個月有一個版本戳記（stamp），日記新增 / 修改 / 刪除 / AI 分析完成時更新
+- 摘要列（date, mood, icon, color, snippet, has_ai, ai_preview…）以 stamp 為 key 放在 Django cache；
+  未命中時只查一次、只取需要的欄位（content / ai_message 在 DB 端先截斷）
+- ETag 由 stamp 組成：If-None-Match 相符時直接 304，不碰日記資料
+- stamp 要讓所有 worker 都看到，default cache 必須跨行程共用（見 shared_cache.py）
+- stamp 在寫入 primary 時就換新，摘要列因此一律從 primary 查：從落後的 replica 查到的舊資料
+  會以新 stamp 存進 cache，直到下次寫入前都讀到舊的
+"""
+import time
+
+from django.core.cache import cache
+from django.db.models.functions import Substr, Trim
+from django.utils.http import parse_etags
+
+from ..db_routers import use_primary
+from ..models import Diary
+from .analysis_state import status_map
+from .model_fields import field_names
+
+SNIPPET_LEN = 60
+AI_PREVIEW_LEN = 50
+ROWS_TIMEOUT = 24 * 3600
+
+
+def _month_key(user_id, year, mon):
+    return f"{user_id}:{year:04d}-{mon:02d}"
+
+
+def month_stamp(user_id, year, mon) -> str:
+    return str(cache.get_or_set(f"diary:overview:stamp:{_month_key(user_id, year, mon)}",
+                                time.time_ns, timeout=None))
+
+
+def touch_month(user_id, day):
+    """該月摘要失效（寫入新 stamp，舊的摘要 key 自然不再被讀到）"""
+    if day is None:
+        return
+    cache.set(f"diary:overview:stamp:{_month_key(user_id, day.year, day.month)}",
+              time.time_ns(), timeout=None)
+
+
+def month_etag(user_id, year, mon) -> str:
+    return f'W/"ov-{_month_key(user_id, year, mon)}-{month_stamp(user_id, year, mon)}"'
+
+
+def _opaque(tag):
+    return tag[2:] if tag.startswith('W/') else tag
+
+
+def etag_matches(if_none_match, etag) -> bool:
+    """If-None-Match 逐一比對（弱比較：忽略 W/ 前綴），* 代表任何版本都相符"""
+    if not if_none_match:
+        return False
+    tags = parse_etags(if_none_match)
+    if '*' in tags:
+        return True
+    return _opaque(etag) in {_opaque(tag) for tag in tags}
+
+
+def _query_rows(user_id, year, mon):
+    fields = field_names(Diary)
+    wanted = ['id', 'date'] + [name for name in ('mood', 'emotion', 'weather_icon', 'mood_color')
+                               if name in fields]
+    annotations = {'snippet': Substr('content', 1, SNIPPET_LEN)}
+    if 'ai_message' in fields:
+        annotations['ai_head'] = Substr(Trim('ai_message'), 1, AI_PREVIEW_LEN + 10)
+
+    rows = (Diary.objects
+            .filter(user_id=user_id, date__year=year, date__month=mon)
+            .order_by('date')
+            .annotate(**annotations)
+            .values(*wanted, *annotations))
+
+    rows = list(rows)
+    statuses = status_map([row['id'] for row in rows])  # 整個月一次查詢
+    result = []
+    for row in rows:
+        ai_head = (row.get('ai_head') or '').strip()
+        result.append({
+            'id': row['id'],
+            'date': row['date'].isoformat(),
+            'mood': row.get('mood') or row.get('emotion'),
+            'icon': row.get('weather_icon'),
+            'color': row.get('mood_color'),
+            'has_diary': True,
+            'snippet': row['snippet'] or '',
+            'has_ai': bool(ai_head),
+            'ai_preview': ai_head.replace('\n', ' ')[:AI_PREVIEW_LEN],
+            'analysis_status': statuses[row['id']],
+        })
+    return result
+
+
+def month_rows(user_id, year, mon):
+    key = f"diary:overview:rows:{_month_key(user_id, year, mon)}:{month_stamp(user_id, year, mon)}"
+    rows = cache.get(key)
+    if rows is None:
+        with use_primary():
+            rows = _query_rows(user_id, year, mon)
+        cache.set(key, rows, timeout=ROWS_TIMEOUT)
+    return rows
@@ -0,0 +1,217 @@
+# backend/api/utils/diary_search.py
+"""
+日記全文檢索（content / title / keywords / topics）
+
+- SQLite：FTS5 虛擬表 api_diary_fts（rowid = diary id），bm25 排序
+- PostgreSQL：api_diary_search(tsvector) + GIN 索引，ts_rank 排序
+- 其他資料庫：退回 icontains（無索引，僅供開發）
+
+中文沒有空白斷詞，寫入與查詢都先把連續的 CJK 字切成重疊的雙字詞（bigram），
+「心情很好」→「心情 情很 很好 好」，英數字則轉小寫照空白切；單一個中文字查詢用前綴比對。
+
+索引在日記寫入 commit 後增量更新（diary_hooks），整體重建用
+`python manage.py rebuild_diary_search`。
+"""
+import html
+import re
+
+from django.db import connection, transaction
+
+from ..models import Diary
+
+SNIPPET_RADIUS = 30
+_CJK = r'㐀-䶿一-鿿豈-﫿぀-ヿ가-힯'
+_TOKEN_RE = re.compile(rf'[{_CJK}]+|[^\W_]+', re.UNICODE)
+_CJK_RE = re.compile(rf'^[{_CJK}]+$')
+
+# ---------- 斷詞 ----------
+
+def _terms(text):
+    """原始詞（CJK 整段 / 英數單字），給 highlight 用"""
+    return [t.lower() for t in _TOKEN_RE.findall(text or '')]
+
+
+def tokenize(text) -> list:
+    """索引用：CJK 切 bigram，並補上每段最後一個字，讓任一單字都是某個 token 的開頭"""
+    tokens = []
+    for term in _terms(text):
+        if _CJK_RE.match(term) and len(term) > 1:
+            tokens.extend(term[i:i + 2] for i in range(len(term) - 1))
+            tokens.append(term[-1])
+        else:
+            tokens.append(term)
+    return tokens
+
+
+def query_tokens(query) -> list:
+    """查詢用：回傳 [(token, 是否前綴比對), ...]；單一個中文字用前綴比對"""
+    tokens = []
+    for term in _terms(query):
+        if _CJK_RE.match(term):
+            if len(term) == 1:
+                tokens.append((term, True))
+            else:
+                tokens.extend((term[i:i + 2], False) for i in range(len(term) - 1))
+        else:
+            tokens.append((term, False))
+    return tokens
+
+
+def _document(diary) -> str:
+    parts = [getattr(diary, name, None) or '' for name in ('title', 'content', 'keywords', 'topics')]
+    return ' '.join(tokenize(' '.join(parts)))
+
+
+# ---------- 表（由 ensure_schema 建立，見 api/schema.py） ----------
+
+def _vendor():
+    return connection.vendor
+
+
+def _owner(user_id) -> str:
+    return f"u{user_id}"
+
+
+# ---------- 寫入 ----------
+
+def _write(diary):
+    doc = _document(diary)
+    with connection.cursor() as cur:
+        if _vendor() == 'sqlite':
+            cur.execute("DELETE FROM api_diary_fts WHERE rowid = %s", [diary.pk])
+            cur.execute("INSERT INTO api_diary_fts (rowid, doc, owner) VALUES (%s, %s, %s)",
+                        [diary.pk, doc, _owner(diary.user_id)])
+        elif _vendor() == 'postgresql':
+            cur.execute(
+                "INSERT INTO api_diary_search (diary_id, user_id, document) "
+                "VALUES (%s, %s, to_tsvector('simple', %s)) "
+                "ON CONFLICT (diary_id) DO UPDATE SET user_id = EXCLUDED.user_id, document = EXCLUDED.document",
+                [diary.pk, diary.user_id, doc])
+
+
+def _delete(diary_id):
+    with connection.cursor() as cur:
+        if _vendor() == 'sqlite':
+            cur.execute("DELETE FROM api_diary_fts WHERE rowid = %s", [diary_id])
+        elif _vendor() == 'postgresql':
+            cur.execute("DELETE FROM api_diary_search WHERE diary_id = %s", [diary_id])
+
+
+def index_diary(diary):
+    if diary.pk is None or _vendor() not in ('sqlite', 'postgresql'):
+        return
+    transaction.on_commit(lambda: _write(diary))
+
+
+def unindex_diary(diary_id):
+    if diary_id is None or _vendor() not in ('sqlite', 'postgresql'):
+        return
+    transaction.on_commit(lambda: _delete(diary_id))
+
+
+def rebuild(user_id=None, batch_size=500):
+    """整體重建；回傳處理筆數"""
+    qs = Diary.objects.all().order_by('id')
+    if user_id is not None:
+        qs = qs.filter(user_id=user_id)
+    with transaction.atomic(), connection.cursor() as cur:
+        if _vendor() == 'sqlite':
+            if user_id is None:
+                cur.execute("DELETE FROM api_diary_fts")
+            else:
+                # owner 是索引欄位：用 MATCH 找出該使用者的列，不掃整張表
+                cur.execute("DELETE FROM api_diary_fts WHERE rowid IN ("
+                            "SELECT rowid FROM api_diary_fts WHERE api_diary_fts MATCH %s)",
+                            ['owner : "%s"' % _owner(user_id)])
+        elif _vendor() == 'postgresql':
+            if user_id is None:
+                cur.execute("DELETE FROM api_diary_search")
+            else:
+                cur.execute("DELETE FROM api_diary_search WHERE user_id = %s", [user_id])
+        count = 0
+        for diary in qs.iterator(chunk_size=batch_size):
+            _write(diary)
+            count += 1
+    return count
+
+
+# ---------- 查詢 ----------
+
+def _ranked_ids(user_id, tokens, limit, offset):
+    """回傳 [(diary_id, score), ...]，score 越大越相關"""
+    vendor = _vendor()
+    with connection.cursor() as cur:
+        if vendor == 'sqlite':
+            # owner 也是索引欄位：使用者條件直接在倒排索引內過濾
+            terms = ' '.join('"%s"%s' % (t, '*' if prefix else '') for t, prefix in tokens)
+            match = 'owner : "%s" AND doc : (%s)' % (_owner(user_id), terms)
+            cur.execute(
+                "SELECT rowid, bm25(api_diary_fts) FROM api_diary_fts "
+                "WHERE api_diary_fts MATCH %s "
+                "ORDER BY bm25(api_diary_fts), rowid DESC LIMIT %s OFFSET %s",
+                [match, limit, offset])
+            return [(int(pk), -score) for pk, score in cur.fetchall()]
+        tsquery = ' & '.join("'%s'%s" % (t, ':*' if prefix else '') for t, prefix in tokens)
+        cur.execute(
+            "SELECT s.diary_id, ts_rank(s.document, q) FROM api_diary_search s, "
+            "to_tsquery('simple', %s) q "
+            "WHERE s.user_id = %s AND s.document @@ q "
+            "ORDER BY 2 DESC, s.diary_id DESC LIMIT %s OFFSET %s",
+            [tsquery, user_id, limit, offset])
+        return [(int(pk), float(score)) for pk, score in cur.fetchall()]
+
+
+def highlight(text, query, radius=SNIPPET_RADIUS):
+    """找第一個命中的詞，前後各取 radius 字，命中處包 <mark>（其餘內容已 escape）"""
+    text = text or ''
+    terms = sorted(set(_terms(query)) | {t for t, _ in query_tokens(query)}, key=len, reverse=True)
+    if not terms:
+        return html.escape(text[:radius * 2])
+    pattern = re.compile('|'.join(re.escape(t) for t in terms), re.IGNORECASE)
+    m = pattern.search(text)
+    if not m:
+        return html.escape(text[:radius * 2])
+    start = max(0, m.start() - radius)
+    end = min(len(text), m.end() + radius)
+    window = text[start:end]
+    out, last = [], 0
+    for hit in pattern.finditer(window):
+        out.append(html.escape(window[last:hit.start()]))
+        out.append('<mark>' + html.escape(hit.group(0)) + '</mark>')
+        last = hit.end()
+    out.append(html.escape(window[last:]))
+    return ('…' if start > 0 else '') + ''.join(out) + ('…' if end < len(text) else '')
+
+
+def search(user, query, page=1, page_size=20):
+    """回傳 (results, has_more)；results 依相關度排序"""
+    tokens = query_tokens(query)
+    if not tokens:
+        return [], False
+    offset = (page - 1) * page_size
+
+    if _vendor() in ('sqlite', 'postgresql'):
+            ranked = _ranked_ids(user.id, tokens, page_size + 1, offset)
+    else:
+        qs = Diary.objects.filter(user=user, content__icontains=query.strip()).order_by('-date', '-id')
+        ranked = [(pk, 0.0) for pk in qs.values_list('id', flat=True)[offset:offset + page_size + 1]]
+
+    has_more = len(ranked) > page_size
+    ranked = ranked[:page_size]
+    diaries = Diary.objects.filter(user=user, pk__in=[pk for pk, _ in ranked]).in_bulk()
+
+    results = []
+    for pk, score in ranked:
+        diary = diaries.get(pk)
+        if diary is None:  # 索引還沒追上刪除
+            continue
+        results.append({
+            'id': diary.pk,
+            'date': diary.date.isoformat() if getattr(diary, 'date', None) else None,
+            'title': getattr(diary, 'title', None),
+            'snippet': highlight(diary.content, query),
+            'score': round(score, 4),
+            'keywords': getattr(diary, 'keywords', None),
+            'topics': getattr(diary, 'topics', None),
+        })
+    return results, has_more
@@ -0,0 +1,310 @@
+# backend/api/utils/insights.py
+"""
+心情 / 情緒分析統計（/api/insights/）的 rollup
+
+- 每日 rollup 存在資料庫（api_insights_day，見 api/schema.py），所有 worker 共用、重啟不會遺失：
+    api_insights_day (user_id, day, data)
+    data = {"moods": {心情: 次數}, "sentiments": {標籤: 次數}, "keywords": {...}, "topics": {...},
+            "diaries": 篇數, "moodlogs": 筆數}
+  日記 / 心情紀錄寫入 commit 後只重算那一天（diary_hooks、MoodLog signal；改日期時新舊兩天都重算）
+- 每月統計由當月每日 rollup 合併（一次範圍查詢）
+- 讀取時只碰 rollup；沒有 rollup 的日期回頭查原始資料（以日期範圍一次補齊），
+  只把今天以前、有資料的日子寫回：沒資料的日子不存列（沒有列 = 空的那天），未來的日子也不預先建
+- 目前連續天數直接由日記日期一次查詢往回數，不逐月讀 rollup
+
+首次上線可用 `python manage.py backfill_insights` 預先建好，
+`python manage.py backfill_insights --verify` 比對已存的 rollup 與即時彙總。
+"""
+import datetime
+import json
+from collections import Counter
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+
+from ..db_routers import use_primary
+from ..models import Diary, MoodLog
+from .analysis_state import public_sentiment
+from .model_fields import field_names, first_field
+
+_COUNTERS = ('moods', 'sentiments', 'keywords', 'topics')
+
+
+def _split(value):
+    return [part.strip() for part in (value or '').split(',') if part.strip()]
+
+
+def empty_rollup():
+    return {'moods': {}, 'sentiments': {}, 'keywords': {}, 'topics': {}, 'diaries': 0, 'moodlogs': 0}
+
+
+def has_data(rollup):
+    return bool(rollup['diaries'] or rollup['moodlogs'])
+
+
+def merge(rollups):
+    counters = {name: Counter() for name in _COUNTERS}
+    diaries = moodlogs = 0
+    for r in rollups:
+        for name in _COUNTERS:
+            counters[name].update(r[name])
+        diaries += r['diaries']
+        moodlogs += r['moodlogs']
+    merged = {name: dict(counters[name]) for name in _COUNTERS}
+    merged.update(diaries=diaries, moodlogs=moodlogs)
+    return merged
+
+
+def _days(start, end):
+    day = start
+    while day <= end:
+        yield day
+        day += datetime.timedelta(days=1)
+
+
+# ---------- 由原始資料計算（只在 rollup 缺漏時使用） ----------
+
+def compute_days(user_id, start, end):
+    """[start, end] 每一天的 rollup（沒有資料的日子也回空 rollup）"""
+    result = {day: empty_rollup() for day in _days(start, end)}
+
+    mood_field = first_field(Diary, ('mood', 'emotion'))
+    wanted = ['date'] + [f for f in (mood_field, 'sentiment', 'keywords', 'topics')
+                         if f and f in field_names(Diary)]
+    for row in (Diary.objects
+                .filter(user_id=user_id, date__gte=start, date__lte=end)
+                .values(*wanted)):
+        r = result[row['date']]
+        r['diaries'] += 1
+        mood = row.get(mood_field) if mood_field else None
+        if mood:
+            r['moods'][mood] = r['moods'].get(mood, 0) + 1
+        sentiment = public_sentiment(row.get('sentiment'))
+        if sentiment:
+            r['sentiments'][sentiment] = r['sentiments'].get(sentiment, 0) + 1
+        for name in ('keywords', 'topics'):
+            for word in _split(row.get(name)):
+                r[name][word] = r[name].get(word, 0) + 1
+
+    log_mood = first_field(MoodLog, ('mood', 'emotion', 'label'))
+    log_date = first_field(MoodLog, ('date', 'created_at'))
+    if log_mood and log_date:
+        qs = MoodLog.objects.filter(user_id=user_id)
+        if log_date == 'date':
+            qs = qs.filter(date__gte=start, date__lte=end)
+        else:
+            tz = timezone.get_current_timezone()
+            lo = datetime.datetime.combine(start, datetime.time.min, tzinfo=tz)
+            hi = datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min, tzinfo=tz)
+            qs = qs.filter(created_at__gte=lo, created_at__lt=hi)
+        for stamp, mood in qs.values_list(log_date, log_mood):
+            day = timezone.localtime(stamp).date() if isinstance(stamp, datetime.datetime) else stamp
+            r = result.get(day)
+            if r is None:
+                continue
+            r['moodlogs'] += 1
+            if mood:
+                r['moods'][mood] = r['moods'].get(mood, 0) + 1
+    return result
+
+
+# ---------- rollup 讀取 / 寫入 ----------
+
+def stored_days(user_id, start, end):
+    """已存的每日 rollup（還沒建的日期不在結果裡）"""
+    with connection.cursor() as cur:
+        cur.execute("SELECT day, data FROM api_insights_day WHERE user_id = %s AND day >= %s AND day <= %s",
+                    [user_id, start.isoformat(), end.isoformat()])
+        return {datetime.date.fromisoformat(day): json.loads(data) for day, data in cur.fetchall()}
+
+
+def stored_spans():
+    """{user_id: (最早, 最晚)} 已存 rollup 的日期範圍"""
+    with connection.cursor() as cur:
+        cur.execute("SELECT user_id, MIN(day), MAX(day) FROM api_insights_day GROUP BY user_id")
+        return {user_id: (datetime.date.fromisoformat(lo), datetime.date.fromisoformat(hi))
+                for user_id, lo, hi in cur.fetchall()}
+
+
+def _insert(cur, user_id, rollups):
+    cur.executemany("INSERT INTO api_insights_day (user_id, day, data) VALUES (%s, %s, %s)",
+                    [(user_id, d.isoformat(), json.dumps(r, ensure_ascii=False)) for d, r in rollups.items()])
+
+
+def store_days(user_id, rollups):
+    """寫入（覆蓋）每日 rollup；變空的日子只刪掉舊列"""
+    if not rollups:
+        return
+    days = [d.isoformat() for d in rollups]
+    with transaction.atomic(), connection.cursor() as cur:
+        cur.execute("DELETE FROM api_insights_day WHERE user_id = %s AND day IN (%s)"
+                    % ('%s', ', '.join(['%s'] * len(days))), [user_id] + days)
+        _insert(cur, user_id, {d: r for d, r in rollups.items() if has_data(r)})
+
+
+def _fill_days(user_id, rollups):
+    """補上還沒建的日期；別人剛好先寫了（例如 commit 後的重算）就保留對方的"""
+    if not rollups:
+        return
+    with connection.cursor() as cur:
+        try:
+            with transaction.atomic():
+                _insert(cur, user_id, rollups)
+        except IntegrityError:
+            for day, rollup in rollups.items():
+                try:
+                    with transaction.atomic():
+                        _insert(cur, user_id, {day: rollup})
+                except IntegrityError:
+                    pass
+
+
+def day_rollups(user_id, start, end):
+    """[start, end] 每一天的 rollup；GET 只寫回今天以前、有資料的日子"""
+    result = stored_days(user_id, start, end)
+    missing = [d for d in _days(start, end) if d not in result]
+    if missing:
+        with use_primary():  # 算出來的會寫回 rollup：從落後的 replica 算會把舊資料存下來
+            computed = compute_days(user_id, missing[0], missing[-1])
+        fill = {d: computed[d] for d in missing}
+        today = timezone.localdate()
+        _fill_days(user_id, {d: r for d, r in fill.items() if d < today and has_data(r)})
+        result.update(fill)
+    return result
+
+
+def _month_bounds(year, mon):
+    start = datetime.date(year, mon, 1)
+    nxt = datetime.date(year + (mon == 12), mon % 12 + 1, 1)
+    return start, nxt - datetime.timedelta(days=1)
+
+
+def month_rollup(user_id, year, mon):
+    """{"total": rollup, "active_days": [日, ...]}"""
+    start, end = _month_bounds(year, mon)
+    days = day_rollups(user_id, start, end)
+    return {
+        'total': merge(days.values()),
+        'active_days': sorted(d.day for d, r in days.items() if r['diaries']),
+    }
+
+
+# ---------- 增量維護 ----------
+
+def refresh_day(user_id, day):
+    """交易 commit 後重算某一天"""
+    if day is None:
+        return
+    transaction.on_commit(lambda: store_days(user_id, {day: compute_days(user_id, day, day)[day]}))
+
+
+def _moodlog_day(instance):
+    field = first_field(MoodLog, ('date', 'created_at'))
+    value = getattr(instance, field, None) if field else None
+    if isinstance(value, datetime.datetime):
+        return timezone.localtime(value).date()
+    return value
+
+
+def _on_moodlog_saving(sender, instance, **kwargs):
+    """記下改之前的日期，改日期時舊的那一天也要重算"""
+    if instance.pk is None:
+        return
+    old = MoodLog.objects.filter(pk=instance.pk).first()
+    instance._insights_old_day = _moodlog_day(old) if old else None
+
+
+def _on_moodlog_changed(sender, instance, **kwargs):
+    day = _moodlog_day(instance)
+    refresh_day(instance.user_id, day)
+    old_day = getattr(instance, '_insights_old_day', None)
+    if old_day and old_day != day:
+        refresh_day(instance.user_id, old_day)
+
+
+pre_save.connect(_on_moodlog_saving, sender=MoodLog, dispatch_uid='insights_moodlog_pre_save')
+post_save.connect(_on_moodlog_changed, sender=MoodLog, dispatch_uid='insights_moodlog_save')
+post_delete.connect(_on_moodlog_changed, sender=MoodLog, dispatch_uid='insights_moodlog_delete')
+
+
+# ---------- 統計 ----------
+
+def _top(counter, n=10):
+    return [{'name': k, 'count': v} for k, v in Counter(counter).most_common(n)]
+
+
+def _longest_streak(active_dates):
+    longest = run = 0
+    prev = None
+    for day in sorted(active_dates):
+        run = run + 1 if prev and day - prev == datetime.timedelta(days=1) else 1
+        longest = max(longest, run)
+        prev = day
+    return longest
+
+
+def _current_streak(user_id, today):
+    """
+    到今天為止連續寫日記的天數（今天還沒寫就從昨天算）。
+    一次查詢由今天往回依序讀日記日期（user, date 索引），遇到斷掉的那天就停
+    """
+    dates = (Diary.objects
+             .filter(user_id=user_id, date__lte=today)
+             .order_by('-date')
+             .values_list('date', flat=True)
+             .distinct())
+    streak = 0
+    expected = today
+    for day in dates.iterator():
+        if day == expected:
+            streak += 1
+        elif streak == 0 and day == today - datetime.timedelta(days=1):
+            streak = 1
+        else:
+            break
+        expected = day - datetime.timedelta(days=1)
+    return streak
+
+
+def insights(user_id, range_name, anchor):
+    if range_name == 'week':
+        start = anchor - datetime.timedelta(days=anchor.weekday())
+        end = start + datetime.timedelta(days=6)
+    elif range_name == 'month':
+        start, end = _month_bounds(anchor.year, anchor.month)
+    elif range_name == 'year':
+        start, end = datetime.date(anchor.year, 1, 1), datetime.date(anchor.year, 12, 31)
+    else:
+        raise ValueError("range 只能是 week / month / year")
+
+    if range_name == 'year':
+        months = {m: month_rollup(user_id, anchor.year, m) for m in range(1, 13)}
+        periods = [{'label': f"{anchor.year:04d}-{m:02d}", **months[m]['total']} for m in months]
+        active = {datetime.date(anchor.year, m, d) for m, v in months.items() for d in v['active_days']}
+    else:
+        days = day_rollups(user_id, start, end)
+        periods = [{'label': d.isoformat(), **days[d]} for d in sorted(days)]
+        active = {d for d, r in days.items() if r['diaries']}
+
+    total = merge(periods)
+    return {
+        'range': range_name,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'periods': [{
+            'label': p['label'],
+            'moods': p['moods'],
+            'sentiments': p['sentiments'],
+            'diaries': p['diaries'],
+            'moodlogs': p['moodlogs'],
+        } for p in periods],
+        'moods': total['moods'],
+        'sentiments': total['sentiments'],
+        'top_keywords': _top(total['keywords']),
+        'top_topics': _top(total['topics']),
+        'streaks': {
+            'current': _current_streak(user_id, timezone.localdate()),
+            'longest': _longest_streak(active),   # 查詢範圍內最長連續天數
+        },
+    }
@@ -0,0 +1,124 @@
+# backend/api/utils/media_response.py
+"""
+媒體檔回應：ETag / Last-Modified / 304、HTTP Range（單一區段）、
+以及交給前端 proxy 傳檔的 X-Accel-Redirect（nginx）/ X-Sendfile（Apache）模式
+
+settings.py（皆可省略）：
+    MEDIA_ACCEL_MODE = None                  # None / 'nginx' / 'apache'
+    MEDIA_ACCEL_PREFIX = '/protected-media/' # nginx 內部 location（internal）對應 MEDIA_ROOT
+    MEDIA_CACHE_SECONDS = 3600
+"""
+import mimetypes
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+
+CHUNK_SIZE = 256 * 1024
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _etag(size, mtime):
+    return f'"{size:x}-{int(mtime):x}"'
+
+
+def _not_modified(request, etag, mtime):
+    inm = request.headers.get('If-None-Match')
+    if inm is not None:
+        return etag in [t.strip() for t in inm.split(',')] or inm.strip() == '*'
+    ims = parse_http_date_safe(request.headers.get('If-Modified-Since') or '')
+    return ims is not None and int(mtime) <= ims
+
+
+def _parse_range(header, size):
+    """回傳 (start, end)（含 end）；不支援 / 不適用回 None；無法滿足回 'unsatisfiable'"""
+    m = _RANGE_RE.match((header or '').strip())
+    if not m:
+        return None  # 多段 range 或格式不符：照規範可忽略，回完整檔案
+    first, last = m.groups()
+    if first == '' and last == '':
+        return None
+    if first == '':
+        length = int(last)
+        if length == 0:
+            return 'unsatisfiable'
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return 'unsatisfiable'
+    return start, end
+
+
+def _iter_range(fh, start, length):
+    try:
+        fh.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = fh.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        fh.close()
+
+
+def serve_file(request, storage, name, content_type=None):
+    size = storage.size(name)
+    mtime = storage.get_modified_time(name).timestamp()
+    etag = _etag(size, mtime)
+    content_type = content_type or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(mtime),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': f"private, max-age={getattr(settings, 'MEDIA_CACHE_SECONDS', 3600)}",
+    }
+    if _not_modified(request, etag, mtime):
+        response = HttpResponse(status=304)
+        for k, v in headers.items():
+            response[k] = v
+        return response
+
+    # 交給前端 proxy 傳檔（Range / sendfile 都由 proxy 處理）
+    mode = getattr(settings, 'MEDIA_ACCEL_MODE', None)
+    if mode in ('nginx', 'apache'):
+        response = HttpResponse(content_type=content_type)
+        if mode == 'nginx':
+            prefix = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+            response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + name.lstrip('/')
+        else:
+            response['X-Sendfile'] = storage.path(name)
+        for k, v in headers.items():
+            response[k] = v
+        return response
+
+    byte_range = None
+    if 'Range' in request.headers:
+        if_range = request.headers.get('If-Range')
+        if if_range is None or if_range.strip() == etag:
+            byte_range = _parse_range(request.headers['Range'], size)
+
+    if byte_range == 'unsatisfiable':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range is None:
+        # 完整檔案：FileResponse 走 wsgi.file_wrapper，gunicorn 下會用 sendfile 零拷貝
+        response = FileResponse(storage.open(name, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            _iter_range(storage.open(name, 'rb'), start, length),
+            status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(length)
+
+    for k, v in headers.items():
+        response[k] = v
+    return response
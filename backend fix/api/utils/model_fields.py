@@ -0,0 +1,30 @@
+# backend/api/utils/model_fields.py
+"""
+模型欄位查詢（每個模型只解析一次）
+
+各功能要相容不同版本的模型（有沒有 date / mood / ai_message …），
+欄位集合在第一次查詢時由 _meta 解析後快取，之後每個請求 / 每一列都只是 set 查找，
+不再 hasattr 實例，也不必為了檢查欄位而建一個 Diary()。
+"""
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def field_names(model) -> frozenset:
+    return frozenset(f.name for f in model._meta.get_fields())
+
+
+def has_field(model, name: str) -> bool:
+    return name in field_names(model)
+
+
+def first_field(model, candidates):
+    """candidates 中第一個存在的欄位名稱，都沒有則 None"""
+    names = field_names(model)
+    return next((name for name in candidates if name in names), None)
+
+
+def present_fields(model, candidates) -> tuple:
+    """candidates 中存在的欄位（保持原順序），給 values() 投影用"""
+    names = field_names(model)
+    return tuple(name for name in candidates if name in names)
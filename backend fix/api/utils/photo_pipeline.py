@@ -0,0 +1,254 @@
+# backend/api/utils/photo_pipeline.py
+"""
+照片上傳流程
+
+1. HashingUploadHandler：上傳內容分塊寫進暫存檔（不整張放記憶體），同時計算 sha256
+2. store_original()：原圖以內容雜湊命名 photos/<user_id>/<sha256>.<ext>，
+   同一使用者重複上傳同一張只存一份；本機檔案系統先寫暫存檔再 os.link 到目的檔名，
+   「不存在才建立」是原子的，兩個同時上傳的請求不會各存一份。
+   不支援 hard link 的檔案系統改用 os.replace：檔名就是內容雜湊，覆寫成同樣的內容也無妨
+3. register_photo()：api_photo_blob（見 api/schema.py）以 (使用者, 雜湊) 為主鍵，
+   同時上傳同一張時只有一個請求建得成 Photo，另一個拿到 IntegrityError 後改用既有那筆
+4. schedule_variants()：交易 commit 後丟進 process pool 產生縮圖（thumb）與壓縮展示圖（display），
+   完成後在 api_photo_blob.variants 記下已產生的尺寸
+5. ready_variants()：序列化時一次查出各照片已產生的尺寸（其餘為 None，client 先用原圖），
+   不必每張照片每個尺寸都問一次 storage；建表前的舊照片沒有列，才退回檢查檔案
+
+settings.py（皆可省略）：
+    PHOTO_PIPELINE_WORKERS = 2
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import IntegrityError, close_old_connections, connection, models, transaction
+
+from ..models import Photo
+
+logger = logging.getLogger(__name__)
+
+# 名稱: (最長邊, JPEG 品質)
+VARIANTS = {
+    'thumb': (320, 75),
+    'display': (1280, 82),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """邊寫暫存檔邊算 sha256，完成後掛在 file.sha256"""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self._sha256 = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self._sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        uploaded.sha256 = self._sha256.hexdigest()
+        return uploaded
+
+
+def photo_file_field() -> str:
+    """Photo 上存圖的欄位名稱（第一個 FileField / ImageField）"""
+    for field in Photo._meta.concrete_fields:
+        if isinstance(field, models.FileField):
+            return field.name
+    raise LookupError("Photo 沒有 FileField")
+
+
+def _file_sha256(uploaded):
+    sha = getattr(uploaded, 'sha256', None)
+    if sha:
+        return sha
+    digest = hashlib.sha256()
+    for chunk in uploaded.chunks():
+        digest.update(chunk)
+    uploaded.seek(0)
+    return digest.hexdigest()
+
+
+def _link_into_place(path, uploaded):
+    """暫存檔寫完再 link 成 path：link 遇到已存在的檔案直接失敗，別人存好的完整檔案不會被覆寫"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            for chunk in uploaded.chunks():  # 逐塊複製，不整檔讀入
+                fh.write(chunk)
+        mode = getattr(default_storage, 'file_permissions_mode', None)
+        os.chmod(tmp, mode if mode is not None else 0o644)
+        try:
+            os.link(tmp, path)
+        except FileExistsError:
+            pass  # 同樣內容已由別的請求存好
+        except OSError:
+            # 檔案系統不支援 hard link（部分網路磁碟 / FAT）：改名是原子的，內容相同覆寫也無妨
+            if not os.path.exists(path):
+                os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def content_digest(name: str) -> str:
+    """store_original 回傳的檔名 → 內容雜湊"""
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+def store_original(user, uploaded) -> str:
+    """以內容雜湊存原圖，回傳 storage 內的檔名（已存在就直接沿用）"""
+    ext = os.path.splitext(uploaded.name or '')[1].lower() or '.jpg'
+    name = f"photos/{user.id}/{_file_sha256(uploaded)}{ext}"
+    try:
+        path = default_storage.path(name)
+    except NotImplementedError:
+        path = None
+
+    if path is not None:
+        _link_into_place(path, uploaded)
+        return name
+
+    # 非本機檔案系統（例如 S3）：沒有原子的「不存在才建立」，事後把被改名的重複檔刪掉
+    if not default_storage.exists(name):
+        saved = default_storage.save(name, uploaded)
+        if saved != name:
+            default_storage.delete(saved)
+    return name
+
+
+def variant_name(name: str, variant: str) -> str:
+    return f"{os.path.splitext(name)[0]}__{variant}.jpg"
+
+
+# ---------- api_photo_blob：(使用者, 內容雜湊) → Photo、已產生的尺寸 ----------
+
+def register_photo(user, name, photo_id):
+    """登記新照片；同一使用者同一內容已登記過丟 IntegrityError（呼叫端要包 savepoint）"""
+    with connection.cursor() as cur:
+        cur.execute("INSERT INTO api_photo_blob (owner_id, sha256, photo_id, variants) VALUES (%s, %s, %s, '')",
+                    [user.id, content_digest(name), photo_id])
+
+
+def existing_photo(user, name):
+    """同一使用者同一內容的既有 Photo；沒有回 None"""
+    digest = content_digest(name)
+    with connection.cursor() as cur:
+        cur.execute("SELECT photo_id FROM api_photo_blob WHERE owner_id = %s AND sha256 = %s", [user.id, digest])
+        row = cur.fetchone()
+        if row:
+            photo = Photo.objects.filter(pk=row[0], owner=user).first()
+            if photo is not None:
+                return photo
+            # 照片已刪除：清掉登記，讓這次上傳重新建立
+            cur.execute("DELETE FROM api_photo_blob WHERE owner_id = %s AND sha256 = %s", [user.id, digest])
+            return None
+    # 建表前上傳的舊照片沒有登記：依檔名找，找到就補登
+    photo = Photo.objects.filter(owner=user, **{photo_file_field(): name}).first()
+    if photo is not None:
+        try:
+            with transaction.atomic():
+                register_photo(user, name, photo.pk)
+        except IntegrityError:
+            pass
+    return photo
+
+
+def mark_variants_ready(photo_id, variants=None):
+    with connection.cursor() as cur:
+        cur.execute("UPDATE api_photo_blob SET variants = %s WHERE photo_id = %s",
+                    [','.join(variants or VARIANTS), photo_id])
+
+
+def ready_variants(photos) -> dict:
+    """{photo.pk: {已產生的尺寸}}；一次查詢，沒有登記的舊照片才逐張檢查檔案"""
+    photos = [p for p in photos if p.pk is not None]
+    if not photos:
+        return {}
+    ids = [p.pk for p in photos]
+    with connection.cursor() as cur:
+        cur.execute("SELECT photo_id, variants FROM api_photo_blob WHERE photo_id IN (%s)"
+                    % ', '.join(['%s'] * len(ids)), ids)
+        found = {pk: set(filter(None, variants.split(','))) for pk, variants in cur.fetchall()}
+    field = photo_file_field()
+    for photo in photos:
+        if photo.pk not in found:
+            file = getattr(photo, field, None)
+            found[photo.pk] = set(available_variants(file.name)) if file else set()
+    return found
+
+
+def _render_variants(src_path, outputs):
+    """在子行程執行：outputs = [(目的路徑, 最長邊, 品質), ...]"""
+    from PIL import Image, ImageOps
+
+    with Image.open(src_path) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        for dest, edge, quality in outputs:
+            copy = img.copy()
+            copy.thumbnail((edge, edge))
+            tmp = f"{dest}.part"
+            copy.save(tmp, 'JPEG', quality=quality, optimize=True, progressive=True)
+            os.replace(tmp, dest)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=int(getattr(settings, 'PHOTO_PIPELINE_WORKERS', 2)))
+    return _executor
+
+
+def _on_rendered(photo_id):
+    """在 executor 的管理 thread 執行：成功就記下尺寸已產生"""
+    def callback(future):
+        exc = future.exception()
+        if exc is not None:
+            logger.error("照片縮圖產生失敗：%s", exc)
+            return
+        try:
+            mark_variants_ready(photo_id)
+        except Exception:
+            logger.exception("photo %s 縮圖狀態寫入失敗", photo_id)
+        finally:
+            close_old_connections()
+    return callback
+
+
+def schedule_variants(name: str, photo_id):
+    try:
+        src_path = default_storage.path(name)
+    except NotImplementedError:
+        return  # 非本機檔案系統（例如 S3）：不在這裡產生縮圖
+
+    outputs = []
+    for variant, (edge, quality) in VARIANTS.items():
+        if not default_storage.exists(variant_name(name, variant)):
+            outputs.append((default_storage.path(variant_name(name, variant)), edge, quality))
+    if not outputs:
+        mark_variants_ready(photo_id)  # 同樣內容的檔案先前已產生過
+        return
+    transaction.on_commit(
+        lambda: _get_executor().submit(_render_variants, src_path, outputs).add_done_callback(_on_rendered(photo_id)))
+
+
+def available_variants(name: str):
+    """已產生完成的尺寸名稱（直接問 storage；只給沒有登記的舊照片用）"""
+    return [v for v in VARIANTS if default_storage.exists(variant_name(name, v))]
@@ -0,0 +1,212 @@
+# backend/api/utils/progress_outbox.py
+"""
+成就進度 write-behind（transactional outbox）
+
+views 不再同步呼叫 update_achievement_progress，而是 record_progress() 記一筆事件：
+  1. 事件 INSERT 到 api_progress_outbox（見 api/schema.py），和日記 / 照片的寫入在同一個交易：
+     回滾就一起消失，commit 了就一定在
+  2. commit 後喚醒本行程的背景 worker；worker 每 FLUSH_INTERVAL 秒取一批事件依 (user, 成就) 合併，
+     每組只做一次 progress = F('progress') + 合計（沒有進度列才退回 update_achievement_progress 建立）
+  3. 每組（user, 成就）各自一個 savepoint，「刪掉該組事件」與「套用進度」一起 commit 或回滾：
+     每個事件有自己的 event_id，刪到的筆數不對（別的行程先拿走了）就只跳過該組，
+     同一個事件不會被套用兩次；套用失敗也只回滾該組、attempts + 1，不擋住同批其他組
+  4. attempts 達 MAX_ATTEMPTS 的事件視為 dead letter，不再取出；查明原因後用
+     `python manage.py replay_progress_outbox --retry-dead` 歸零重試
+  5. 沒有 worker 在跑時（行程被砍、只跑 management command）留下的事件，
+     用 `python manage.py replay_progress_outbox` 補做；和執行中的 worker 同時跑也安全
+
+settings.py（皆可省略）：
+    PROGRESS_OUTBOX_ASYNC = True          # False → commit 後立即套用（測試用）
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+
+from ..db_routers import pin_user
+from ..models import UserAchievementProgress
+from .achievement import update_achievement_progress
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 0.5
+MAX_BATCH = 500
+MAX_ATTEMPTS = 5
+
+_lock = threading.Lock()
+_wake = threading.Event()
+_worker = None
+
+
+class _Contended(Exception):
+    """這組事件有部分已被別的行程取走"""
+
+
+def _is_async() -> bool:
+    return bool(getattr(settings, 'PROGRESS_OUTBOX_ASYNC', True))
+
+
+# ---------- 套用 ----------
+
+def coalesce(events):
+    totals = defaultdict(float)
+    for user_id, achievement_id, increment in events:
+        totals[(user_id, str(achievement_id))] += float(increment)
+    return totals
+
+
+def apply_events(events):
+    """合併後套用；回傳合併後的組數。呼叫端負責交易（drain 會把它和刪除事件放在同一個交易）"""
+    totals = coalesce(events)
+    if not totals:
+        return 0
+    users = User.objects.in_bulk({uid for uid, _ in totals})
+    with transaction.atomic():
+        for (user_id, achievement_id), increment in totals.items():
+            updated = (UserAchievementProgress.objects
+                       .filter(user_id=user_id, achievement_id=achievement_id)
+                       .update(progress=F('progress') + increment))
+            if not updated and user_id in users:
+                update_achievement_progress(users[user_id], achievement_id, increment=increment)
+    return len(totals)
+
+
+def pending_count():
+    """待套用的事件數（不含 dead letter）"""
+    with connection.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM api_progress_outbox WHERE attempts < %s", [MAX_ATTEMPTS])
+        return cur.fetchone()[0]
+
+
+def dead_count():
+    with connection.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM api_progress_outbox WHERE attempts >= %s", [MAX_ATTEMPTS])
+        return cur.fetchone()[0]
+
+
+def retry_dead():
+    """把 dead letter 的 attempts 歸零，讓下一輪重新套用；回傳筆數"""
+    with connection.cursor() as cur:
+        cur.execute("UPDATE api_progress_outbox SET attempts = 0 WHERE attempts >= %s", [MAX_ATTEMPTS])
+        return cur.rowcount
+
+
+def _in_ids(ids):
+    return ', '.join(['%s'] * len(ids))
+
+
+def _select_batch(cur, limit):
+    sql = ("SELECT event_id, user_id, achievement_id, amount FROM api_progress_outbox "
+           "WHERE attempts < %s ORDER BY created_ms, event_id LIMIT %s")
+    if connection.features.has_select_for_update_skip_locked:
+        sql += " FOR UPDATE SKIP LOCKED"
+    cur.execute(sql, [MAX_ATTEMPTS, limit])
+    return cur.fetchall()
+
+
+def _apply_group(cur, rows):
+    """刪除並套用同一組 (user, 成就) 的事件；呼叫端包 savepoint"""
+    ids = [row[0] for row in rows]
+    cur.execute("DELETE FROM api_progress_outbox WHERE event_id IN (%s)" % _in_ids(ids), ids)
+    if cur.rowcount != len(ids):
+        raise _Contended()
+    apply_events([(user_id, aid, amount) for _, user_id, aid, amount in rows])
+
+
+def _drain(limit):
+    """回傳 (取出的事件數, 套用的事件數, 套用的組數)"""
+    applied = groups = 0
+    with transaction.atomic(), connection.cursor() as cur:
+        rows = _select_batch(cur, limit)
+        by_group = defaultdict(list)
+        for row in rows:
+            by_group[(row[1], str(row[2]))].append(row)
+        for (user_id, achievement_id), group in by_group.items():
+            try:
+                with transaction.atomic():
+                    _apply_group(cur, group)
+            except _Contended:
+                continue
+            except Exception:
+                logger.exception("成就進度套用失敗（user=%s, achievement=%s），%d 筆事件稍後重試",
+                                 user_id, achievement_id, len(group))
+                ids = [row[0] for row in group]
+                cur.execute("UPDATE api_progress_outbox SET attempts = attempts + 1 "
+                            "WHERE event_id IN (%s)" % _in_ids(ids), ids)
+                continue
+            applied += len(group)
+            groups += 1
+            transaction.on_commit(lambda uid=user_id: pin_user(uid))  # 成就列表要看得到剛套用的進度
+    return len(rows), applied, groups
+
+
+def drain(limit=MAX_BATCH):
+    """
+    取出最舊的一批事件，依 (user, 成就) 分組套用並刪除；回傳 (套用的事件數, 套用的組數)。
+    被別的行程搶先或套用失敗的組不計入，失敗的組留在表裡 attempts + 1
+    """
+    _, applied, groups = _drain(limit)
+    return applied, groups
+
+
+def drain_all(limit=MAX_BATCH):
+    """一直套用到取不滿一批、或整批都沒套用成功為止；回傳套用的事件數"""
+    total = 0
+    while True:
+        fetched, applied, _ = _drain(limit)
+        total += applied
+        if fetched < limit or not applied:
+            return total
+
+
+# ---------- worker ----------
+
+def _loop():
+    while True:
+        _wake.wait(FLUSH_INTERVAL)
+        _wake.clear()
+        close_old_connections()
+        try:
+            drain_all()
+        except Exception:
+            logger.exception("成就進度批次套用失敗，稍後重試")
+            time.sleep(FLUSH_INTERVAL)
+        finally:
+            close_old_connections()
+
+
+def _ensure_worker():
+    global _worker
+    if _worker is None or not _worker.is_alive():
+        with _lock:
+            if _worker is None or not _worker.is_alive():
+                _worker = threading.Thread(target=_loop, name='progress-outbox', daemon=True)
+                _worker.start()
+
+
+def _after_commit():
+    if not _is_async():
+        # 在請求裡同步套用：失敗只記 log，事件留在表裡由 worker / replay 補做，不讓已 commit 的請求回 500
+        try:
+            drain_all()
+        except Exception:
+            logger.exception("成就進度同步套用失敗，事件留待重試")
+        return
+    _ensure_worker()
+    _wake.set()
+
+
+def record_progress(user, achievement_id, increment=1.0):
+    """在呼叫端目前的交易內記一筆事件；呼叫端要把它和主要寫入包在同一個 transaction.atomic() 裡"""
+    with connection.cursor() as cur:
+        cur.execute(
+            "INSERT INTO api_progress_outbox (event_id, user_id, achievement_id, amount, created_ms) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            [uuid.uuid4().hex, user.id, str(achievement_id), float(increment), int(time.time() * 1000)])
+    transaction.on_commit(_after_commit)
@@ -0,0 +1,124 @@
+# backend/api/utils/read_payloads.py
+"""
+讀取端點的回應組裝（同步 views 與 async_views 共用）
+
+都是同步函式：async 版本透過 sync_to_async 呼叫，兩邊回傳的內容完全相同。
+"""
+import datetime
+
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from ..indexes import TODO_ORDERING, TODO_RANGE_ORDERING
+from ..models import Diary, Todo
+from .analysis_state import public_sentiment, status_for
+from .achievement_status import achievement_catalog, get_statuses
+from .model_fields import present_fields
+from .wallet import ledger_page, materialized_balance
+
+BY_DATE_COLUMNS = ('id', 'date', 'created_at', 'title', 'content', 'mood', 'emotion', 'mood_color',
+                   'weather_icon', 'ai_message', 'sentiment', 'keywords', 'topics')
+TODO_RANGE_MAX_DAYS = 92
+
+
+def by_date_payload(user, dt):
+    """某一天的日記全文；沒有則回 None"""
+    # 只取回應用得到、且模型上存在的欄位（欄位集合只解析一次）
+    columns = present_fields(Diary, BY_DATE_COLUMNS)
+    qs = Diary.objects.filter(user=user)
+    if 'date' in columns:
+        row = qs.filter(date=dt).values(*columns).first()
+    else:
+        start = datetime.datetime(dt.year, dt.month, dt.day, tzinfo=timezone.get_current_timezone())
+        end = start + datetime.timedelta(days=1)
+        row = (qs.filter(created_at__gte=start, created_at__lt=end)
+               .order_by('-created_at').values(*columns).first())
+    if not row:
+        return None
+
+    day = row.get('date') or (row.get('created_at') or timezone.now()).date()
+    ai_message = row.get('ai_message')
+    return {
+        'id': row['id'],
+        'date': day.isoformat(),
+        'title': row.get('title'),
+        'content': row['content'] or '',
+        'mood': row.get('mood') or row.get('emotion'),
+        'color': row.get('mood_color'),
+        'icon': row.get('weather_icon'),
+        'ai_analysis': ai_message,
+        'ai_message': ai_message,
+        'sentiment': public_sentiment(row.get('sentiment')),
+        'keywords': row.get('keywords'),
+        'topics': row.get('topics'),
+        'analysis_status': status_for(row['id']),
+    }
+
+
+def achievements_payload(user):
+    achievements = achievement_catalog()
+    statuses = get_statuses(user, achievements)  # 查詢數固定，不隨成就數量增加
+    items = []
+    for ach in achievements:
+        status_dict = statuses[ach.pk]  # {"claimable", "claimed_today", "unlocked"}
+        items.append({
+            "id": ach.id,
+            "title": ach.achTitle,
+            "desc": ach.achContent,
+            "amount": ach.exp,           # 要發放的情緒餘額
+            "is_daily": ach.is_daily,
+            **status_dict,
+        })
+    return items
+
+
+def wallet_payload(user, cursor=None, limit=30):
+    """cursor / limit 格式錯誤丟 ValueError"""
+    rows, next_cursor = ledger_page(user, cursor=cursor, limit=int(limit))
+    tz = timezone.get_current_timezone()
+    now = timezone.now().isoformat()
+    recent = [{
+        "time": row['get_exp_time'].astimezone(tz).isoformat() if row['get_exp_time'] else now,
+        "delta": row['get_exp'],
+        "reason": row['reason'],
+        "balance": row['current_total'],
+    } for row in rows]
+    return {
+        "balance": materialized_balance(user),
+        "recent": recent,
+        "next_cursor": next_cursor,
+    }
+
+
+def _parse_day(value, name):
+    try:
+        return datetime.datetime.fromisoformat(value).date()
+    except ValueError:
+        raise ValidationError({name: "日期格式錯誤，需 YYYY-MM-DD"})
+
+
+def todo_queryset(user, params):
+    """?date= 或 ?from=&to=；格式錯誤丟 ValidationError"""
+    qs = Todo.objects.filter(user=user)
+
+    # ?from=YYYY-MM-DD&to=YYYY-MM-DD（週檢視等，一次取多天）
+    date_from, date_to = params.get('from'), params.get('to')
+    if date_from or date_to:
+        if not (date_from and date_to):
+            raise ValidationError({"detail": "from 與 to 需同時提供"})
+        start = _parse_day(date_from, 'from')
+        end = _parse_day(date_to, 'to')
+        if end < start:
+            raise ValidationError({"to": "to 不可早於 from"})
+        if (end - start).days >= TODO_RANGE_MAX_DAYS:
+            raise ValidationError({"detail": f"區間最多 {TODO_RANGE_MAX_DAYS} 天"})
+        # 依日期 -> 原排序，與 todo_user_date_done_idx 欄位順序一致
+        return qs.filter(date__gte=start, date__lte=end).order_by(*TODO_RANGE_ORDERING)
+
+    # ?date=YYYY-MM-DD
+    date_str = params.get('date')
+    if date_str:
+        qs = qs.filter(date=_parse_day(date_str, 'date'))
+
+    # 未完成在前 -> 時間（NULL 放最後）-> 建立時間
+    return qs.order_by(*TODO_ORDERING)
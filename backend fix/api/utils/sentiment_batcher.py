@@ -0,0 +1,192 @@
+# backend/api/utils/sentiment_batcher.py
+"""
+情緒分析 micro-batching
+
+多個請求同時送來的文字先排進佇列，湊滿 max_batch_size 筆或等滿 max_wait 秒
+就跑一次批次推論，再把各自的 (label, ai_message, keywords, topics) 還給呼叫端。
+
+批次推論必須是真的向量化實作：SENTIMENT_BATCH_FN 指定的函式，或 emotion_models.analyze_sentiment_batch。
+兩者都沒有時不啟用批次（逐筆推論排進單一 worker 只會比各 thread 直接呼叫更慢），
+cached_analyze_sentiment / cached_analyze_many 直接逐筆呼叫 analyze_sentiment。
+
+settings.py（皆可省略）：
+    SENTIMENT_BATCHING = False          # True → cached_analyze_sentiment 走批次引擎
+    SENTIMENT_BATCH_FN = None           # 'pkg.module.func'：func(texts) -> [(label, ai_message, keywords, topics), ...]
+    SENTIMENT_BATCH_SIZE = 16
+    SENTIMENT_BATCH_WAIT_MS = 10
+    SENTIMENT_BATCH_TIMEOUT = 30        # 秒；呼叫端最多等這麼久，逾時丟 TimeoutError
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+from .warmup import emotion_models
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 30.0
+
+
+def vectorized_batch_fn():
+    """向量化的批次推論函式；沒有就回傳 None"""
+    path = getattr(settings, 'SENTIMENT_BATCH_FN', None)
+    if path:
+        return import_string(path)
+    return getattr(emotion_models(), 'analyze_sentiment_batch', None)
+
+
+def default_batch_fn(texts):
+    batch = vectorized_batch_fn()
+    if batch is None:
+        raise ImproperlyConfigured("沒有向量化的批次推論：請設定 SENTIMENT_BATCH_FN 或提供 analyze_sentiment_batch")
+    return list(batch(texts))
+
+
+class MicroBatcher:
+    def __init__(self, batch_fn=None, max_batch_size=16, max_wait=0.01, timeout=DEFAULT_TIMEOUT):
+        self.batch_fn = batch_fn or default_batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait))
+        self.timeout = float(timeout)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._started_at = None
+        self._batches = 0
+        self._items = 0
+        self._busy_seconds = 0.0
+        self._max_depth = 0
+
+    # ---------- 呼叫端 ----------
+    def submit(self, text) -> Future:
+        self._ensure_worker()
+        fut = Future()
+        self._queue.put((text, fut))
+        depth = self._queue.qsize()
+        if depth > self._max_depth:
+            self._max_depth = depth
+        return fut
+
+    def infer(self, text, timeout=None):
+        """等結果最多 timeout 秒（預設 self.timeout）；逾時取消這筆並丟 TimeoutError"""
+        fut = self.submit(text)
+        try:
+            return fut.result(timeout=self.timeout if timeout is None else timeout)
+        except TimeoutError:
+            fut.cancel()  # 還在佇列裡的話 worker 會跳過它
+            raise
+
+    def run_batch(self, texts):
+        """呼叫端本身已有一批文字（例如批次同步端點）：直接一次推論，不經佇列"""
+        texts = list(texts)
+        if not texts:
+            return []
+        results = []
+        for i in range(0, len(texts), self.max_batch_size):
+            chunk = texts[i:i + self.max_batch_size]
+            results.extend(self._infer(chunk))
+        return results
+
+    def stats(self):
+        with self._lock:
+            batches, items, busy = self._batches, self._items, self._busy_seconds
+            started = self._started_at
+        elapsed = (time.monotonic() - started) if started else 0.0
+        return {
+            'batches': batches,
+            'items': items,
+            'avg_batch_size': (items / batches) if batches else 0.0,
+            'queue_depth': self._queue.qsize(),
+            'max_queue_depth': self._max_depth,
+            'items_per_sec': (items / elapsed) if elapsed else 0.0,
+            'busy_seconds': busy,
+        }
+
+    # ---------- worker ----------
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._started_at = self._started_at or time.monotonic()
+                self._thread = threading.Thread(
+                    target=self._loop, name='sentiment-batcher', daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # 呼叫端已逾時取消的不再推論
+            batch = [(text, fut) for text, fut in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            texts = [text for text, _ in batch]
+            try:
+                results = self._infer(texts)
+            except Exception as exc:
+                for _, fut in batch:
+                    fut.set_exception(exc)
+                continue
+            for (_, fut), result in zip(batch, results):
+                fut.set_result(result)
+
+    def _infer(self, texts):
+        t0 = time.monotonic()
+        results = self.batch_fn(texts)
+        if len(results) != len(texts):
+            raise RuntimeError("batch_fn 回傳筆數與輸入不符")
+        with self._lock:
+            self._started_at = self._started_at or t0
+            self._batches += 1
+            self._items += len(texts)
+            self._busy_seconds += time.monotonic() - t0
+        return results
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+_warned = False
+
+
+def is_batching_enabled() -> bool:
+    """SENTIMENT_BATCHING 打開、而且有向量化的批次推論可用"""
+    global _warned
+    if not getattr(settings, 'SENTIMENT_BATCHING', False):
+        return False
+    if vectorized_batch_fn() is not None:
+        return True
+    if not _warned:
+        _warned = True
+        logger.warning("SENTIMENT_BATCHING 已開啟但沒有向量化的批次推論，改為逐筆推論")
+    return False
+
+
+def get_batcher() -> MicroBatcher:
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(
+                    max_batch_size=getattr(settings, 'SENTIMENT_BATCH_SIZE', 16),
+                    max_wait=getattr(settings, 'SENTIMENT_BATCH_WAIT_MS', 10) / 1000.0,
+                    timeout=getattr(settings, 'SENTIMENT_BATCH_TIMEOUT', DEFAULT_TIMEOUT),
+                )
+    return _batcher
@@ -0,0 +1,190 @@
+# backend/api/utils/sentiment_cache.py
+"""
+analyze_sentiment 結果快取（以「正規化內容 + 模型版本」的雜湊為 key）
+
+settings.py（皆可省略）：
+    SENTIMENT_CACHE = {
+        'BACKEND': 'local',      # 'local'：行程內 LRU；'django'：Django cache（多個 gunicorn worker 共用）
+        'MAX_ENTRIES': 2048,     # local 專用
+        'TTL': 7 * 24 * 3600,    # 秒；None 代表不過期
+        'ALIAS': 'default',      # django 專用：CACHES 的 alias
+    }
+    SENTIMENT_MODEL_VERSION = 'v1'   # 換模型時改版號，舊結果自然失效；
+                                     # 有設就不必為了算快取 key 而載入模型
+"""
+import hashlib
+import re
+import threading
+import unicodedata
+
+from django.conf import settings
+from django.core.cache import caches
+
+from ..metrics import observe_stage
+from .lru import TTLCache
+from .sentiment_batcher import get_batcher, is_batching_enabled
+from .warmup import emotion_models
+
+_WS_RE = re.compile(r'\s+')
+_KEY_PREFIX = 'sentiment:'
+
+
+def normalize_content(content: str) -> str:
+    text = unicodedata.normalize('NFKC', content or '')
+    return _WS_RE.sub(' ', text).strip()
+
+
+def model_version() -> str:
+    configured = getattr(settings, 'SENTIMENT_MODEL_VERSION', None)
+    if configured:
+        return str(configured)
+    return str(getattr(emotion_models(), 'MODEL_VERSION', None) or 'v1')
+
+
+def content_hash(content: str) -> str:
+    """只看內容本身（upsert 比對用）"""
+    return hashlib.sha256(normalize_content(content).encode('utf-8')).hexdigest()
+
+
+def cache_key(content: str) -> str:
+    raw = f"{model_version()}\n{normalize_content(content)}"
+    return _KEY_PREFIX + hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+# ---------- 後端 ----------
+
+class LocalBackend:
+    def __init__(self, max_entries=2048, ttl=None):
+        self._cache = TTLCache(max_entries=max_entries, ttl=ttl)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value):
+        self._cache.set(key, value)
+
+    def clear(self):
+        self._cache.clear()
+
+
+class DjangoCacheBackend:
+    def __init__(self, alias='default', ttl=None):
+        self._alias = alias
+        self._ttl = ttl
+
+    def get(self, key):
+        return caches[self._alias].get(key)
+
+    def set(self, key, value):
+        caches[self._alias].set(key, value, timeout=self._ttl)
+
+    def clear(self):
+        # 共用快取不整個清空，靠改 SENTIMENT_MODEL_VERSION 讓舊 key 失效
+        pass
+
+
+def _build_backend():
+    conf = dict(getattr(settings, 'SENTIMENT_CACHE', {}) or {})
+    name = conf.get('BACKEND', 'local')
+    ttl = conf.get('TTL', 7 * 24 * 3600)
+    if name == 'django':
+        return DjangoCacheBackend(alias=conf.get('ALIAS', 'default'), ttl=ttl)
+    if name == 'local':
+        return LocalBackend(max_entries=conf.get('MAX_ENTRIES', 2048), ttl=ttl)
+    raise ValueError(f"未知的 SENTIMENT_CACHE BACKEND：{name}")
+
+
+_backend = None
+_stats = {'hits': 0, 'misses': 0}
+_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _lock:
+            if _backend is None:
+                _backend = _build_backend()
+    return _backend
+
+
+def reset_cache():
+    """清空行程內狀態（測試或改設定後使用）"""
+    global _backend
+    with _lock:
+        if _backend is not None:
+            _backend.clear()
+        _backend = None
+        _stats['hits'] = 0
+        _stats['misses'] = 0
+
+
+def cache_stats():
+    with _lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': (hits / total) if total else 0.0,
+    }
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+
+def cached_analyze_sentiment(content: str):
+    """與 analyze_sentiment 相同介面：回傳 (label, ai_message, keywords, topics)"""
+    backend = get_backend()
+    key = cache_key(content)
+    hit = backend.get(key)
+    if hit is not None:
+        _count('hits')
+        label, ai_message, keywords, topics = hit
+        return label, ai_message, list(keywords), list(topics)
+
+    _count('misses')
+    with observe_stage('sentiment'):
+        if is_batching_enabled():
+            result = get_batcher().infer(content)
+        else:
+            result = emotion_models().analyze_sentiment(content)
+    label, ai_message, keywords, topics = result
+    backend.set(key, (label, ai_message, tuple(keywords), tuple(topics)))
+    return label, ai_message, list(keywords), list(topics)
+
+
+def cached_analyze_many(contents):
+    """一次分析多篇：先查快取，未命中的文字合成一批推論（沒開批次就逐筆），依輸入順序回傳"""
+    backend = get_backend()
+    contents = list(contents)
+    keys = [cache_key(c) for c in contents]
+    results = [None] * len(contents)
+    pending = {}  # key -> [index, ...]（同內容只推論一次）
+    for i, key in enumerate(keys):
+        hit = backend.get(key)
+        if hit is not None:
+            _count('hits')
+            results[i] = hit
+        else:
+            _count('misses')
+            pending.setdefault(key, []).append(i)
+
+    if pending:
+        texts = [contents[idxs[0]] for idxs in pending.values()]
+        with observe_stage('sentiment'):
+            if is_batching_enabled():
+                inferred = get_batcher().run_batch(texts)
+            else:
+                inferred = [emotion_models().analyze_sentiment(t) for t in texts]
+        for (key, idxs), result in zip(pending.items(), inferred):
+            label, ai_message, keywords, topics = result
+            value = (label, ai_message, tuple(keywords), tuple(topics))
+            backend.set(key, value)
+            for i in idxs:
+                results[i] = value
+
+    return [(label, ai_message, list(keywords), list(topics))
+            for label, ai_message, keywords, topics in results]
@@ -0,0 +1,45 @@
+# backend/api/utils/shared_cache.py
+"""
+跨行程共用的 Django cache
+
+成就清單版本號、Token 驗證快取、月曆摘要 stamp、心情統計 rollup、領取的 Idempotency-Key
+都放在 default cache，所有 worker 必須看到同一份。LocMemCache / DummyCache 只存在單一行程裡，
+多個 gunicorn worker 時一個 worker 的失效別的 worker 看不到，所以只能在單一行程（runserver、測試）使用。
+
+settings.py（多 worker 部署）：
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://…'}}
+    # 或 memcached / DatabaseCache（python manage.py createcachetable）
+
+gunicorn.conf.py 在 worker 啟動時呼叫 check_shared_cache(workers)，設定不符就拒絕啟動。
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_process_local(alias='default') -> bool:
+    conf = (getattr(settings, 'CACHES', None) or {}).get(alias)
+    backend = (conf or {}).get('BACKEND', PROCESS_LOCAL_BACKENDS[0])  # 沒設定時 Django 用 LocMemCache
+    return backend in PROCESS_LOCAL_BACKENDS
+
+
+def check_shared_cache(workers, alias='default'):
+    """多個行程共用同一份資料時，cache 必須是跨行程的"""
+    if int(workers) <= 1:
+        return
+    token_conf = dict(getattr(settings, 'TOKEN_AUTH_CACHE', {}) or {})
+    if token_conf.get('BACKEND', 'django') == 'local':
+        raise ImproperlyConfigured(
+            f"TOKEN_AUTH_CACHE['BACKEND']='local' 只在單一行程內有效，{workers} 個 worker 時登出 / 刪除 token "
+            "無法通知其他 worker；請改用 'django'"
+        )
+    for name in dict.fromkeys([alias, token_conf.get('ALIAS', 'default')]):
+        if is_process_local(name):
+            raise ImproperlyConfigured(
+                f"CACHES['{name}'] 是單一行程的 cache，無法在 {workers} 個 worker 之間共用失效與計數；"
+                "請改用 Redis / Memcached / DatabaseCache，或只開 1 個 worker"
+            )
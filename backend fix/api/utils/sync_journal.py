@@ -0,0 +1,133 @@
+# backend/api/utils/sync_journal.py
+"""
+增量同步（?since=<cursor>）用的變更日誌
+
+- 每位使用者一個遞增序號（cursor），每次新增 / 修改 / 刪除記一筆 (resource, id, op)
+- 日誌存在資料庫（api_sync_seq / api_sync_journal 兩張表，由 ensure_schema 建立，見 api/schema.py），
+  所有 worker 共用、重啟不會遺失：
+    api_sync_seq      (user_id, seq, pruned_through)   每位使用者目前的序號、已清掉的日誌到哪一號
+    api_sync_journal  (user_id, seq, resource, object_id, op, created_ts)
+- 取號（UPDATE api_sync_seq）與寫入日誌在同一個交易內：同一使用者的寫入被列鎖序列化，
+  commit 順序就是序號順序，讀到 cursor N 時 1..N 的日誌一定都已可讀
+- cursor 不認得（比目前序號還大，例如換過資料庫）、落在已清掉的範圍、或落後太多 → 回 reset=true，
+  請 client 做一次完整下載
+
+MoodLog / Todo / Photo 透過 post_save / post_delete 記錄；
+Diary 另有 bulk_create / queryset.update 等不發 signal 的寫入，改由 diary_hooks 記錄。
+舊日誌用 `python manage.py prune_sync_journal --days 30` 清除。
+"""
+import time
+
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connection, connections, transaction
+from django.db.models.signals import post_delete, post_save
+
+from ..models import MoodLog, Photo, Todo
+
+OP_UPSERT = 'upsert'
+OP_DELETE = 'delete'
+
+MAX_DELTA = 2000          # 一次最多回放幾筆日誌，超過就請 client 重新完整同步
+
+def _state(cur, user_id):
+    """回傳 (目前序號, 已清掉的最後一號)"""
+    cur.execute("SELECT seq, pruned_through FROM api_sync_seq WHERE user_id = %s", [user_id])
+    row = cur.fetchone()
+    return (int(row[0]), int(row[1])) if row else (0, 0)
+
+
+def current_cursor(user_id, using=DEFAULT_DB_ALIAS) -> int:
+    """using：和接下來查資料列的 alias 相同（日誌在資料列 commit 後才寫，同一個 alias 上資料列不會比 cursor 舊）"""
+    with connections[using].cursor() as cur:
+        return _state(cur, user_id)[0]
+
+
+def _next_seq(cur, user_id):
+    """取號；UPDATE 拿到列鎖，同一使用者的其他寫入要等這個交易結束"""
+    cur.execute("UPDATE api_sync_seq SET seq = seq + 1 WHERE user_id = %s", [user_id])
+    if cur.rowcount == 0:
+        try:
+            with transaction.atomic():
+                cur.execute("INSERT INTO api_sync_seq (user_id, seq, pruned_through) VALUES (%s, 1, 0)",
+                            [user_id])
+            return 1
+        except IntegrityError:  # 另一個寫入剛好先建了這一列
+            cur.execute("UPDATE api_sync_seq SET seq = seq + 1 WHERE user_id = %s", [user_id])
+    cur.execute("SELECT seq FROM api_sync_seq WHERE user_id = %s", [user_id])
+    return int(cur.fetchone()[0])
+
+
+def _append(user_id, resource, pk, op):
+    with transaction.atomic(), connection.cursor() as cur:
+        seq = _next_seq(cur, user_id)
+        cur.execute(
+            "INSERT INTO api_sync_journal (user_id, seq, resource, object_id, op, created_ts) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            [user_id, seq, resource, pk, op, int(time.time())])
+
+
+def record_change(user_id, resource, pk, op=OP_UPSERT):
+    """交易 commit 後才記錄，client 拿到 cursor 時資料一定已可讀"""
+    if user_id is None or pk is None:
+        return
+    transaction.on_commit(lambda: _append(user_id, resource, pk, op))
+
+
+def read_changes(user_id, resource, since: int, using=DEFAULT_DB_ALIAS):
+    """
+    回傳 (upserted_ids, deleted_ids, new_cursor, reset)
+    同一筆資料多次異動只看最後一次；using 同 current_cursor
+    """
+    with connections[using].cursor() as cur:
+        latest, pruned_through = _state(cur, user_id)
+        if since < pruned_through or since > latest or latest - since > MAX_DELTA:
+            return [], [], latest, since != latest
+        cur.execute(
+            "SELECT object_id, op FROM api_sync_journal "
+            "WHERE user_id = %s AND seq > %s AND seq <= %s AND resource = %s ORDER BY seq",
+            [user_id, since, latest, resource])
+        last_op = {}
+        for pk, op in cur.fetchall():
+            last_op[int(pk)] = op
+
+    upserted = [pk for pk, op in last_op.items() if op == OP_UPSERT]
+    deleted = [pk for pk, op in last_op.items() if op == OP_DELETE]
+    return upserted, deleted, latest, False
+
+
+def prune(older_than_seconds):
+    """刪掉超過 older_than_seconds 秒的日誌；cursor 落在被刪範圍內的 client 之後會收到 reset。回傳刪除筆數"""
+    before = int(time.time() - older_than_seconds)
+    deleted = 0
+    with transaction.atomic(), connection.cursor() as cur:
+        cur.execute(
+            "SELECT user_id, MAX(seq) FROM api_sync_journal WHERE created_ts < %s GROUP BY user_id", [before])
+        for user_id, seq in cur.fetchall():
+            cur.execute("UPDATE api_sync_seq SET pruned_through = %s WHERE user_id = %s AND pruned_through < %s",
+                        [seq, user_id, seq])
+            cur.execute("DELETE FROM api_sync_journal WHERE user_id = %s AND seq <= %s", [user_id, seq])
+            deleted += cur.rowcount
+    return deleted
+
+
+# ---------- signal：MoodLog / Todo / Photo ----------
+
+TRACKED = {
+    MoodLog: ('moodlog', 'user_id'),
+    Todo: ('todo', 'user_id'),
+    Photo: ('photo', 'owner_id'),
+}
+
+
+def _on_saved(sender, instance, **kwargs):
+    resource, owner_attr = TRACKED[sender]
+    record_change(getattr(instance, owner_attr, None), resource, instance.pk, OP_UPSERT)
+
+
+def _on_deleted(sender, instance, **kwargs):
+    resource, owner_attr = TRACKED[sender]
+    record_change(getattr(instance, owner_attr, None), resource, instance.pk, OP_DELETE)
+
+
+for _model in TRACKED:
+    post_save.connect(_on_saved, sender=_model, dispatch_uid=f'sync_journal_save_{_model.__name__}')
+    post_delete.connect(_on_deleted, sender=_model, dispatch_uid=f'sync_journal_delete_{_model.__name__}')
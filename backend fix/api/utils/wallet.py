@@ -0,0 +1,105 @@
+# backend/api/utils/wallet.py
+"""
+情緒餘額（錢包）
+
+- 餘額物化在 ExpLog.current_total：每筆入帳都記下入帳後的總額，
+  讀餘額只要取最新一筆，不必加總整本帳
+- 入帳一律在 wallet_lock(user) 的交易內進行，同一使用者的寫入依序執行，
+  最新一筆的 current_total 永遠等於整本帳的加總
+- ledger_page()：以 (get_exp_time, id) 做 keyset 分頁，每頁成本固定；只取回應要用的欄位（values()）
+- get_exp_time 為 NULL 的舊資料一律視為最舊（各資料庫 NULL 的預設排序位置不同，所有排序都用下面兩組）
+"""
+import base64
+import json
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+
+from ..models import ExpLog
+
+LEDGER_PAGE_SIZE = 30
+LEDGER_MAX_PAGE_SIZE = 100
+LEDGER_COLUMNS = ('id', 'get_exp_time', 'get_exp', 'reason', 'current_total')
+
+# 新到舊 / 舊到新；NULL 時間排在最舊的那一端
+NEWEST_FIRST = (F('get_exp_time').desc(nulls_last=True), F('id').desc())
+OLDEST_FIRST = (F('get_exp_time').asc(nulls_first=True), F('id').asc())
+
+
+@contextmanager
+def wallet_lock(user):
+    """開交易並鎖住使用者列，讓同一人的入帳序列化"""
+    with transaction.atomic():
+        User.objects.select_for_update().filter(pk=user.pk).first()
+        yield
+
+
+def _latest_log(user):
+    # NULL 明確排最後：PostgreSQL 降冪排序時 NULL 預設排在最前面，會被當成最新一筆
+    return (ExpLog.objects
+            .filter(user=user)
+            .order_by(*NEWEST_FIRST)
+            .only('current_total')
+            .first())
+
+
+def materialized_balance(user):
+    log = _latest_log(user)
+    return (log.current_total or 0) if log else 0
+
+
+def credit(user, amount, reason, **extra):
+    """入帳並更新物化餘額；呼叫端須已在 wallet_lock(user) 內"""
+    balance = materialized_balance(user) + amount
+    return ExpLog.objects.create(
+        user=user, get_exp=amount, reason=reason, current_total=balance, **extra
+    )
+
+
+# ---------- keyset 分頁 ----------
+
+def encode_cursor(row) -> str:
+    """row：ledger_page 回傳的一列（dict）；時間為 NULL 時 t 記為 null"""
+    t = row['get_exp_time']
+    raw = json.dumps({'t': t.isoformat() if t else None, 'id': row['id']})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    """回傳 (datetime 或 None, id)；格式錯誤丟 ValueError"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        raw_t = data['t']
+        t = None if raw_t is None else parse_datetime(raw_t)
+        pk = int(data['id'])
+    except (KeyError, TypeError, ValueError, json.JSONDecodeError, UnicodeDecodeError) as exc:
+        raise ValueError("cursor 格式錯誤") from exc
+    if raw_t is not None and t is None:
+        raise ValueError("cursor 格式錯誤")
+    return t, pk
+
+
+def _after(t, pk):
+    """NEWEST_FIRST 順序中排在 (t, pk) 之後的列；NULL 時間在所有有時間的列之後"""
+    if t is None:
+        return Q(get_exp_time__isnull=True, id__lt=pk)
+    return Q(get_exp_time__lt=t) | Q(get_exp_time=t, id__lt=pk) | Q(get_exp_time__isnull=True)
+
+
+def ledger_page(user, cursor=None, limit=LEDGER_PAGE_SIZE):
+    """新到舊；回傳 (rows, next_cursor)，rows 為 LEDGER_COLUMNS 的 dict，沒有下一頁時 next_cursor 為 None"""
+    limit = max(1, min(int(limit), LEDGER_MAX_PAGE_SIZE))
+    qs = ExpLog.objects.filter(user=user)
+    if cursor:
+        qs = qs.filter(_after(*decode_cursor(cursor)))
+    rows = list(qs.order_by(*NEWEST_FIRST).values(*LEDGER_COLUMNS)[:limit + 1])
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1])
+    return rows, next_cursor
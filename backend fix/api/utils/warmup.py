@@ -0,0 +1,57 @@
+# backend/api/utils/warmup.py
+"""
+emotion_models 延遲載入與預熱
+
+emotion_models 在 import 時就會載入模型。其他模組一律透過 emotion_models() 取得，
+第一次真的要推論時才 import：manage.py 指令、測試、只載入 URLconf 的行程都不必付這筆成本。
+
+正式環境（gunicorn，見 gunicorn.conf.py）：
+  - master 在 fork 前呼叫 warmup()：模型只載入一次，worker 以 copy-on-write 共用那些記憶體頁
+  - 每個 worker 啟動後呼叫 warmup(infer=True)：跑一次推論，讓第一個請求不用付延遲初始化的成本
+
+settings.py（皆可省略）：
+    SENTIMENT_WARMUP_INFER = True    # False → worker 啟動時只載入，不跑預熱推論
+"""
+import importlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MODULE = 'api.utils.emotion_models'
+WARMUP_TEXT = "今天天氣很好，心情很愉快。"
+
+_module = None
+_lock = threading.Lock()
+
+
+def emotion_models():
+    """第一次呼叫時才 import（thread-safe），之後直接回傳同一個 module"""
+    global _module
+    if _module is None:
+        with _lock:
+            if _module is None:
+                t0 = time.perf_counter()
+                _module = importlib.import_module(MODULE)
+                logger.info("emotion_models 載入完成：%.2fs", time.perf_counter() - t0)
+    return _module
+
+
+def is_loaded() -> bool:
+    return _module is not None
+
+
+def warmup(infer=False):
+    """載入模型；infer=True 時再跑一次推論。回傳各步驟耗時（秒）"""
+    timings = {}
+    t0 = time.perf_counter()
+    module = emotion_models()
+    timings['load'] = time.perf_counter() - t0
+    if infer and getattr(settings, 'SENTIMENT_WARMUP_INFER', True):
+        t0 = time.perf_counter()
+        module.analyze_sentiment(WARMUP_TEXT)
+        timings['infer'] = time.perf_counter() - t0
+    return timings
@@ -1,13 +1,11 @@
 # backend/api/views.py
 from django.contrib.auth.models import User
-from django.db import IntegrityError
-from django.db.models import F
+from django.db import IntegrityError, transaction
 from django.utils import timezone
-from django.utils.dateparse import parse_date
-from datetime import datetime, timedelta
+from django.utils.dateparse import parse_date, parse_time
 
 from rest_framework import (
-    generics, viewsets, permissions, status, parsers, authentication
+    generics, viewsets, permissions, status, parsers
 )
     # serializers as drf_serializers 只在舊的 AchievementListView 內嵌用到，現在可移除
 from rest_framework.response import Response
@@ -18,28 +16,95 @@ from rest_framework.views import APIView
 from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 
+from .authentication import CachedTokenAuthentication, evict_token
 from .models import (
     MoodLog, Diary, Photo, UserAchievementProgress, Todo,
-    Achievement, ExpLog
 )
 from .serializers import (
     UserRegisterSerializer,
     MoodLogSerializer,
     DiarySerializer,
-    PhotoSerializer,
     UserAchievementSerializer,  # 保留
     TodoSerializer,
 )
-from .utils.emotion_models import analyze_sentiment
+from .utils.diary_analysis import (
+    analyze_content,
+    analysis_values,
+    pending_values,
+    analysis_status,
+    unchanged_analysis,
+    schedule_analysis,
+    is_async_enabled,
+)
 
 # ✅ 成就/錢包共用邏輯改用 utils，避免重複
-from .utils.achievement import (
-    update_achievement_progress,
-    claim_achievement,
-    get_status,
-    current_balance,
-    is_claimable,
+from .utils.analysis_state import ANALYSIS_DONE, clear as clear_analysis, status_map
+from .utils.progress_outbox import record_progress
+from .utils.sentiment_cache import cached_analyze_many
+from .utils.diary_hooks import diary_saved, diary_deleted
+from .utils.diary_overview import etag_matches, month_etag, month_rows
+from .utils.diary_search import search as search_diaries
+from .pagination import KeysetPagination
+from .renderers import FAST_RENDERERS
+from .photo_serializers import PhotoVariantSerializer
+from .utils.photo_pipeline import (
+    VARIANTS,
+    HashingUploadHandler,
+    existing_photo,
+    photo_file_field,
+    ready_variants,
+    register_photo,
+    schedule_variants,
+    store_original,
+    variant_name,
 )
+from .utils.media_response import serve_file
+from .utils.model_fields import has_field, present_fields
+from .utils.read_payloads import achievements_payload, by_date_payload, todo_queryset, wallet_payload
+from .utils.claims import claim
+from .utils.insights import insights
+from .utils.sync_journal import OP_UPSERT, current_cursor, read_changes, record_change
+
+
+DIARY_BATCH_MAX = 100  # /api/diaries/batch/ 單次上限
+TODO_BULK_MAX = 200    # /api/todos/bulk/ 單次上限（各動作合計）
+
+
+# ===================== 增量同步（?since=<cursor>） =====================
+
+class DeltaSyncMixin:
+    """
+    GET 列表加上 ?since=<cursor>：只回傳 cursor 之後新增 / 修改 / 刪除的資料
+      {"changes": [...], "deleted": [id, ...], "cursor": <新 cursor>, "reset": false}
+    reset=true 代表日誌已無法銜接，client 需重新完整下載（完整列表的 X-Sync-Cursor header 即新起點）
+    cursor / 日誌和資料列從同一個 alias 讀（有 replica 時可能是 replica），不會拿到比資料列還新的 cursor
+    """
+    sync_resource = None
+
+    def list(self, request, *args, **kwargs):
+        alias = self.get_queryset().db
+        since = request.query_params.get('since')
+        if since is None:
+            cursor = current_cursor(request.user.id, using=alias)  # 先取 cursor 再查，避免漏掉查詢期間的異動
+            response = super().list(request, *args, **kwargs)
+            response['X-Sync-Cursor'] = str(cursor)
+            return response
+
+        try:
+            since = int(since)
+        except ValueError:
+            return Response({"detail": "since 需為整數 cursor"}, status=400)
+
+        upserted, deleted, cursor, reset = read_changes(request.user.id, self.sync_resource, since, using=alias)
+        changes = []
+        if upserted:
+            changes = self.get_serializer(self.get_queryset().using(alias).filter(pk__in=upserted), many=True).data
+        return Response({
+            "changes": changes,
+            "deleted": deleted,
+            "cursor": cursor,
+            "reset": reset,
+        }, status=200)
 
 
 # ===================== 使用者註冊 / 登入 / 登出 =====================
@@ -72,19 +137,23 @@ class CustomObtainAuthToken(ObtainAuthToken):
 
 
 class LogoutView(generics.GenericAPIView):
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
-        Token.objects.filter(user=request.user).delete()
+        Token.objects.filter(user=request.user).delete()  # post_delete signal 會清掉驗證快取
+        evict_token(getattr(request.auth, 'key', None))
         return Response({'detail': '已成功登出。'}, status=status.HTTP_200_OK)
 
 
 # ===================== 心情紀錄 =====================
 
-class MoodLogViewSet(viewsets.ModelViewSet):
+class MoodLogViewSet(DeltaSyncMixin, viewsets.ModelViewSet):
     serializer_class = MoodLogSerializer
     permission_classes = [IsAuthenticated]
+    sync_resource = 'moodlog'
+    pagination_class = KeysetPagination
+    keyset_ordering = ('id',)
 
     def get_queryset(self):
         return MoodLog.objects.filter(user=self.request.user).order_by('id')
@@ -95,31 +164,52 @@ class MoodLogViewSet(viewsets.ModelViewSet):
 
 # ===================== 日記（含 AI、月概覽、依日期取全文） =====================
 
-class DiaryViewSet(viewsets.ModelViewSet):
+class DiaryViewSet(DeltaSyncMixin, viewsets.ModelViewSet):
     """
     標準端點：
-      - GET    /api/diaries/
+      - GET    /api/diaries/               （?page_size=&cursor= 分頁；?since=<cursor> 只取異動）
       - POST   /api/diaries/               建立日記（這裡做 upsert：同一天存在就更新）
       - PATCH  /api/diaries/{id}/          編輯日記（內容改變會重新分析）
 
     自訂端點：
       - GET    /api/diaries/overview/?month=YYYY-MM
       - GET    /api/diaries/by-date/YYYY-MM-DD/
+      - POST   /api/diaries/batch/         離線補傳多天日記（一次交易寫入）
+      - GET    /api/diaries/search/?q=     全文檢索（內容 / 標題 / 關鍵字 / 主題）
+
+    AI 分析：settings.DIARY_ANALYSIS_ASYNC 開啟時先存檔回 201/202，
+    回應與 overview / by-date 皆帶 analysis_status（pending / done / failed）
     """
     serializer_class = DiarySerializer
     permission_classes = [permissions.IsAuthenticated]
+    sync_resource = 'diary'
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
-        return Diary.objects.filter(user=self.request.user).order_by('-created_at')
+        return Diary.objects.filter(user=self.request.user).order_by('-created_at', '-id')
 
     @staticmethod
     def _has_field(obj, field_name: str) -> bool:
-        return hasattr(obj, field_name)
+        return has_field(type(obj), field_name)
 
     def _set_if_exists(self, obj, field_name: str, value):
         if self._has_field(obj, field_name):
             setattr(obj, field_name, value)
 
+    def _apply_meta(self, diary, emotion, title, mood, mood_color, weather_icon):
+        """標題 / 心情 / 顏色 / 天氣：有傳才覆寫（emotion 為舊欄位，一律覆寫）"""
+        if self._has_field(diary, 'emotion'):
+            diary.emotion = emotion
+        if self._has_field(diary, 'title') and title is not None:
+            diary.title = title
+        if self._has_field(diary, 'mood') and mood:
+            diary.mood = mood
+        if self._has_field(diary, 'mood_color') and mood_color:
+            diary.mood_color = mood_color
+        if self._has_field(diary, 'weather_icon') and weather_icon:
+            diary.weather_icon = weather_icon
+
     # ---------- 新增（含 AI 分析；同一天 upsert） ----------
     def create(self, request, *args, **kwargs):
         user = request.user
@@ -136,39 +226,42 @@ class DiaryViewSet(viewsets.ModelViewSet):
         # 解析日期：未傳就用今天（建議前端也一併傳）
         date_str = request.data.get("date")
         if date_str:
-            dt = parse_date(date_str)
+            try:
+                dt = parse_date(str(date_str))
+            except ValueError:  # 格式對但日期不存在，例如 2024-02-31
+                dt = None
             if not dt:
                 return Response({"detail": "date 格式錯誤，需 YYYY-MM-DD"}, status=400)
         else:
             dt = timezone.localdate()
 
-        # 分析情緒
-        label, ai_message, keywords, topics = analyze_sentiment(content)
-
         # 🔁 upsert：同一天已存在 → 視為更新，避免 UNIQUE(user,date) 衝突
         diary = Diary.objects.filter(user=user, date=dt).first()
+
+        # 分析情緒：內容沒變就沿用舊結果；非同步模式先存檔，交給背景 worker 補上 AI 欄位
+        async_mode = False
+        if diary and unchanged_analysis(diary, content):
+            label = getattr(diary, 'sentiment', None)
+            ai_message = getattr(diary, 'ai_message', None)
+            ai_values = {}
+        elif is_async_enabled():
+            async_mode = True
+            label, ai_message, ai_values = None, None, pending_values()
+        else:
+            label, ai_message, ai_values = analyze_content(content)
+
         if diary:
             diary.content = content
-            if hasattr(diary, 'emotion'):
-                diary.emotion = emotion
-            if hasattr(diary, 'title') and title is not None:
-                diary.title = title
-            if hasattr(diary, 'mood') and mood:
-                diary.mood = mood
-            if hasattr(diary, 'mood_color') and mood_color:
-                diary.mood_color = mood_color
-            if hasattr(diary, 'weather_icon') and weather_icon:
-                diary.weather_icon = weather_icon
-
-            if hasattr(diary, 'sentiment'):
-                diary.sentiment = label
-            if hasattr(diary, 'ai_message'):
-                diary.ai_message = ai_message
-            if hasattr(diary, 'keywords'):
-                diary.keywords = ", ".join(keywords)
-            if hasattr(diary, 'topics'):
-                diary.topics = ", ".join(topics)
+            self._apply_meta(diary, emotion, title, mood, mood_color, weather_icon)
+
+            for field_name, value in ai_values.items():
+                self._set_if_exists(diary, field_name, value)
             diary.save()
+            diary_saved(diary)
+            if async_mode:
+                schedule_analysis(diary)
+            elif ai_values:
+                clear_analysis([diary.pk])  # 已在請求內分析完，先前排入的背景分析作廢
 
             return Response({
                 "success": True,
@@ -176,36 +269,22 @@ class DiaryViewSet(viewsets.ModelViewSet):
                 "label": label,
                 "ai_message": ai_message,
                 "updated": True,
-            }, status=200)
+                "analysis_status": analysis_status(diary),
+            }, status=202 if async_mode else 200)
 
         # 🆕 沒有則新增
         diary = Diary(user=user, content=content, date=dt)
-        if hasattr(diary, 'emotion'):
-            diary.emotion = emotion
-        if hasattr(diary, 'title') and title is not None:
-            diary.title = title
-        if hasattr(diary, 'mood') and mood:
-            diary.mood = mood
-        if hasattr(diary, 'mood_color') and mood_color:
-            diary.mood_color = mood_color
-        if hasattr(diary, 'weather_icon') and weather_icon:
-            diary.weather_icon = weather_icon
-        if hasattr(diary, 'sentiment'):
-            diary.sentiment = label
-        if hasattr(diary, 'ai_message'):
-            diary.ai_message = ai_message
-        if hasattr(diary, 'keywords'):
-            diary.keywords = ", ".join(keywords)
-        if hasattr(diary, 'topics'):
-            diary.topics = ", ".join(topics)
-        diary.save()
-
-        # 成就：只記錄進度，不自動發點數（手動領取）
-        try:
-            update_achievement_progress(user, 'first_diary', increment=1.0)
-            update_achievement_progress(user, 'third_diary', increment=1.0)
-        except Exception:
-            pass
+        self._apply_meta(diary, emotion, title, mood, mood_color, weather_icon)
+        for field_name, value in ai_values.items():
+            self._set_if_exists(diary, field_name, value)
+        # 成就：只記錄進度，不自動發點數（手動領取）；事件和日記同一個交易寫入，由 write-behind worker 合併套用
+        with transaction.atomic():
+            diary.save()
+            diary_saved(diary)
+            record_progress(user, 'first_diary', increment=1.0)
+            record_progress(user, 'third_diary', increment=1.0)
+        if async_mode:
+            schedule_analysis(diary)
 
         return Response({
             "success": True,
@@ -213,11 +292,13 @@ class DiaryViewSet(viewsets.ModelViewSet):
             "label": label,
             "ai_message": ai_message,
             "updated": False,
+            "analysis_status": analysis_status(diary),
         }, status=201)
 
     # ---------- 編輯（PATCH；內容改變則重新分析） ----------
     def partial_update(self, request, *args, **kwargs):
         instance = self.get_object()
+        old_date = getattr(instance, 'date', None)
         dirty = False  # 是否需要重新分析
 
         content = request.data.get('content')
@@ -235,7 +316,10 @@ class DiaryViewSet(viewsets.ModelViewSet):
             instance.title = title
 
         if date_str and self._has_field(instance, 'date'):
-            dt = parse_date(date_str)
+            try:
+                dt = parse_date(str(date_str))
+            except ValueError:  # 格式對但日期不存在，例如 2024-02-31
+                dt = None
             if not dt:
                 return Response({"detail": "date 格式錯誤，需 YYYY-MM-DD"}, status=400)
             instance.date = dt
@@ -247,21 +331,171 @@ class DiaryViewSet(viewsets.ModelViewSet):
         if weather_icon and self._has_field(instance, 'weather_icon'):
             instance.weather_icon = weather_icon
 
-        if dirty:
+        async_mode = dirty and is_async_enabled()
+        if async_mode:
+            for field_name, value in pending_values().items():
+                self._set_if_exists(instance, field_name, value)
+        elif dirty:
             try:
-                label, ai_message, keywords, topics = analyze_sentiment(instance.content or "")
-                self._set_if_exists(instance, 'sentiment', label)
-                self._set_if_exists(instance, 'ai_message', ai_message)
-                self._set_if_exists(instance, 'keywords', ", ".join(keywords))
-                self._set_if_exists(instance, 'topics', ", ".join(topics))
+                _, _, ai_values = analyze_content(instance.content or "")
+                for field_name, value in ai_values.items():
+                    self._set_if_exists(instance, field_name, value)
             except Exception:
-                pass
+                dirty = False
 
         instance.save()
-        return Response({"success": True, "data": DiarySerializer(instance).data}, status=200)
+        diary_saved(instance, old_date=old_date)
+        if async_mode:
+            schedule_analysis(instance)
+        elif dirty:
+            clear_analysis([instance.pk])
+        return Response({
+            "success": True,
+            "data": DiarySerializer(instance).data,
+            "analysis_status": analysis_status(instance),
+        }, status=202 if async_mode else 200)
+
+    # ---------- 批次同步（離線補傳）：POST /api/diaries/batch/ ----------
+    @action(detail=False, methods=['post'], url_path='batch')
+    def batch(self, request):
+        """
+        body: {"entries": [{"date": "YYYY-MM-DD", "content": "...", "title"?, "mood"?, ...}, ...]}
+        同一天已存在 → 更新，否則新增；整批在同一個交易內寫入
+        回傳每一筆的結果：created / updated / unchanged / error
+        """
+        user = request.user
+        entries = request.data.get('entries') if isinstance(request.data, dict) else request.data
+        if not isinstance(entries, list) or not entries:
+            return Response({"detail": "entries 需為非空陣列"}, status=400)
+        if len(entries) > DIARY_BATCH_MAX:
+            return Response({"detail": f"一次最多 {DIARY_BATCH_MAX} 筆"}, status=400)
+
+        # 1) 驗證；同一天重複出現時以最後一筆為準
+        results = [None] * len(entries)
+        by_date = {}
+        for idx, entry in enumerate(entries):
+            entry = entry if isinstance(entry, dict) else {}
+            content = (entry.get('content') or '').strip()
+            try:
+                dt = parse_date(str(entry.get('date') or ''))
+            except ValueError:
+                dt = None
+            if not content:
+                results[idx] = {"index": idx, "status": "error", "error": "日記內容不得為空"}
+            elif not dt:
+                results[idx] = {"index": idx, "status": "error", "error": "date 格式錯誤，需 YYYY-MM-DD"}
+            else:
+                if dt in by_date:
+                    prev_idx = by_date[dt][0]
+                    results[prev_idx] = {"index": prev_idx, "date": dt.isoformat(), "status": "superseded"}
+                by_date[dt] = (idx, content, entry)
+
+        # 2) 一次查出既有日記與其分析狀態
+        existing = {d.date: d for d in Diary.objects.filter(user=user, date__in=list(by_date))}
+        existing_status = status_map([d.pk for d in existing.values()])
+
+        # 3) 套用欄位；內容變了的才需要分析
+        to_create, to_update, to_analyze = [], [], []
+        for dt, (idx, content, entry) in by_date.items():
+            diary = existing.get(dt)
+            if diary is None:
+                diary = Diary(user=user, content=content, date=dt)
+                to_create.append((idx, diary))
+                to_analyze.append(diary)
+            else:
+                if not unchanged_analysis(diary, content, status=existing_status[diary.pk]):
+                    to_analyze.append(diary)
+                diary.content = content
+                to_update.append((idx, diary))
+            self._apply_meta(diary, entry.get('emotion', '') or '', entry.get('title'),
+                             entry.get('mood'), entry.get('mood_color'), entry.get('weather_icon'))
+
+        async_mode = is_async_enabled()
+        if async_mode:
+            for diary in to_analyze:
+                for field_name, value in pending_values().items():
+                    self._set_if_exists(diary, field_name, value)
+        elif to_analyze:
+            analyzed = cached_analyze_many([d.content for d in to_analyze])
+            for diary, result in zip(to_analyze, analyzed):
+                for field_name, value in analysis_values(*result).items():
+                    self._set_if_exists(diary, field_name, value)
+
+        # 4) 同一交易內 bulk 寫入；成就進度事件也在同一個交易，整批只記一次
+        update_fields = list(present_fields(Diary, ('content', 'emotion', 'title', 'mood', 'mood_color',
+                                                    'weather_icon', 'sentiment', 'ai_message', 'keywords', 'topics')))
+        with transaction.atomic():
+            if to_create:
+                Diary.objects.bulk_create([d for _, d in to_create])
+                record_progress(user, 'first_diary', increment=float(len(to_create)))
+                record_progress(user, 'third_diary', increment=float(len(to_create)))
+            if to_update:
+                Diary.objects.bulk_update([d for _, d in to_update], update_fields)
+            if not async_mode:
+                clear_analysis([d.pk for d in to_analyze])
+
+        created_idx = {idx for idx, _ in to_create}
+        analyzed_ids = {id(d) for d in to_analyze}
+        for idx, diary in to_create + to_update:
+            diary_saved(diary)
+            if async_mode and id(diary) in analyzed_ids and diary.pk:
+                schedule_analysis(diary)
+        statuses = status_map([diary.pk for _, diary in to_create + to_update])
+        for idx, diary in to_create + to_update:
+            if idx in created_idx:
+                item_status = "created"
+            elif id(diary) in analyzed_ids:
+                item_status = "updated"
+            else:
+                item_status = "unchanged"
+            results[idx] = {
+                "index": idx,
+                "date": diary.date.isoformat(),
+                "id": diary.pk,
+                "status": item_status,
+                "label": getattr(diary, 'sentiment', None) or None,
+                "analysis_status": statuses.get(diary.pk, ANALYSIS_DONE),
+            }
+
+        return Response({
+            "success": True,
+            "created": len(to_create),
+            "updated": sum(1 for r in results if r and r["status"] == "updated"),
+            "results": results,
+        }, status=200)
+
+    # ---------- 全文檢索：GET /api/diaries/search/?q=...&page=1&page_size=20 ----------
+    @action(detail=False, methods=['get'], url_path='search')
+    def search(self, request):
+        q = (request.query_params.get('q') or '').strip()
+        if not q:
+            return Response({'detail': '請提供 q'}, status=400)
+        try:
+            page = max(1, int(request.query_params.get('page') or 1))
+            page_size = max(1, min(int(request.query_params.get('page_size') or 20), 50))
+        except ValueError:
+            return Response({'detail': 'page / page_size 需為正整數'}, status=400)
+
+        results, has_more = search_diaries(request.user, q, page=page, page_size=page_size)
+        return Response({
+            'results': results,   # 依相關度排序；snippet 內命中處以 <mark> 標示
+            'page': page,
+            'next_page': page + 1 if has_more else None,
+        }, status=200)
+
+    # ---------- PUT / DELETE：同步更新月概覽等衍生資料 ----------
+    def perform_update(self, serializer):
+        old_date = getattr(serializer.instance, 'date', None)
+        instance = serializer.save()
+        diary_saved(instance, old_date=old_date)
 
-     # ---------- 月概覽：/api/diaries/overview/?month=YYYY-MM ----------
-    @action(detail=False, methods=['get'], url_path='overview')
+    def perform_destroy(self, instance):
+        pk = instance.pk  # delete() 後 pk 會被清成 None
+        instance.delete()
+        diary_deleted(instance, pk=pk)
+
+    # ---------- 月概覽：/api/diaries/overview/?month=YYYY-MM ----------
+    @action(detail=False, methods=['get'], url_path='overview', renderer_classes=FAST_RENDERERS)
     def overview(self, request):
         month = request.query_params.get('month')
         if not month or len(month) != 7 or month[4] != '-':
@@ -272,99 +506,133 @@ class DiaryViewSet(viewsets.ModelViewSet):
         except ValueError:
             return Response({'detail': 'month 格式錯誤，需 YYYY-MM'}, status=400)
 
-        qs = self.get_queryset()
-        if self._has_field(Diary(), 'date'):
-            qs = qs.filter(date__year=year, date__month=mon).order_by('date')
-        else:
-            qs = qs.filter(created_at__year=year, created_at__month=mon).order_by('created_at')
-
-        result = []
-        for obj in qs:
-            d = obj.date if self._has_field(obj, 'date') and obj.date else (obj.created_at or timezone.now()).date()
-
-            # ✅ 新增：AI 預覽欄位
-            ai_msg = (getattr(obj, 'ai_message', '') or '').strip()
-            ai_prev = ai_msg.replace('\n', ' ')[:50] if ai_msg else ''
-
-            result.append({
-                'id': obj.id,
-                'date': d.isoformat(),
-                'mood': getattr(obj, 'mood', None) or getattr(obj, 'emotion', None),
-                'icon': getattr(obj, 'weather_icon', None),
-                'color': getattr(obj, 'mood_color', None),
-                'has_diary': True,
-                'snippet': (obj.content or '')[:60],
-                # ✅ 新增這兩個鍵
-                'has_ai': bool(ai_msg),
-                'ai_preview': ai_prev,
-            })
-        return Response(result, status=200)
+        # 該月沒有任何異動 → 304，不碰日記資料
+        etag = month_etag(request.user.id, year, mon)
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            return Response(status=304, headers=headers)
+
+        # 每日摘要：date / mood / icon / color / snippet / has_ai / ai_preview（含 AI 預覽）
+        result = month_rows(request.user.id, year, mon)
+        return Response(result, status=200, headers=headers)
 
     # ---------- 依日期取全文：/api/diaries/by-date/YYYY-MM-DD/ ----------
-    @action(detail=False, methods=['get'], url_path=r'by-date/(?P<date_str>\d{4}-\d{2}-\d{2})')
+    @action(detail=False, methods=['get'], url_path=r'by-date/(?P<date_str>\d{4}-\d{2}-\d{2})',
+            renderer_classes=FAST_RENDERERS)
     def by_date(self, request, date_str=None):
         if not date_str:
             return Response({'detail': '缺少日期參數'}, status=400)
 
-        dt = parse_date(date_str)
+        try:
+            dt = parse_date(date_str)
+        except ValueError:  # 格式對但日期不存在，例如 2024-02-31
+            dt = None
         if not dt:
             return Response({'detail': '日期格式錯誤，需 YYYY-MM-DD'}, status=400)
 
-        qs = self.get_queryset()
-        obj = None
-        if self._has_field(Diary(), 'date'):
-            try:
-                obj = qs.get(date=dt)
-            except Diary.DoesNotExist:
-                return Response({'detail': 'not found'}, status=404)
-        else:
-            start = datetime(dt.year, dt.month, dt.day, 0, 0, 0, tzinfo=timezone.get_current_timezone())
-            end = start + timedelta(days=1)
-            obj = qs.filter(created_at__gte=start, created_at__lt=end).order_by('-created_at').first()
-            if not obj:
-                return Response({'detail': 'not found'}, status=404)
-
-        data = {
-            'id': obj.id,
-            'date': (obj.date.isoformat() if self._has_field(obj, 'date') and obj.date else (obj.created_at or timezone.now()).date().isoformat()),
-            'title': getattr(obj, 'title', None),
-            'content': obj.content or '',
-            'mood': getattr(obj, 'mood', None) or getattr(obj, 'emotion', None),
-            'color': getattr(obj, 'mood_color', None),
-            'icon': getattr(obj, 'weather_icon', None),
-            'ai_analysis': getattr(obj, 'ai_message', None),
-            'ai_message': getattr(obj, 'ai_message', None),
-            'sentiment': getattr(obj, 'sentiment', None),
-            'keywords': getattr(obj, 'keywords', None),
-            'topics': getattr(obj, 'topics', None),
-        }
+        data = by_date_payload(request.user, dt)
+        if data is None:
+            return Response({'detail': 'not found'}, status=404)
         return Response(data, status=200)
 
 
 # ===================== 照片 CRUD + 上傳 =====================
 
-class PhotoViewSet(viewsets.ModelViewSet):
-    authentication_classes = [authentication.TokenAuthentication]
+class PhotoViewSet(DeltaSyncMixin, viewsets.ModelViewSet):
+    """
+    上傳內容分塊寫進暫存檔並算 sha256；同一使用者重複上傳同一張只存一份：
+    回傳既有那筆（這次送來的其他欄位照樣更新上去），狀態碼 200；新照片 201
+    縮圖 / 展示圖在背景 process pool 產生，回應的 variants 帶各尺寸網址
+    """
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
-    serializer_class = PhotoSerializer
+    serializer_class = PhotoVariantSerializer
+    sync_resource = 'photo'
     parser_classes = [parsers.MultiPartParser, parsers.FormParser]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-uploaded_at', '-id')
+
+    def initialize_request(self, request, *args, **kwargs):
+        # 必須在解析 multipart 前換掉 upload handler
+        if request.method == 'POST':
+            request.upload_handlers = [HashingUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
 
     def get_queryset(self):
-        return Photo.objects.filter(owner=self.request.user).order_by('-uploaded_at')
+        return Photo.objects.filter(owner=self.request.user).order_by('-uploaded_at', '-id')
+
+    def _reuse(self, serializer, photo):
+        """重複的內容：沿用既有照片，這次送來的其他欄位（說明等）照樣寫上去"""
+        serializer.validated_data.pop(photo_file_field(), None)
+        serializer.instance = photo
+        if serializer.validated_data:
+            serializer.save()
+        return False
+
+    def _ingest(self, serializer):
+        """存原圖（內容去重）→ 建立 Photo；回傳是否為新照片"""
+        user = self.request.user
+        field = photo_file_field()
+        uploaded = serializer.validated_data.get(field)
+        if uploaded is None:
+            serializer.save(owner=user)
+            return True
+
+        name = store_original(user, uploaded)
+        existing = existing_photo(user, name)
+        if existing:
+            return self._reuse(serializer, existing)
+        try:
+            with transaction.atomic():
+                serializer.save(owner=user, **{field: name})
+                register_photo(user, name, serializer.instance.pk)
+        except IntegrityError:
+            # 同時上傳同一張：對方先登記了，這邊的 Photo 已隨 savepoint 回滾
+            existing = existing_photo(user, name)
+            if existing is None:
+                raise
+            return self._reuse(serializer, existing)
+        schedule_variants(name, serializer.instance.pk)
+        return True
 
     def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
-        try:
-            update_achievement_progress(self.request.user, '2', increment=1.0)
-        except Exception:
-            pass
+        with transaction.atomic():
+            created = self._ingest(serializer)
+            if created:
+                record_progress(self.request.user, '2', increment=1.0)
+        return created
 
-    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
-    def upload(self, request):
+    def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save(owner=request.user)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        created = self.perform_create(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    # ---------- 取檔：GET /api/photos/{id}/file/?variant=thumb|display ----------
+    @action(detail=True, methods=['get'], url_path='file')
+    def file(self, request, pk=None):
+        """只有擁有者拿得到（get_object 已限定 owner）；支援 Range / ETag / 304 / X-Accel-Redirect"""
+        photo = self.get_object()
+        stored = getattr(photo, photo_file_field(), None)
+        if not stored:
+            return Response({"detail": "not found"}, status=404)
+
+        name = stored.name
+        variant = request.query_params.get('variant')
+        if variant:
+            if variant not in VARIANTS:
+                return Response({"detail": "variant 只能是 " + " / ".join(VARIANTS)}, status=400)
+            if variant in ready_variants([photo]).get(photo.pk, ()):
+                name = variant_name(name, variant)  # 尚未產生完就先給原圖
+
+        if not stored.storage.exists(name):
+            return Response({"detail": "not found"}, status=404)
+        return serve_file(request, stored.storage, name)
+
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def upload(self, request):
+        """舊路徑：與 POST /api/photos/ 完全相同（含成就進度與狀態碼）"""
+        return self.create(request)
 
 
 # ===================== 成就 & 錢包（手動領取情緒餘額） =====================
@@ -377,18 +645,7 @@ class AchievementListView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        items = []
-        for ach in Achievement.objects.all().order_by('is_daily', 'id'):
-            status_dict = get_status(user, ach)  # {"claimable", "claimed_today", "unlocked"}
-            items.append({
-                "id": ach.id,
-                "title": ach.achTitle,
-                "desc": ach.achContent,
-                "amount": ach.exp,           # 要發放的情緒餘額
-                "is_daily": ach.is_daily,
-                **status_dict,
-            })
+        items = achievements_payload(request.user)
         return Response(items, status=200)
 
 
@@ -396,98 +653,176 @@ class AchievementClaimView(APIView):
     """
     POST /api/achievements/claim/
     body: {"id": "<achievement_id>"}
-    依條件判斷是否可領，成功則寫入 ExpLog（情緒餘額入帳）
+    header（選填）: Idempotency-Key: <client 產生的唯一值>，重送時回傳第一次的結果（換了 id 回 422）
+    判斷可否領取與入帳在同一個交易內完成，成功則寫入 ExpLog（情緒餘額入帳）
     """
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        user = request.user
-        aid = (request.data.get('id') or '').strip()
+        aid = str(request.data.get('id') or '').strip()
         if not aid:
             return Response({"detail": "缺少成就 id"}, status=400)
 
-        ach = Achievement.objects.filter(pk=aid).first()
-        if not ach:
-            return Response({"detail": "成就不存在"}, status=404)
+        code, payload = claim(request.user, aid, request.headers.get('Idempotency-Key'))
+        # 成功時 payload = {"ok", "id", "amount", "balance", "status": {...}}
+        return Response(payload, status=code)
 
-        # 先看是否「已領」（用 get_status）
-        pre = get_status(user, ach)
-        if ach.is_daily and pre.get("claimed_today"):
-            return Response({"detail": "今天已領取"}, status=409)
-        if not ach.is_daily and pre.get("unlocked"):
-            return Response({"detail": "已領取過"}, status=409)
 
-        # 再確認是否可領
-        if not is_claimable(user, ach):
-            return Response({"detail": "尚未達成領取條件"}, status=400)
+class WalletView(APIView):
+    """
+    GET /api/wallet/?cursor=<next_cursor>&limit=30
+    回傳當前情緒餘額與流水（新到舊，keyset 分頁；next_cursor 為 null 代表沒有更多）
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = FAST_RENDERERS
 
-        ok, payload = claim_achievement(user, aid)
-        if not ok:
-            # payload = {"detail": "..."}
-            return Response(payload, status=400)
+    def get(self, request):
+        try:
+            data = wallet_payload(request.user,
+                                  cursor=request.query_params.get('cursor'),
+                                  limit=request.query_params.get('limit') or 30)
+        except ValueError:
+            return Response({"detail": "cursor 或 limit 格式錯誤"}, status=400)
+        return Response(data, status=200)
 
-        # payload = {"id", "amount", "balance", "status": {...}}
-        return Response({"ok": True, **payload}, status=200)
 
+# ===================== 心情 / 情緒統計 =====================
 
-class WalletView(APIView):
+class InsightsView(APIView):
     """
-    GET /api/wallet/
-    回傳當前情緒餘額與最近流水
+    GET /api/insights/?range=week|month|year&date=YYYY-MM-DD（date 省略為今天）
+    回傳各期間的心情分佈、情緒標籤次數、熱門關鍵字 / 主題與連續天數；全部由 rollup 計算
     """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        balance = current_balance(user)
-        logs = (ExpLog.objects
-                .filter(user=user)
-                .order_by('-get_exp_time', '-id')[:30])
-
-        recent = []
-        for log in logs:
-            recent.append({
-                "time": (log.get_exp_time.astimezone(timezone.get_current_timezone())
-                         if log.get_exp_time else timezone.now()).isoformat(),
-                "delta": log.get_exp,
-                "reason": log.reason,
-                "balance": log.current_total,
-            })
-
-        return Response({
-            "balance": balance,
-            "recent": recent
-        }, status=200)
+        range_name = request.query_params.get('range') or 'week'
+        date_str = request.query_params.get('date')
+        try:
+            anchor = parse_date(date_str) if date_str else timezone.localdate()
+            if not anchor:
+                raise ValueError
+        except ValueError:
+            return Response({"detail": "date 格式錯誤，需 YYYY-MM-DD"}, status=400)
+        try:
+            data = insights(request.user.id, range_name, anchor)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+        return Response(data, status=200)
 
 
 # ===================== 今日備忘錄 / To-Do =====================
 
-class TodoViewSet(viewsets.ModelViewSet):
+class TodoViewSet(DeltaSyncMixin, viewsets.ModelViewSet):
     """
     /api/todos/
       - GET    /api/todos/?date=YYYY-MM-DD   只看當天（未帶 date 則回自己的全部）
+      - GET    /api/todos/?from=YYYY-MM-DD&to=YYYY-MM-DD   區間（含頭尾），依日期再依原排序
+      - GET    /api/todos/?since=<cursor>    只取 cursor 之後的異動（含刪除）
       - POST   /api/todos/                   {title, date?, time?}
+      - POST   /api/todos/bulk/              一次完成 / 取消完成 / 改期 / 刪除多筆（同一交易）
       - PATCH  /api/todos/{id}/              {is_done: true/false, ...}
       - DELETE /api/todos/{id}/
     """
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = TodoSerializer
+    sync_resource = 'todo'
 
     def get_queryset(self):
-        qs = Todo.objects.filter(user=self.request.user)
+        return todo_queryset(self.request.user, self.request.query_params)
 
-        # ?date=YYYY-MM-DD
-        date_str = self.request.query_params.get('date')
-        if date_str:
+    def perform_create(self, serializer):
+        # user 從後端帶入；date 若未傳，TodoSerializer 會預設為今天
+        serializer.save(user=self.request.user)
+
+    # ---------- 批次操作：POST /api/todos/bulk/ ----------
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """
+        body（各鍵皆可省略）:
+          {"complete": [id, ...], "incomplete": [id, ...], "delete": [id, ...],
+           "reorder": [{"id": 1, "date": "YYYY-MM-DD"?, "time": "HH:MM" | null}, ...]}
+        排序依 is_done -> time -> created_at，所以「重新排序」就是改 date / time
+        全部在同一個交易內；任何一筆不存在或不屬於自己就整批不做（400）
+        """
+        data = request.data if isinstance(request.data, dict) else {}
+        id_lists = {}
+        for key in ('complete', 'incomplete', 'delete'):
+            ids = data.get(key) or []
+            if not isinstance(ids, list):
+                return Response({"detail": f"{key} 需為陣列"}, status=400)
+            try:
+                id_lists[key] = {int(pk) for pk in ids}
+            except (TypeError, ValueError):
+                return Response({"detail": f"{key} 需為 id 陣列"}, status=400)
+
+        moves = {}
+        reorder = data.get('reorder') or []
+        if not isinstance(reorder, list):
+            return Response({"detail": "reorder 需為陣列"}, status=400)
+        for item in reorder:
+            try:
+                pk = int(item['id'])
+            except (TypeError, KeyError, ValueError):
+                return Response({"detail": "reorder 每一筆需有 id"}, status=400)
+            move = {}
             try:
-                day = datetime.fromisoformat(date_str).date()
+                if item.get('date'):
+                    move['date'] = parse_date(str(item['date']))
+                    if not move['date']:
+                        raise ValueError
             except ValueError:
-                raise ValidationError({"date": "日期格式錯誤，需 YYYY-MM-DD"})
-            qs = qs.filter(date=day)
+                return Response({"detail": "reorder.date 格式錯誤，需 YYYY-MM-DD"}, status=400)
+            try:
+                if 'time' in item:
+                    move['time'] = parse_time(str(item['time'])) if item['time'] else None
+                    if item['time'] and not move['time']:
+                        raise ValueError
+            except ValueError:
+                return Response({"detail": "reorder.time 格式錯誤，需 HH:MM"}, status=400)
+            moves[pk] = move
+
+        done_ids = id_lists['complete'] | id_lists['incomplete']
+        if id_lists['complete'] & id_lists['incomplete']:
+            return Response({"detail": "同一筆不能同時 complete 與 incomplete"}, status=400)
+        if id_lists['delete'] & (done_ids | set(moves)):
+            return Response({"detail": "要刪除的項目不能同時做其他操作"}, status=400)
+        all_ids = done_ids | id_lists['delete'] | set(moves)
+        if not all_ids:
+            return Response({"detail": "沒有要處理的項目"}, status=400)
+        if len(all_ids) > TODO_BULK_MAX:
+            return Response({"detail": f"一次最多 {TODO_BULK_MAX} 筆"}, status=400)
 
-        # 未完成在前 -> 時間（NULL 放最後）-> 建立時間
-        return qs.order_by('is_done', F('time').asc(nulls_last=True), 'created_at')
+        user = request.user
+        with transaction.atomic():
+            todos = Todo.objects.select_for_update().filter(user=user, pk__in=all_ids).in_bulk()
+            missing = sorted(all_ids - set(todos))
+            if missing:
+                return Response({"detail": "找不到項目", "missing": missing}, status=400)
+
+            changed = {}
+            for key, flag in (('complete', True), ('incomplete', False)):
+                for pk in id_lists[key]:
+                    todos[pk].is_done = flag
+                    changed[pk] = todos[pk]
+            for pk, move in moves.items():
+                for field_name, value in move.items():
+                    setattr(todos[pk], field_name, value)
+                changed[pk] = todos[pk]
+
+            fields = (['is_done'] if done_ids else []) + sorted({f for m in moves.values() for f in m})
+            if changed and fields:
+                Todo.objects.bulk_update(list(changed.values()), fields)
+                for pk in changed:  # bulk_update 不發 signal，自己記同步日誌
+                    record_change(user.id, 'todo', pk, OP_UPSERT)
+            if id_lists['delete']:
+                Todo.objects.filter(user=user, pk__in=id_lists['delete']).delete()  # post_delete 會記日誌
 
-    def perform_create(self, serializer):
-        # user 從後端帶入；date 若未傳，TodoSerializer 會預設為今天
-        serializer.save(user=self.request.user)
+        return Response({
+            "success": True,
+            "completed": len(id_lists['complete']),
+            "incompleted": len(id_lists['incomplete']),
+            "reordered": len(moves),
+            "deleted": len(id_lists['delete']),
+            "todos": TodoSerializer(list(changed.values()), many=True).data,
+        }, status=200)
@@ -1,5 +1,6 @@
 # backend/backend/urls.py
 from api.views import AchievementListView
+from api.metrics import metrics_view
 from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
@@ -28,6 +29,9 @@ urlpatterns = [
     path('api/auth/token/', obtain_auth_token, name='api-token-auth'),
 
     path('api/achievements/', AchievementListView.as_view(), name='achievements'),
+
+    # Prometheus 抓取各路由的耗時 / SQL / 回應大小（見 api/metrics.py）
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 # 媒體檔案伺服
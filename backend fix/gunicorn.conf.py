@@ -0,0 +1,49 @@
+# backend/gunicorn.conf.py
+"""
+gunicorn -c gunicorn.conf.py
+
+preload_app：master 先載入 Django 與情緒模型再 fork，worker 以 copy-on-write 共用模型記憶體。
+載入完成後 gc.freeze() 把既有物件移出 GC 追蹤，避免 worker 跑 GC 時改寫物件標頭、
+把共用頁一頁頁複製成私有頁。
+
+多個 worker 時 default cache 必須是跨行程的（Redis / Memcached / DatabaseCache），
+否則 worker 啟動失敗、gunicorn 直接停止（見 api/utils/shared_cache.py）。
+
+環境變數（皆可省略）：
+    GUNICORN_BIND=0.0.0.0:8000
+    GUNICORN_WORKERS=3
+    GUNICORN_PRELOAD=1      # 0 → 每個 worker 自己載入（比較記憶體用量時用）
+"""
+import gc
+import os
+
+wsgi_app = 'backend.wsgi:application'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 3))
+timeout = 60
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+
+
+def when_ready(server):
+    """master：app 已載入（preload），fork 前把模型也載入"""
+    if not preload_app:
+        return
+    from django.db import connections
+    from api.utils.warmup import warmup
+
+    timings = warmup()
+    connections.close_all()  # 不把 master 的 DB 連線帶進 worker
+    gc.freeze()
+    server.log.info("emotion_models 已在 master 載入（%.2fs），gc.freeze() 完成", timings['load'])
+
+
+def post_worker_init(worker):
+    """worker：確認 cache 可跨 worker 共用，再跑一次預熱推論（未 preload 時這裡才載入模型）"""
+    from api.utils.shared_cache import check_shared_cache
+    from api.utils.warmup import warmup
+
+    check_shared_cache(worker.cfg.workers)
+
+    timings = warmup(infer=True)
+    worker.log.info("worker %s 預熱完成：%s", worker.pid,
+                    ", ".join(f"{k}={v:.2f}s" for k, v in timings.items()))